@@ -1,5 +1,8 @@
 import streamlit as st
-import pandas as pd
+
+from engine import EXPECTED_COLUMNS, PAGE_SIZE, build_alternatives, conflict_free_swap, get_next_skin_goals, load_catalog, load_catalog_bytes, plan_routines, routine_conflicts, search_products, similar_products
+from engine import metrics
+from engine.store import UnknownSeller, catalog_store
 
 st.set_page_config(
     page_title="Skin Recommendation Engine",
@@ -36,365 +39,80 @@ with st.sidebar:
     st.title("Navigation")
     
     if st.button("Generate New Routine", type="primary"):
+        st.session_state.pop("routine_result", None)
         st.rerun()
     
     if st.button("Track Progress / Update Routine"):
         st.switch_page("pages/1_Progress_Tracker.py")
 
+# Stage timings, cache and rerun counters; only collected with SKINCARE_METRICS=1
+metrics.count("reruns", page="recommend")
+metrics.start_exporters()
+if metrics.enabled():
+    with st.sidebar.expander("⏱️ Performance (this server process)"):
+        st.dataframe(metrics.summary(), hide_index=True)
+        st.caption("p50/p95 are histogram bucket upper bounds, in ms.")
+        st.dataframe(metrics.counter_rows(), hide_index=True)
+
 # ────────────────────────────────────────────────
 # Load inventory
 # ────────────────────────────────────────────────
 st.subheader("Load Product Inventory")
-use_default = st.radio("Which inventory?", ("Default (skincare_products_fixed.csv)", "Upload seller's CSV"))
 
-df = pd.DataFrame()
+catalog = None
+uploaded = False
+loading = st.empty()
+
+def show_progress(fraction, rows_read):
+    loading.progress(fraction, text=f"Reading inventory… {rows_read:,} rows")
 
-if use_default == "Default (skincare_products_fixed.csv)":
+# A hosted storefront links here as ?seller=<id>; its published catalog is
+# memory-mapped and shared by every session (see engine/store.py).
+seller_id = st.query_params.get("seller")
+if seller_id:
+    try:
+        catalog = catalog_store().get(seller_id)
+        st.success(f"Loaded {len(catalog)} products")
+    except UnknownSeller:
+        st.error(f"No published inventory for seller '{seller_id}'.")
+    except Exception as e:
+        st.error(f"Seller inventory error: {str(e)}")
+elif st.radio("Which inventory?", ("Default (skincare_products_fixed.csv)", "Upload seller's CSV")) == "Default (skincare_products_fixed.csv)":
     try:
-        df = pd.read_csv("skincare_products_fixed.csv", encoding='utf-8', on_bad_lines='warn')
-        st.success(f"Loaded {len(df)} products")
+        catalog = load_catalog("skincare_products_fixed.csv", progress=show_progress)
+        st.success(f"Loaded {len(catalog)} products")
     except Exception as e:
         st.error(f"Default file error: {str(e)}")
 else:
     uploaded_file = st.file_uploader("Upload seller's CSV", type=["csv"])
     if uploaded_file is not None:
         try:
-            df = pd.read_csv(uploaded_file, encoding='utf-8', on_bad_lines='warn')
-            st.success(f"Loaded {len(df)} products")
+            catalog = load_catalog_bytes(uploaded_file.getvalue(), progress=show_progress)
+            uploaded = True
+            st.success(f"Loaded {len(catalog)} products")
             with st.expander("Preview first 5 rows"):
-                st.dataframe(df.head())
+                st.dataframe(catalog.frame(range(min(5, len(catalog)))).filter(items=EXPECTED_COLUMNS))
         except Exception as e:
             st.error(f"Upload error: {str(e)}")
+loading.empty()
 
-if df.empty:
+if catalog is None or catalog.df.empty:
     st.warning("No products loaded. Upload a CSV or use default.")
     st.stop()
 
-# Mojibake cleanup
-df['notes'] = df['notes'].astype(str).replace({
-    r'â|â': '—',
-    r'â': "'",
-    r'â|â': '"',
-    r'â¢': '•',
-    r'â¢': '™',
-    r'â¦': '…'
-}, regex=True)
-
-# Ensure category column exists
-if 'category' not in df.columns:
-    st.warning("No 'category' column found in CSV. Using fallback keyword matching.")
-    df['category'] = ""
-
-# ────────────────────────────────────────────────
-# Helper functions
-# ────────────────────────────────────────────────
-
-def is_safe(row, is_sensitive=False, is_pregnant=False, using_prescription=False):
-    if is_pregnant and (row.get('contains_retinol', '') == 'Yes' or row.get('prescription_only', '') == 'Yes'):
-        return False
-    if using_prescription and (row.get('contains_retinol', '') == 'Yes' or row.get('contains_acid', '') == 'Yes'):
-        return False
-    if is_sensitive:
-        safe_val = row.get('safe_for_sensitive', '').strip().lower()
-        if 'no' in safe_val:
-            return False
-    return True
-
-def get_caution_note(row, is_sensitive):
-    if not is_sensitive:
-        return ""
-    safe_val = row.get('safe_for_sensitive', '').strip().lower()
-    if 'caution' in safe_val:
-        return " **(Use with caution — patch test recommended; may cause mild irritation in very sensitive skin)**"
-    return ""
-
-CONCERN_KEYWORDS = {
-    "acne": "acne|blemish|pore|salicylic|benzoyl|breakout|niacinamide|oil control",
-    "dark spots / uneven tone / melasma": "brightening|even tone|fade spots|whitening|hyperpigmentation|dark spots|melasma|pigment|arbutin|kojic|niacinamide|vitamin c|tranexamic|azelaic|licorice|discoloration|spot fading|tone correcting",
-    "dryness / dehydration": "hydration|hyaluronic|moisturizing|dryness|ceramide|glycerin|plumping|humectant",
-    "texture / rough skin": "texture|rough|exfoliation|smoothing|glycolic|lactic",
-    "aging / fine lines": "anti-aging|retinol|firming|wrinkle",
-    "sensitivity / irritation": "sensitive|soothing|gentle|calming|centella|ceramide|barrier",
-    "dull skin": "dull|glow|radiance|vitamin c",
-    "damaged barrier": "barrier|ceramide|repair|restore"
-}
-
-CATEGORY_MAPPING = {
-    'Cleanse': [
-        "Acne Treatment / Cleanser",
-        "Cleansing / Balancing / Brightening",
-        "Cleansing / Hydrating / Barrier Repair",
-        "Cleansing / Refreshing",
-        "Cleansing / Makeup Removal / Refreshing",
-        "Cleansing / Blemish Control / Barrier Repair",
-        "Cleansing / Oil Control / Barrier Repair",
-        "Cleansing / Exfoliating / Blemish Control",
-        "Feminine Hygiene / Cleansing",
-        "Exfoliating / Brightening / Cleansing",
-        "Hydrating / Nourishing / Cleansing",
-        "Refreshing / Hydrating / Cleansing",
-        "Hydrating / Pampering / Cleansing",
-        "Exfoliating / Refreshing / Cleansing",
-        "Exfoliating / Renewing / Cleansing",
-        "Cleansing / Hydrating",
-        "Brightening / Cleansing / Bar Soap"
-    ],
-    'Tone': [
-        "Brightening / Tone-Up",
-        "Hydrating / Barrier Repair",
-        "Hydrating / Plumping / Essence",
-        "Hydrating / Plumping / Serum",
-        "Brightening / Spot Fading / Essence"
-    ],
-    'Treat': [
-        "Serum / Barrier Repair / Hydrator",
-        "Brightening / Antioxidant / Serum",
-        "Brightening / Blemish Control / Serum",
-        "Brightening / Soothing / Serum",
-        "Exfoliating / Brightening / Serum",
-        "Anti-Aging / Brightening / Serum",
-        "Brightening / Tone Correcting / Serum"
-    ],
-    'Moisturize': [
-        "Exfoliating / Moisturizer",
-        "Moisturizer / Body Oil",
-        "Moisturizer / Hydrator",
-        "Moisturizer / Body Lotion",
-        "Moisturizer / Hydrator / Repair",
-        "Moisturizer / Balancing / Soothing",
-        "Brightening / Tone Correcting / Moisturizer",
-        "Brightening / Spot Treatment / Moisturizer",
-        "Brightening / Moisturizer / Hydrator",
-        "Brightening / Anti-Acne / Moisturizer",
-        "Brightening / Moisturizing / Tone Correcting",
-        "Moisturizer / Hydrator / Plumping",
-        "Moisturizer / Barrier Repair / Hydrator",
-        "Moisturizer / Blemish Control / Barrier Repair",
-        "Moisturizer / Brightening / Hydrator",
-        "Anti-Aging / Firming / Moisturizer",
-        "Moisturizer / Barrier Repair / Oil Control",
-        "Hydrating / Plumping / Moisturizer",
-        "Brightening / Moisturizing / Hydrator",
-        "Anti-Aging / Hydrating / Renewing",
-        "Anti-Aging / Moisturizer / Smoothing",
-        "Moisturizer / Hydrator",
-        "Brightening / Moisturizing / Body Oil",
-        "Moisturizer / Body Oil / Brightening",
-        "Moisturizer / Body Oil / Glow-Boosting",
-        "Brightening / Moisturizing / Body Oil Gel",
-        "Moisturizer / Hydrator / Body Oil Gel",
-        "Brightening / Moisturizing / Multi-Benefit"
-    ],
-    'Protect': [
-        "Sunscreen / UV Protection"
-    ]
-}
-
-def get_filtered_df(df, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area):
-    filtered = df.copy()
-
-    # Area filter
-    if area == "Face":
-        filtered = filtered[~filtered['name'].str.lower().str.contains('body|intimate|feminine|femfresh', na=False)]
-    elif area == "Body":
-        filtered = filtered[filtered['name'].str.lower().str.contains('body', na=False)]
-
-    # Safety
-    filtered = filtered[filtered.apply(lambda row: is_safe(row, is_sensitive, is_pregnant, using_prescription), axis=1)]
-
-    # Skin type
-    type_pattern = 'All'
-    if skin_type == "Oily":
-        type_pattern += '|Oily|Acne-prone'
-    elif skin_type == "Dry":
-        type_pattern += '|Dry'
-    filtered = filtered[filtered['suitable_skin_types'].str.contains(type_pattern, case=False, na=True)]
-
-    # IMPORTANT: No concern keyword filtering here anymore
-    # We only apply concern relevance inside pick_product for 'Treat' step
-
-    if filtered.empty:
-        st.warning("No safe products match your profile.")
-        return pd.DataFrame()
-
-    return filtered
-
-def pick_product(filtered_df, step_name, fallback_text, is_sensitive, concerns=None):
-    target_categories = CATEGORY_MAPPING.get(step_name, [])
-    candidates = filtered_df[filtered_df['category'].isin(target_categories)].copy()
-
-    if candidates.empty:
-        return fallback_text, None
-
-    # Apply concern scoring ONLY for 'Treat' step
-    if step_name == 'Treat' and concerns:
-        candidates['concern_score'] = 0
-        for concern in concerns:
-            k = CONCERN_KEYWORDS.get(concern, "")
-            if k:
-                candidates['concern_score'] += (
-                    candidates['primary_target'].str.contains(k, case=False, na=False).astype(int) +
-                    candidates['secondary_target'].str.contains(k, case=False, na=False).astype(int) +
-                    candidates['key_actives'].str.contains(k, case=False, na=False).astype(int) +
-                    candidates['notes'].str.contains(k, case=False, na=False).astype(int)
-                )
-        # Stable sort: concern_score desc + product_id asc
-        candidates = candidates.sort_values(
-            by=['concern_score', 'product_id'],
-            ascending=[False, True]
-        )
-    else:
-        # For base steps (Cleanse, Tone, Moisturize, Protect): stable alphabetical / id sort
-        candidates = candidates.sort_values(by='product_id', ascending=True)
-
-    # Top recommendation
-    top_row = candidates.iloc[0]
-    caution = get_caution_note(top_row, is_sensitive)
-    top_details = (
-        f"**{top_row['product_id']} — {top_row['name']}**  \n"
-        f"**Recommended time:** {top_row.get('recommended_time', 'Anytime')}  \n"
-        f"**Max frequency:** {top_row.get('max_frequency', 'Daily')}  \n"
-        f"**How to use:** {top_row.get('step', 'Follow product instructions')}  \n"
-        f"**Notes:** {top_row.get('notes', 'No extra notes')}{caution}"
-    )
-
-    return top_details, top_row['product_id']
-
-def build_routine(df, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area):
-    filtered = get_filtered_df(df, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area)
-    if filtered.empty:
-        return {}
-
-    routine = {}
-    routine['Cleanse'] = pick_product(filtered, 'Cleanse', "Gentle cleanser", is_sensitive, concerns)
-    routine['Tone'] = pick_product(filtered, 'Tone', "Hydrating toner", is_sensitive, concerns)
-    routine['Treat'] = pick_product(filtered, 'Treat', "Targeted serum", is_sensitive, concerns)
-    routine['Moisturize'] = pick_product(filtered, 'Moisturize', "Moisturizer", is_sensitive, concerns)
-    routine['Protect'] = pick_product(filtered, 'Protect', "Broad-spectrum SPF 50+ every morning", is_sensitive, concerns)
-
-    return routine
-
-# ────────────────────────────────────────────────
-# Enhanced personalized skin goals
-# ────────────────────────────────────────────────
-
-NEXT_SKIN_GOALS = {
-    "acne / breakouts": [
-        "Visibly clearer skin with fewer active breakouts",
-        "Reduced redness, inflammation and post-blemish marks",
-        "Balanced oil production without over-drying",
-        "Calmer, less reactive complexion",
-        "Smoother texture and minimized pore appearance"
-    ],
-    "dark spots / uneven tone / melasma": [
-        "Visibly more even skin tone",
-        "Faded dark spots, sun spots and post-inflammatory marks",
-        "Brighter, more luminous complexion",
-        "Improved clarity and uniformity",
-        "Prevention of new pigmentation with protection"
-    ],
-    "dryness / dehydration": [
-        "Deep, long-lasting hydration – no more tightness",
-        "Plump, supple skin with restored moisture",
-        "Stronger skin barrier – fewer dry patches",
-        "Comfortable, soft feel all day",
-        "Healthy, dewy radiance from within"
-    ],
-    "texture / rough skin": [
-        "Noticeably smoother, more refined surface",
-        "Reduced roughness, bumps and sandpaper feel",
-        "Visibly improved micro-texture",
-        "Even, polished-looking skin",
-        "Silky, comfortable touch"
-    ],
-    "aging / fine lines": [
-        "Visibly firmer, more lifted contours",
-        "Reduced appearance of fine lines & wrinkles",
-        "Smoother texture and improved elasticity",
-        "Plumper, more youthful-looking volume",
-        "Healthier, resilient skin"
-    ],
-    "sensitivity / irritation": [
-        "Calmer, less reactive skin daily",
-        "Significant reduction in redness & stinging",
-        "Stronger tolerance to triggers",
-        "Comfortable, soothed feeling",
-        "Restored barrier – fewer flare-ups"
-    ],
-    "dull skin": [
-        "Brighter, more radiant complexion",
-        "Healthy, fresh-looking glow",
-        "Reduced ashy or tired appearance",
-        "Visible luminosity all day",
-        "Awake, energized skin tone"
-    ],
-    "damaged barrier": [
-        "Strong, intact skin barrier",
-        "Less sensitivity & reactivity",
-        "Better moisture retention",
-        "Calmer, more resilient skin",
-        "Healthy bounce and comfort restored"
-    ],
-    # Pre-defined common combinations
-    "dryness / dehydration+dull skin": [
-        "Deep hydration + visible inner glow",
-        "Plump, dewy skin that looks rested",
-        "Strong moisture barrier + healthy radiance",
-        "Soft, luminous complexion without tightness"
-    ],
-    "dryness / dehydration+texture / rough skin": [
-        "Deep hydration + dramatically smoother texture",
-        "Plump, soft skin with reduced roughness",
-        "Strong barrier + silky touch",
-        "Even, comfortable surface"
-    ],
-    "acne / breakouts+dull skin": [
-        "Clearer skin + brighter, healthier glow",
-        "Fewer breakouts + reduced post-blemish marks",
-        "Balanced oil + even tone",
-        "Calmer complexion + visible radiance"
-    ],
-    "aging / fine lines+dryness / dehydration": [
-        "Firmer skin + deep lasting hydration",
-        "Reduced fine lines + plump, supple feel",
-        "Improved elasticity + strong moisture barrier",
-        "Youthful bounce + comfortable softness"
-    ],
-    # Fallback
-    "default": [
-        "Healthier, more balanced skin overall",
-        "Visible improvement in your main concerns",
-        "Stronger skin resilience & comfort",
-        "Natural, confident glow from within"
-    ]
-}
-
-def get_next_skin_goals(concerns):
-    if not concerns:
-        return NEXT_SKIN_GOALS["default"][:4]
-
-    normalized = [c.lower().strip() for c in concerns]
-
-    if len(normalized) == 1:
-        key = normalized[0]
-        return NEXT_SKIN_GOALS.get(key, NEXT_SKIN_GOALS["default"])[:5]
+# Parsing, validation and compilation happen once per file content,
+# shared by every session (see engine/catalog.py and engine/ingest.py).
+# Ingest notices and row issues are for the seller, not for shoppers.
+if uploaded or demo_mode:
+    for notice in catalog.notices:
+        st.warning(notice)
 
-    normalized.sort(key=len, reverse=True)
-    combo_key = "+".join(normalized[:2])
-    if combo_key in NEXT_SKIN_GOALS:
-        return NEXT_SKIN_GOALS[combo_key][:5]
-
-    primary = normalized[0]
-    goals = NEXT_SKIN_GOALS.get(primary, NEXT_SKIN_GOALS["default"])[:3]
-
-    shared = [
-        "Stronger, more resilient skin barrier",
-        "Comfortable, confident daily feel",
-        "Visible progress with consistency"
-    ]
-    goals.append(shared[0])
-
-    return goals[:5]
+    if catalog.report.issue_count:
+        with st.expander(f"⚠️ {catalog.report.issue_count} row issue(s) while reading the inventory"):
+            st.dataframe(
+                [{"line": i.line, "issue": i.message} for i in catalog.issues],
+                hide_index=True
+            )
 
 # ────────────────────────────────────────────────
 # Main form
@@ -430,6 +148,8 @@ with st.form("skin_form"):
 
     submitted = st.form_submit_button("Get My Routine", type="primary")
 
+# Results live in session state, so the fragments below can rerun on their
+# own without resubmitting the form or regenerating the routine.
 if submitted:
     is_sensitive_val = sensitive
     is_pregnant_val = pregnant
@@ -438,55 +158,140 @@ if submitted:
     skin_type = skin_option
     concerns = [c.lower() for c in selected_concerns if c != "None"]
 
+    result = {"catalog_key": catalog.key, "area": area, "concerns": concerns,
+              "profile": (skin_type, is_sensitive_val, is_pregnant_val, using_prescription_val, area)}
     if is_pregnant_val or using_prescription_val:
-        st.warning("Safety first! Consult a doctor.")
+        result["warning"] = "Safety first! Consult a doctor."
     elif is_sensitive_val and len(concerns) > 2:
-        st.warning("Complex concerns + sensitivity — seek professional advice.")
+        result["warning"] = "Complex concerns + sensitivity — seek professional advice."
     else:
-        routine = build_routine(df, skin_type, concerns, is_sensitive_val, is_pregnant_val, using_prescription_val, area)
+        # Face shoppers may ask for matching body products, so plan both in one pass
+        areas = (area, "Body") if area == "Face" else (area,)
+        result["routines"] = plan_routines(catalog, skin_type, concerns, is_sensitive_val, is_pregnant_val, using_prescription_val, areas)
+
+        # Next-best products per step, for when a pick is out of stock or not wanted
+        picked = [product_id for _, product_id in result["routines"][area].values() if product_id is not None]
+        result["alternatives"] = build_alternatives(catalog, skin_type, concerns, is_sensitive_val, is_pregnant_val, using_prescription_val, area, exclude=picked)
+
+        # Actives that clash across steps, and the fewest swaps that avoid them
+        result["conflicts"] = routine_conflicts(catalog, result["routines"][area])
+        if result["conflicts"]:
+            result["conflict_swap"] = conflict_free_swap(catalog, result["routines"][area], result["alternatives"])
+
+        # "More like this" for each pick, under the same profile (engine/similar.py)
+        result["similar"] = {step: similar_products(catalog, product_id, result["profile"], k=3)
+                             for step, (_, product_id) in result["routines"][area].items() if product_id is not None}
+    st.session_state.routine_result = result
+    st.session_state.pop("want_body", None)
+
+
+@st.fragment
+def routine_results(result):
+    metrics.count("fragment_reruns", fragment="routine_results")
+    routine = result["routines"][result["area"]]
+    if not routine:
+        st.warning("No safe products match your profile.")
 
-        st.success("Here's your personalized routine:")
-        for step, (details, _) in routine.items():
+    st.success("Here's your personalized routine:")
+    for step, (details, _) in routine.items():
+        st.markdown(f"**{step}**  \n{details}")
+
+    for conflict in result.get("conflicts", ()):
+        products = ", ".join(f"{p['step']}: {p['product_id']} ({p['ingredients']})" for p in conflict["products"])
+        st.warning(f"⚠️ {conflict['text']}  \n{products}")
+    swap = result.get("conflict_swap")
+    if swap:
+        st.info("To avoid the clash, swap in " + ", ".join(f"**{o['product_id']} — {o['name']}** for {step}" for step, o in swap.items()) + ".")
+
+    alternatives = result["alternatives"]
+    if any(alternatives.values()):
+        with st.expander("🔁 Other options for each step"):
+            for step, options in alternatives.items():
+                if options:
+                    st.markdown(f"**{step}:** " + ", ".join(f"{o['product_id']} — {o['name']}" for o in options))
+
+    similar = result.get("similar", {})
+    if any(similar.values()):
+        with st.expander("🧴 More like your picks"):
+            for step, products in similar.items():
+                if products:
+                    st.markdown(f"**{step}:** " + ", ".join(f"{s['product_id']} — {s['name']}" for s in products))
+
+    st.info("Start one new product at a time. Patch test. Be consistent.")
+
+
+@st.fragment
+def body_follow_up(result):
+    # Toggling this reruns only this fragment; the body routine was planned with the face one
+    metrics.count("fragment_reruns", fragment="body_follow_up")
+    st.markdown("---")
+    want_body = st.radio("Would you like matching body products for your face concern?", ("No thanks", "Yes, show me"), key="want_body")
+    if want_body == "Yes, show me":
+        st.subheader("Matching Body Products")
+        body_routine = result["routines"]["Body"]
+        if not body_routine:
+            st.warning("No safe products match your profile.")
+        for step, (details, _) in body_routine.items():
             st.markdown(f"**{step}**  \n{details}")
 
-        st.info("Start one new product at a time. Patch test. Be consistent.")
 
-        if area == "Face":
-            st.markdown("---")
-            want_body = st.radio("Would you like matching body products for your face concern?", ("No thanks", "Yes, show me"))
-            if want_body == "Yes, show me":
-                st.subheader("Matching Body Products")
-                body_routine = build_routine(df, skin_type, concerns, is_sensitive_val, is_pregnant_val, using_prescription_val, "Body")
-                for step, (details, _) in body_routine.items():
-                    st.markdown(f"**{step}**  \n{details}")
+result = st.session_state.get("routine_result")
+if result is not None and result["catalog_key"] == catalog.key:
+    if "warning" in result:
+        st.warning(result["warning"])
+    else:
+        routine_results(result)
+        if result["area"] == "Face":
+            body_follow_up(result)
 
         # Personalized goals
         st.markdown("---")
         st.subheader("🌟 Your Next Skin Goals")
 
-        goals = get_next_skin_goals(concerns)
+        goals = get_next_skin_goals(result["concerns"])
 
         for goal in goals:
             st.markdown(f"• **{goal}**")
 
         st.success("Come back in 4–8 weeks for your upgraded routine. The best is coming! 🔜")
 
+
 # Shopping mode
-st.markdown("---")
-st.subheader("🛒 Browse Products")
-query = st.text_input("Search by keyword")
-if query:
-    matches = df[df['name'].str.lower().str.contains(query.lower(), na=False)]
-    if matches.empty:
+@st.fragment
+def browse_products(catalog):
+    # Typing a query or paging reruns only this fragment, not the inventory load or the form
+    metrics.count("fragment_reruns", fragment="browse_products")
+    st.markdown("---")
+    st.subheader("🛒 Browse Products")
+    query = st.text_input("Search by keyword")
+    if not query:
+        return
+    # Ranked prefix search over the catalog's token index (engine/search.py)
+    results = search_products(catalog, query)
+    if not results.total:
         st.info("No matches found.")
-    else:
-        for _, p in matches.iterrows():
-            with st.expander(f"{p['product_id']} — {p['name']}"):
-                st.write(f"**Best for**: {p['primary_target']}")
-                st.write(f"**Key ingredients**: {p['key_actives']}")
-                st.write(f"**Recommended time**: {p.get('recommended_time', 'Anytime')}")
-                st.write(f"**Max frequency**: {p.get('max_frequency', 'Daily')}")
-                st.write(f"**How to use**: {p.get('step', 'Follow product instructions')}")
-                st.write(f"**Notes**: {p.get('notes', 'No extra notes')}")
+        return
+    pages = -(-results.total // PAGE_SIZE)
+    page = 1
+    if pages > 1:
+        page = st.number_input(f"{results.total} matches — page", min_value=1, max_value=pages, value=1)
+    # Similar products skip whatever the shopper's routine profile rules out
+    result = st.session_state.get("routine_result")
+    profile = result.get("profile") if result is not None and result["catalog_key"] == catalog.key else None
+    # Only the text of the products on this page is read (engine/textstore.py)
+    for p in catalog.records(results.page(page)):
+        with st.expander(f"{p['product_id']} — {p['name']}"):
+            st.write(f"**Best for**: {p['primary_target']}")
+            st.write(f"**Key ingredients**: {p['key_actives']}")
+            st.write(f"**Recommended time**: {p.get('recommended_time', 'Anytime')}")
+            st.write(f"**Max frequency**: {p.get('max_frequency', 'Daily')}")
+            st.write(f"**How to use**: {p.get('step', 'Follow product instructions')}")
+            st.write(f"**Notes**: {p.get('notes', 'No extra notes')}")
+            similar = similar_products(catalog, p["product_id"], profile)
+            if similar:
+                st.write("**Similar products**: " + ", ".join(f"{s['product_id']} — {s['name']}" for s in similar))
+
+
+browse_products(catalog)
 
 st.caption("Thank you for trusting us with your skin 🌿")
@@ -0,0 +1,326 @@
+"""Load-test the Streamlit app with concurrent simulated shoppers.
+
+    python -m benchmarks.app_load --users 1 2 4 8 --sessions 3 -o app_load.json
+    python -m benchmarks.app_load --users 4 --rows 100000 --baseline app_load.json
+
+Each simulated user runs --sessions shopper sessions back to back through
+Streamlit's headless AppTest: open the app (default inventory load),
+submit the skin form with a random skin type, concern mix, flags and area,
+search the catalog by keyword, then open the Progress Tracker and submit
+it. AppTest swaps in a process-global runtime, so every user is its own
+process; all users of a level start together and the level's wall time
+gives the throughput. With --rows the default inventory is a synthetic
+catalog of that size (see benchmarks/synthetic.py); its snapshot is built
+before the users start, so "load" times a cold session reading it.
+
+For each --users level the report has p50/p95/p99/mean per action and
+overall, sessions and actions per second, and peak RSS: each user
+process's high-water mark, and how far running its sessions raised it
+above the imports. Results are JSON; with --baseline any action whose p95
+at the same level is more than --threshold slower is reported and the exit
+status is 1.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.hot_paths import QUERIES, environment
+from benchmarks.synthetic import synthetic_inventory
+from engine.progress import PROGRESS_ENV
+
+try:
+    import resource
+except ImportError:  # Windows: RSS is not reported
+    resource = None
+
+RESULTS_VERSION = 1
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+PROGRESS_PAGE = 'pages/1_Progress_Tracker.py'
+DEFAULT_INVENTORY = 'skincare_products_fixed.csv'
+
+ACTIONS = ('load', 'routine', 'search', 'progress_page', 'progress_submit')
+
+DEFAULT_USERS = (1, 2, 4, 8)
+DEFAULT_SESSIONS = 3
+DEFAULT_TIMEOUT = 120.0
+DEFAULT_THRESHOLD = 0.25
+STARTUP_TIMEOUT = 300.0
+
+# Differences below this are scheduling noise, whatever the ratio
+NOISE_FLOOR_MS = 5.0
+
+
+class SessionError(Exception):
+    pass
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+
+
+def _widget(elements, label):
+    for element in elements:
+        if element.label == label:
+            return element
+    raise SessionError(f"no widget labelled {label!r}")
+
+
+def _some(rng, options, most):
+    return [options[i] for i in sorted(rng.choice(len(options), rng.integers(0, most + 1), replace=False))]
+
+
+class _Session:
+    """One shopper's pass through the app, timing every rerun it triggers."""
+
+    def __init__(self, rng, timeout, latencies):
+        from streamlit.testing.v1 import AppTest
+
+        self.app = AppTest.from_file(APP, default_timeout=timeout)
+        self.rng = rng
+        self.latencies = latencies
+
+    def _run(self, action, rerun):
+        started = time.perf_counter()
+        rerun()
+        self.latencies[action].append((time.perf_counter() - started) * 1000.0)
+        if self.app.exception:
+            raise SessionError(f"{action}: {self.app.exception[0].value}")
+
+    def recommend(self):
+        app, rng = self.app, self.rng
+        skin = [o for o in _widget(app.selectbox, "Select one:").options if o != "Not sure"]
+        _widget(app.selectbox, "Select one:").set_value(skin[rng.integers(len(skin))])
+        concerns = [o for o in _widget(app.multiselect, "Select all that apply:").options if o != "None"]
+        _widget(app.multiselect, "Select all that apply:").set_value(_some(rng, concerns, 3))
+        flags = rng.random(3) < (0.3, 0.1, 0.1)
+        for label, on in zip(("My skin reacts easily / is sensitive",
+                              "I’m pregnant or breastfeeding",
+                              "I’m currently using prescription products"), flags):
+            _widget(app.checkbox, label).set_value(bool(on))
+        areas = _widget(app.radio, "Where are you shopping today?").options
+        _widget(app.radio, "Where are you shopping today?").set_value(areas[rng.integers(len(areas))])
+        self._run('routine', _widget(app.button, "Get My Routine").click().run)
+
+    def track_progress(self):
+        app, rng = self.app, self.rng
+        self._run('progress_page', app.switch_page(PROGRESS_PAGE).run)
+        durations = _widget(app.selectbox, "How long have you been using your current routine?").options
+        _widget(app.selectbox, "How long have you been using your current routine?").set_value(
+            durations[rng.integers(len(durations))])
+        for multiselect in app.multiselect:
+            multiselect.set_value(_some(rng, multiselect.options, 2))
+        app.text_area[0].set_value("Cheeks less flaky, forehead still rough")
+        self._run('progress_submit', _widget(app.button, "Submit Progress & Get Advice").click().run)
+
+    def run(self):
+        self._run('load', self.app.run)
+        self.recommend()
+        query = QUERIES[self.rng.integers(len(QUERIES))]
+        self._run('search', _widget(self.app.text_input, "Search by keyword").set_value(query).run)
+        self.track_progress()
+
+
+def _user(user, sessions, seed, timeout, workdir, start, results):
+    """Process body for one simulated user; puts its latencies and RSS on `results`."""
+    os.chdir(workdir)
+    import streamlit.testing.v1  # noqa: F401  (imported before the RSS baseline)
+
+    latencies = {action: [] for action in ACTIONS}
+    errors = []
+    before = _peak_rss_mb()
+    rng = np.random.default_rng([seed, user])
+    start.wait()
+    for _ in range(sessions):
+        try:
+            _Session(rng, timeout, latencies).run()
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+    peak = _peak_rss_mb()
+    results.put({
+        'user': user,
+        'latencies': latencies,
+        'errors': errors,
+        'finished': time.time(),
+        'peak_rss_mb': peak,
+        'session_rss_mb': None if peak is None else peak - before,
+    })
+
+
+def _summary(samples):
+    if not samples:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'mean_ms': None, 'calls': 0}
+    ordered = sorted(samples)
+
+    def percentile(q):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 3)
+
+    return {
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'calls': len(ordered),
+    }
+
+
+def _rss(values):
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    return {'max_mb': round(max(values), 1), 'mean_mb': round(statistics.fmean(values), 1)}
+
+
+def run_level(users, sessions=DEFAULT_SESSIONS, seed=0, timeout=DEFAULT_TIMEOUT, workdir=None):
+    """Report for `users` concurrent users running `sessions` sessions each."""
+    context = multiprocessing.get_context('spawn')
+    start = context.Barrier(users + 1, timeout=STARTUP_TIMEOUT)
+    results = context.Queue()
+    processes = [context.Process(target=_user, args=(user, sessions, seed, timeout, workdir, start, results))
+                 for user in range(users)]
+    for process in processes:
+        process.start()
+    try:
+        start.wait()
+    except Exception:
+        for process in processes:
+            process.kill()
+        raise RuntimeError("simulated users did not start") from None
+    started = time.time()
+    reports = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    elapsed = max(report['finished'] for report in reports) - started
+
+    latencies = {action: [ms for report in reports for ms in report['latencies'][action]] for action in ACTIONS}
+    errors = [error for report in reports for error in report['errors']]
+    completed = users * sessions - len(errors)
+    actions = sum(len(samples) for samples in latencies.values())
+    return {
+        'users': users,
+        'sessions': users * sessions,
+        'errors': len(errors),
+        'error_samples': errors[:5],
+        'seconds': round(elapsed, 3),
+        'sessions_per_s': round(completed / elapsed, 3),
+        'actions_per_s': round(actions / elapsed, 2),
+        'overall': _summary([ms for samples in latencies.values() for ms in samples]),
+        'actions': {action: _summary(samples) for action, samples in latencies.items()},
+        'peak_rss': _rss(report['peak_rss_mb'] for report in reports),
+        'session_rss': _rss(report['session_rss_mb'] for report in reports),
+    }
+
+
+def run(users=DEFAULT_USERS, sessions=DEFAULT_SESSIONS, rows=None, seed=0, timeout=DEFAULT_TIMEOUT, log=None):
+    from engine.catalog import load_catalog
+
+    # Users run in a scratch directory, so their snapshots and synthetic
+    # check-ins never land in the checkout or a real progress database
+    previous_db = os.environ.get(PROGRESS_ENV)
+    with tempfile.TemporaryDirectory() as workdir:
+        inventory = os.path.join(workdir, DEFAULT_INVENTORY)
+        if rows:
+            synthetic_inventory(rows, seed).to_csv(inventory, index=False)
+        else:
+            shutil.copyfile(os.path.join(os.path.dirname(APP), DEFAULT_INVENTORY), inventory)
+        os.environ[PROGRESS_ENV] = os.path.join(workdir, 'progress.db')
+        try:
+            # Every user then reads the same snapshot instead of racing to parse the CSV
+            load_catalog(inventory)
+
+            levels = {}
+            for count in users:
+                levels[str(count)] = run_level(count, sessions, seed, timeout, workdir)
+                if log:
+                    log(f"{count:>4} user(s)  done in {levels[str(count)]['seconds']:.1f}s")
+        finally:
+            if previous_db is None:
+                os.environ.pop(PROGRESS_ENV, None)
+            else:
+                os.environ[PROGRESS_ENV] = previous_db
+    return {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'seed': seed,
+        'sessions_per_user': sessions,
+        'rows': rows,
+        'environment': environment(),
+        'levels': levels,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """(users, action, baseline p95, current p95) for every action that got slower."""
+    regressions = []
+    for users, level in current['levels'].items():
+        reference = baseline.get('levels', {}).get(users, {}).get('actions', {})
+        for action, summary in level['actions'].items():
+            before, after = reference.get(action, {}).get('p95_ms'), summary['p95_ms']
+            if before is None or after is None:
+                continue
+            if after > before * (1 + threshold) and after - before > NOISE_FLOOR_MS:
+                regressions.append((users, action, before, after))
+    return regressions
+
+
+def format_table(report):
+    lines = [f"{'users':>5}  {'sessions/s':>10}  {'actions/s':>9}  {'p50 ms':>9}  {'p95 ms':>9}  {'p99 ms':>9}"
+             f"  {'peak RSS MB':>11}  {'errors':>6}"]
+    for users, level in report['levels'].items():
+        overall, rss = level['overall'], level['peak_rss']
+        lines.append(f"{int(users):>5}  {level['sessions_per_s']:>10.2f}  {level['actions_per_s']:>9.2f}"
+                     f"  {overall['p50_ms'] or 0:>9.1f}  {overall['p95_ms'] or 0:>9.1f}  {overall['p99_ms'] or 0:>9.1f}"
+                     f"  {rss['max_mb'] if rss else '-':>11}  {level['errors']:>6}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, nargs='+', default=list(DEFAULT_USERS),
+                        help="concurrency levels to run, one after another")
+    parser.add_argument('--sessions', type=int, default=DEFAULT_SESSIONS, help="sessions per user")
+    parser.add_argument('--rows', type=int, help="use a synthetic default inventory of this many products")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="seconds allowed per rerun")
+    parser.add_argument('-o', '--output', help="write results JSON here")
+    parser.add_argument('--baseline', help="results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown of an action's p95 before it counts as a regression")
+    args = parser.parse_args(argv)
+
+    report = run(args.users, args.sessions, args.rows, args.seed, args.timeout,
+                 log=lambda line: print(line, file=sys.stderr))
+    print(format_table(report), file=sys.stderr)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for users, action, before, after in regressions:
+            print(f"REGRESSION {action} @ {int(users)} user(s): p95 {before:.1f} ms -> {after:.1f} ms "
+                  f"(+{(after / before - 1) * 100:.0f}%)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No action's p95 slower than baseline by more than {args.threshold:.0%}.", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""Time the recommendation hot paths on synthetic catalogs of growing size.
+
+    python -m benchmarks.hot_paths --sizes 100 1000 10000 100000 1000000 -o results.json
+    python -m benchmarks.hot_paths --baseline benchmarks/baselines/default.json
+
+For each catalog size the suite times ingest, `get_filtered_df`,
+`pick_product` (all five steps), `build_routine` cold and cached, the
+browse search, and the similar-products index build and lookups, over a
+fixed matrix of profiles and queries. Results are
+written as JSON (median/p95/mean milliseconds per call). With --baseline,
+any stage whose median is more than --threshold slower than the stored
+run is reported and the exit status is 1. A results file written with -o
+into benchmarks/baselines/ is a baseline; refresh it on the machine that
+runs the comparison, since timings don't carry across hardware.
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import synthetic_csv
+from engine.catalog import content_key, ingest_catalog
+from engine.routine import POOL_CACHE, ROUTINE_STEPS, build_routine, get_filtered_df, pick_product
+from engine.routine_cache import ROUTINE_CACHE
+from engine.search import search_products
+from engine.similar import INDEX_CACHE as SIMILAR_CACHE, similar_products, similarity_index
+
+RESULTS_VERSION = 1
+
+DEFAULT_SIZES = (100, 1_000, 10_000, 100_000)
+DEFAULT_REPEAT = 5
+DEFAULT_THRESHOLD = 0.25
+
+# Differences below this are timer noise, whatever the ratio
+NOISE_FLOOR_MS = 0.05
+
+# (skin type, concerns, sensitive, pregnant, prescription, area)
+PROFILES = (
+    ("Normal", [], False, False, False, "Face"),
+    ("Oily", ["acne"], False, False, False, "Face"),
+    ("Oily", ["acne", "texture / rough skin"], True, False, False, "Face"),
+    ("Dry", ["dryness / dehydration"], False, False, False, "Body"),
+    ("Dry", ["dryness / dehydration", "damaged barrier", "sensitivity / irritation"], True, False, False, "Both"),
+    ("Combination", ["dark spots / uneven tone / melasma"], False, True, False, "Face"),
+    ("Combination", ["aging / fine lines", "dull skin"], False, False, True, "Face"),
+    ("Normal", ["dull skin"], True, True, True, "Both"),
+    ("Oily", ["acne", "dark spots / uneven tone / melasma", "dull skin", "texture / rough skin"],
+     False, False, False, "Both"),
+    ("Dry", [], True, True, False, "Body"),
+)
+
+QUERIES = ("serum", "vitamin c", "hydr", "niacinamide body lotion", "spf", "zzzz")
+
+STAGES = ('ingest', 'get_filtered_df', 'pick_product', 'build_routine_cold', 'build_routine_cached', 'search',
+          'similar_index', 'similar_products')
+
+# Products looked up per size for the similar_products stage
+SIMILAR_LOOKUPS = 20
+
+
+def _timed(fn):
+    started = time.perf_counter()
+    fn()
+    return (time.perf_counter() - started) * 1000.0
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+    return {
+        'median_ms': round(statistics.median(ordered), 4),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 4),
+        'mean_ms': round(statistics.fmean(ordered), 4),
+        'calls': len(ordered),
+    }
+
+
+def _picks(catalog, filtered, profile):
+    if filtered.empty:
+        return
+    for step, fallback in ROUTINE_STEPS:
+        pick_product(filtered, step, fallback, profile[2], profile[1], records=catalog.records)
+
+
+def run_size(rows, repeat=DEFAULT_REPEAT, seed=0):
+    """{stage: summary} for one synthetic catalog of `rows` products."""
+    data = synthetic_csv(rows, seed)
+    key = content_key(data)
+    samples = {stage: [] for stage in STAGES}
+
+    # Ingest goes straight to the compiler, past the process-wide cache
+    built = []
+    for _ in range(repeat if rows < 100_000 else 1):
+        samples['ingest'].append(_timed(lambda: built.append(ingest_catalog(io.BytesIO(data), key))))
+    catalog = built[-1]
+    del built[:-1]
+
+    for _ in range(repeat):
+        for profile in PROFILES:
+            samples['get_filtered_df'].append(_timed(lambda: get_filtered_df(catalog.df, *profile)))
+            filtered = get_filtered_df(catalog.df, *profile)
+            samples['pick_product'].append(_timed(lambda: _picks(catalog, filtered, profile)))
+
+            ROUTINE_CACHE.clear()
+            POOL_CACHE.clear()
+            samples['build_routine_cold'].append(_timed(lambda: build_routine(catalog, *profile)))
+            samples['build_routine_cached'].append(_timed(lambda: build_routine(catalog, *profile)))
+
+        for query in QUERIES:
+            samples['search'].append(_timed(lambda: search_products(catalog, query).page(1)))
+
+    # Built once per catalog; lookups after the first per product are cached
+    SIMILAR_CACHE.clear()
+    samples['similar_index'].append(_timed(lambda: similarity_index(catalog)))
+    lookups = catalog.df['product_id'].iloc[np.linspace(0, len(catalog) - 1, SIMILAR_LOOKUPS).astype(int)].tolist()
+    for _ in range(repeat):
+        for product_id, profile in zip(lookups, itertools.cycle(PROFILES)):
+            samples['similar_products'].append(
+                _timed(lambda: similar_products(catalog, product_id, profile[:1] + profile[2:])))
+    ROUTINE_CACHE.clear()
+    POOL_CACHE.clear()
+    SIMILAR_CACHE.clear()
+
+    return {stage: _summary(values) for stage, values in samples.items()}
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def run(sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT, seed=0, log=None):
+    results = {}
+    for rows in sizes:
+        started = time.perf_counter()
+        results[str(rows)] = run_size(rows, repeat, seed)
+        if log:
+            log(f"{rows:>9,} products  done in {time.perf_counter() - started:.1f}s")
+    return {
+        'version': RESULTS_VERSION,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'seed': seed,
+        'repeat': repeat,
+        'profiles': len(PROFILES),
+        'queries': len(QUERIES),
+        'environment': environment(),
+        'results': results,
+    }
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """(size, stage, baseline ms, current ms) for every stage that got slower."""
+    regressions = []
+    for size, stages in current['results'].items():
+        reference = baseline.get('results', {}).get(size, {})
+        for stage, summary in stages.items():
+            if stage not in reference:
+                continue
+            before, after = reference[stage]['median_ms'], summary['median_ms']
+            if after > before * (1 + threshold) and after - before > NOISE_FLOOR_MS:
+                regressions.append((size, stage, before, after))
+    return regressions
+
+
+def format_table(report):
+    lines = [f"{'products':>10}  " + "  ".join(f"{stage:>20}" for stage in STAGES)]
+    for size, stages in report['results'].items():
+        cells = [f"{stages[stage]['median_ms']:>17.3f} ms" if stage in stages else f"{'-':>20}" for stage in STAGES]
+        lines.append(f"{int(size):>10,}  " + "  ".join(cells))
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES),
+                        help="catalog sizes to generate (default: 10^2..10^5; add 1000000 for 10^6)")
+    parser.add_argument('--repeat', type=int, default=DEFAULT_REPEAT, help="passes over the profile matrix")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-o', '--output', help="write results JSON here")
+    parser.add_argument('--baseline', help="results JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown of a stage's median before it counts as a regression")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.repeat, args.seed, log=lambda line: print(line, file=sys.stderr))
+    print(format_table(report), file=sys.stderr)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+            f.write('\n')
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for size, stage, before, after in regressions:
+            print(f"REGRESSION {stage} @ {int(size):,} products: {before:.3f} ms -> {after:.3f} ms "
+                  f"(+{(after / before - 1) * 100:.0f}%)", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+        print(f"No stage slower than baseline by more than {args.threshold:.0%}.", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""Load-test the JSON recommendation service from this machine.
+
+    python -m benchmarks.service_load --spawn --rows 10000 -n 5000 --concurrency 64
+    python -m benchmarks.service_load --url http://127.0.0.1:8080 -n 2000 --distinct 50
+
+Opens --concurrency keep-alive connections and posts -n profiles drawn from
+a pool of --distinct ones, so a small pool means many identical requests in
+flight and exercises coalescing. With --spawn the service is started as a
+subprocess on a free port (against -c, or a --rows synthetic catalog) and
+stopped afterwards. Prints throughput, latency percentiles and the
+service's computed/coalesced counters as JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from benchmarks.synthetic import synthetic_inventory
+from engine.taxonomy import AREAS, CONCERN_KEYWORDS, SKIN_TYPES
+
+DEFAULT_REQUESTS = 2000
+DEFAULT_CONCURRENCY = 32
+DEFAULT_DISTINCT = 100
+STARTUP_TIMEOUT = 300.0
+
+
+def profile_pool(distinct, seed=0):
+    """`distinct` request bodies with varied skin types, concerns, flags and areas."""
+    rng = np.random.default_rng(seed)
+    concerns = sorted(CONCERN_KEYWORDS)
+    pool = []
+    for i in range(distinct):
+        picked = rng.choice(len(concerns), rng.integers(0, 4), replace=False)
+        flags = rng.random(3) < (0.3, 0.1, 0.1)
+        pool.append({
+            'id': f"p{i}",
+            'skin_type': SKIN_TYPES[rng.integers(len(SKIN_TYPES))],
+            'concerns': [concerns[j] for j in sorted(picked)],
+            'sensitive': bool(flags[0]),
+            'pregnant': bool(flags[1]),
+            'prescription': bool(flags[2]),
+            'area': AREAS[rng.integers(len(AREAS))],
+        })
+    return pool
+
+
+async def _request(reader, writer, host, method, path, payload=None):
+    body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+                  f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.strip().lower() == 'content-length':
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def _client(host, port, bodies, cursor, latencies, errors):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while cursor[0] < len(bodies):
+            body = bodies[cursor[0]]
+            cursor[0] += 1
+            started = time.perf_counter()
+            status, _ = await _request(reader, writer, host, 'POST', '/routine', body)
+            latencies.append((time.perf_counter() - started) * 1000.0)
+            if status != 200:
+                errors[status] = errors.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def _health(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        _, body = await _request(reader, writer, host, 'GET', '/healthz')
+        return json.loads(body)
+    finally:
+        writer.close()
+
+
+async def load(host, port, requests=DEFAULT_REQUESTS, concurrency=DEFAULT_CONCURRENCY,
+               distinct=DEFAULT_DISTINCT, seed=0):
+    pool = profile_pool(distinct, seed)
+    rng = np.random.default_rng(seed + 1)
+    bodies = [pool[i] for i in rng.integers(0, len(pool), requests)]
+    before = await _health(host, port)
+
+    latencies, errors, cursor = [], {}, [0]
+    started = time.perf_counter()
+    await asyncio.gather(*(_client(host, port, bodies, cursor, latencies, errors)
+                           for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - started
+    after = await _health(host, port)
+
+    ordered = sorted(latencies)
+
+    def percentile(q):
+        return round(ordered[min(len(ordered) - 1, int(len(ordered) * q))], 3)
+
+    return {
+        'requests': len(latencies),
+        'concurrency': concurrency,
+        'distinct_profiles': distinct,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+        'mean_ms': round(statistics.fmean(ordered), 3),
+        'errors': {str(k): v for k, v in sorted(errors.items())},
+        'computed': after['computed'] - before['computed'],
+        'coalesced': after['coalesced'] - before['coalesced'],
+    }
+
+
+def spawn_service(catalog_path, workers=None):
+    """Start `python -m engine.service` on a free port; returns (process, host, port)."""
+    command = [sys.executable, '-m', 'engine.service', '--port', '0', '-c', catalog_path]
+    if workers:
+        command += ['-w', str(workers)]
+    process = subprocess.Popen(command, stderr=subprocess.PIPE, text=True)
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    for line in process.stderr:
+        match = re.search(r'http://([^:]+):(\d+)', line)
+        if match:
+            # Keep draining so a chatty service never blocks on a full pipe
+            threading.Thread(target=process.stderr.read, daemon=True).start()
+            return process, match.group(1), int(match.group(2))
+        if time.monotonic() > deadline:
+            break
+    process.kill()
+    raise RuntimeError("engine.service did not start")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8080', help="running service to load")
+    parser.add_argument('--spawn', action='store_true', help="start a service for the run instead")
+    parser.add_argument('-c', '--catalog', default='skincare_products_fixed.csv', help="inventory CSV for --spawn")
+    parser.add_argument('--rows', type=int, help="with --spawn, serve a synthetic catalog of this many products")
+    parser.add_argument('-w', '--workers', type=int, help="with --spawn, service worker processes")
+    parser.add_argument('-n', '--requests', type=int, default=DEFAULT_REQUESTS)
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="open connections")
+    parser.add_argument('--distinct', type=int, default=DEFAULT_DISTINCT, help="size of the profile pool")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    process = None
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.spawn:
+            catalog_path = args.catalog
+            if args.rows:
+                catalog_path = os.path.join(tmp, f"synthetic_{args.rows}.csv")
+                synthetic_inventory(args.rows, args.seed).to_csv(catalog_path, index=False)
+            process, host, port = spawn_service(catalog_path, args.workers)
+        else:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port or 80
+        try:
+            report = asyncio.run(load(host, port, args.requests, args.concurrency, args.distinct, args.seed))
+        finally:
+            if process is not None:
+                process.terminate()
+                process.wait()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""Deterministic synthetic inventories for benchmarking and load tests.
+
+    python -m benchmarks.synthetic 100000 -o synthetic_100k.csv [--seed 0]
+
+Rows use the shipped file's header (misspellings included), the routine
+categories from CATEGORY_MAPPING plus some it doesn't list, concern
+vocabulary from CONCERN_KEYWORDS, and Yes/No cells written the way sellers
+write them ("No (Over-the-counter, ...)", "Yes with caution (...)"). The
+same (rows, seed) always produces the same file.
+"""
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+from engine.taxonomy import CATEGORY_MAPPING, CONCERN_KEYWORDS
+
+HEADER = (
+    'product_id', 'name', 'category', 'step', 'product_type',
+    'suitable_skin_types', 'safe_for_sensitive', 'primary_target',
+    'secondary_target', 'key_actives', 'contains_retinol', 'contains_acid',
+    'contains_vaitamin_c', 'prescripition_only', 'recommended_time',
+    'max_frequency', 'notes',
+)
+
+# Seen in real seller files but not in CATEGORY_MAPPING; the router
+# (engine/router.py) places some by their words and leaves the rest out
+UNMAPPED_CATEGORIES = (
+    "Exfoliating / Brightening / Body Scrub",
+    "Brightening / Hydrating / Cleansing",
+    "Moisturizer / Body Oil / Bath Oil",
+    "Exfoliating / Brightening / Texturizing",
+    "Scar & Stretch Mark Treatment / Moisturizing Oil",
+)
+UNMAPPED_SHARE = 0.15
+
+BRANDS = (
+    "PanOxyl", "Naturium", "Neutrogena", "CeraVe", "Nivea", "Palmer's", "SKIN1004",
+    "TONYMOLY", "The Ordinary", "FaceFacts", "Acwell", "Simple", "Garnier", "Vaseline",
+)
+DESCRIPTORS = (
+    "Hydro Boost", "Glow Getter", "Renewal", "Super Moisture", "Daily Clarifying",
+    "Barrier Repair", "Even Tone", "Calm & Restore", "Radiance", "Smoothing",
+)
+PRODUCTS = (
+    ("Foaming Wash", "Foaming Wash / Cleanser"),
+    ("Cleansing Gel", "Gel Cleanser"),
+    ("Exfoliating Toner", "Water-Based Liquid Exfoliating Toner"),
+    ("Essence Toner", "Hydrating Essence"),
+    ("Serum", "Lightweight Liquid Serum"),
+    ("Gel Cream", "Lightweight Gel-Cream Moisturizer"),
+    ("Night Cream", "Rich Night Moisturizer"),
+    ("UV Gel SPF 50+", "Sunscreen Gel"),
+    ("Body Lotion", "Lightweight Body Lotion"),
+    ("Body Wash", "Body Wash / Shower Gel"),
+    ("Body Oil", "Lightweight Dry Oil"),
+    ("Intimate Wash", "Feminine Wash"),
+)
+
+SKIN_TYPE_TEXT = (
+    "All skin types, especially dry, normal, combination (non-greasy, fast-absorbing)",
+    "All skin types, including sensitive (gentle, fragrance-free)",
+    "Oily, acne-prone, combination (oil-free, non-comedogenic)",
+    "Acne-prone, oily; generally not ideal for very dry skin",
+    "Dry, dehydrated, mature (rich, nourishing texture)",
+    "Normal to dry, sensitive (soothing, low-irritation formula)",
+    "Combination, normal (lightweight layering texture)",
+)
+SENSITIVE_TEXT = (
+    "Yes (dermatologist-tested, hypoallergenic, fragrance-free)",
+    "Yes with caution (gentle formula but contains AHAs; patch test recommended)",
+    "Yes with caution (derivative actives may tingle on very sensitive skin)",
+    "No (explicitly warns against use on very sensitive or broken skin)",
+    "Unclear - not stated by the manufacturer",
+)
+SENSITIVE_WEIGHTS = (0.35, 0.35, 0.15, 0.1, 0.05)
+RETINOL_TEXT = ("No", "Yes (Retinol or Retinyl Palmitate - gentle retinoid form for renewal)", "No (retinol-free)")
+RETINOL_WEIGHTS = (0.85, 0.1, 0.05)
+ACID_TEXT = ("No", "Yes (Glycolic Acid & Lactic Acid as AHAs for chemical exfoliation)",
+             "Yes (Salicylic Acid 2% BHA)", "No (no exfoliating acids)")
+ACID_WEIGHTS = (0.7, 0.15, 0.1, 0.05)
+VITAMIN_C_TEXT = ("No", "Yes (stable Vitamin C derivative for brightening/antioxidant benefits)",
+                  "No (Vitamin E as Tocopheryl Acetate for antioxidant benefits)")
+VITAMIN_C_WEIGHTS = (0.7, 0.25, 0.05)
+PRESCRIPTION_TEXT = ("No (Over-the-counter, affordable drugstore staple)",
+                     "No (Over-the-counter, widely available)",
+                     "Yes (prescription-strength tretinoin; requires a doctor)")
+PRESCRIPTION_WEIGHTS = (0.6, 0.38, 0.02)
+TIME_TEXT = (
+    "Anytime (AM/PM; in shower, lather and rinse; use daily)",
+    "PM (evening only; follow with moisturizer)",
+    "AM (every morning as the last step; reapply every 2 hours outdoors)",
+)
+FREQUENCY_TEXT = (
+    "1-2 times daily (morning and/or evening; gentle enough for daily use)",
+    "2-3 times weekly (build up slowly to avoid irritation)",
+    "As often as desired (daily or multiple times; no strict limit)",
+)
+STEP_TEXT = {
+    'Cleanse': "Cleanse (Step 1 in routine - massage onto damp skin and rinse)",
+    'Tone': "Tone (Step 2 in routine - after cleansing, before serums/moisturizer)",
+    'Treat': "Treat (Step 3 in routine - apply after cleansing/toner, before moisturizer)",
+    'Moisturize': "Moisturize (Step 4 in routine - seal in hydration)",
+    'Protect': "Protect (Final AM step - apply generously before sun exposure)",
+}
+FILLER_TERMS = ("everyday comfort", "softness", "general care", "fresh feel", "skin comfort")
+# Two carry the mojibake dashes real files have, so the cleanup runs too
+NOTE_TEXT = (
+    "A gentle, dermatologist-recommended formula \xe2\x80\x94 patch test before first use.",
+    "Loved for its lightweight feel; pair with sunscreen in the morning.",
+    "Can be drying on its own \xe2\x80\x93 follow with a good moisturizer.",
+    "Fragrance-free and suitable for daily use on face and body.",
+)
+
+# Every alternative in the concern regexes, e.g. "salicylic" or "vitamin c"
+CONCERN_TERMS = tuple(sorted({t for pattern in CONCERN_KEYWORDS.values() for t in pattern.split('|')}))
+
+
+def _pick(rng, options, n, weights=None):
+    options = np.asarray(options, dtype=object)
+    if weights is None:
+        return options[rng.integers(0, len(options), n)]
+    return options[rng.choice(len(options), n, p=np.asarray(weights) / sum(weights))]
+
+
+def _join(*parts, sep=''):
+    result = pd.Series(parts[0], dtype=object)
+    for part in parts[1:]:
+        result = result + sep + pd.Series(part, dtype=object)
+    return result.to_numpy(dtype=object)
+
+
+def _terms(rng, n, count, filler=0.2):
+    """Comma-separated concern terms; a `filler` share match no concern."""
+    parts = []
+    for _ in range(count):
+        terms = _pick(rng, CONCERN_TERMS, n)
+        plain = rng.random(n) < filler
+        terms[plain] = _pick(rng, FILLER_TERMS, int(plain.sum()))
+        parts.append(terms)
+    return _join(*parts, sep=', ')
+
+
+def synthetic_inventory(rows, seed=0):
+    """DataFrame of `rows` raw (string) inventory rows, in the shipped CSV's layout."""
+    rng = np.random.default_rng(seed)
+    n = rows
+
+    steps = tuple(CATEGORY_MAPPING)
+    step = _pick(rng, steps, n)
+    category = np.empty(n, dtype=object)
+    for name in steps:
+        mask = step == name
+        category[mask] = _pick(rng, CATEGORY_MAPPING[name], int(mask.sum()))
+    unmapped = rng.random(n) < UNMAPPED_SHARE
+    category[unmapped] = _pick(rng, UNMAPPED_CATEGORIES, int(unmapped.sum()))
+
+    product = rng.integers(0, len(PRODUCTS), n)
+    product_name = np.array([p[0] for p in PRODUCTS], dtype=object)[product]
+    product_type = np.array([p[1] for p in PRODUCTS], dtype=object)[product]
+    serial = rng.permutation(n)
+
+    frame = pd.DataFrame({
+        'product_id': _join(np.full(n, 'S', dtype=object), np.char.zfill(serial.astype(str), 7).astype(object)),
+        'name': _join(_pick(rng, BRANDS, n), _pick(rng, DESCRIPTORS, n), product_name, sep=' '),
+        'category': category,
+        'step': pd.Series(step).map(STEP_TEXT).to_numpy(dtype=object),
+        'product_type': product_type,
+        'suitable_skin_types': _pick(rng, SKIN_TYPE_TEXT, n),
+        'safe_for_sensitive': _pick(rng, SENSITIVE_TEXT, n, SENSITIVE_WEIGHTS),
+        'primary_target': _terms(rng, n, 2),
+        'secondary_target': _terms(rng, n, 3),
+        'key_actives': _terms(rng, n, 2, filler=0.5),
+        'contains_retinol': _pick(rng, RETINOL_TEXT, n, RETINOL_WEIGHTS),
+        'contains_acid': _pick(rng, ACID_TEXT, n, ACID_WEIGHTS),
+        'contains_vaitamin_c': _pick(rng, VITAMIN_C_TEXT, n, VITAMIN_C_WEIGHTS),
+        'prescripition_only': _pick(rng, PRESCRIPTION_TEXT, n, PRESCRIPTION_WEIGHTS),
+        'recommended_time': _pick(rng, TIME_TEXT, n),
+        'max_frequency': _pick(rng, FREQUENCY_TEXT, n),
+        'notes': _pick(rng, NOTE_TEXT, n),
+    }, columns=list(HEADER))
+    return frame
+
+
+def synthetic_csv(rows, seed=0):
+    """The same inventory as CSV bytes, ready for load_catalog_bytes."""
+    return synthetic_inventory(rows, seed).to_csv(index=False).encode('utf-8')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('rows', type=int)
+    parser.add_argument('-o', '--output', default='-', help="output CSV (default: stdout)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    frame = synthetic_inventory(args.rows, args.seed)
+    if args.output == '-':
+        frame.to_csv(sys.stdout, index=False)
+    else:
+        frame.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Headless core of the Skin Recommendation Engine.
+
+Nothing in this package imports Streamlit, so it can be used from the app,
+batch jobs and worker processes alike.
+"""
+from engine.catalog import (
+    Catalog,
+    cached_catalog,
+    clear_cache,
+    compile_catalog,
+    load_catalog,
+    load_catalog_bytes,
+)
+from engine.schema import EXPECTED_COLUMNS, SchemaError
+from engine.goals import NEXT_SKIN_GOALS, get_next_skin_goals
+from engine.routine import (
+    ROUTINE_STEPS,
+    build_alternatives,
+    build_routine,
+    conflict_free_swap,
+    get_caution_note,
+    get_filtered_df,
+    is_safe,
+    pick_product,
+    plan_routines,
+    routine_conflicts,
+    serialize_routine,
+)
+from engine.search import PAGE_SIZE, search_products
+from engine.similar import similar_products
+from engine.routine_cache import ROUTINE_CACHE, canonical_profile, lookup_routine
+
+__all__ = [
+    "Catalog",
+    "EXPECTED_COLUMNS",
+    "NEXT_SKIN_GOALS",
+    "PAGE_SIZE",
+    "ROUTINE_CACHE",
+    "ROUTINE_STEPS",
+    "SchemaError",
+    "build_alternatives",
+    "build_routine",
+    "cached_catalog",
+    "canonical_profile",
+    "clear_cache",
+    "compile_catalog",
+    "conflict_free_swap",
+    "get_caution_note",
+    "get_filtered_df",
+    "get_next_skin_goals",
+    "is_safe",
+    "load_catalog",
+    "load_catalog_bytes",
+    "lookup_routine",
+    "pick_product",
+    "plan_routines",
+    "routine_conflicts",
+    "search_products",
+    "serialize_routine",
+    "similar_products",
+]
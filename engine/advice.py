@@ -0,0 +1,172 @@
+"""Progress Tracker advice, resolved to products in the loaded catalog.
+
+The problems a customer reports map through PROBLEM_ACTIONS to advice
+actions. Each action names the routine steps and ingredients that address
+the problem, plus any flags a product must not carry (no acids for
+stinging skin, say). Products are found through the `ingredient_bits`
+column compiled at ingest (see engine/ingredients.py): each action's
+candidates are ranked once per catalog by how many of its ingredients they
+carry, then by product_id. A submission
+then walks those ranked rows through the same compiled safety, skin type
+and area flags `build_routine` uses, so suggestions are always safe for
+the profile.
+"""
+import numpy as np
+
+from engine import metrics
+from engine.flags import (ACID, NOT_FOR_SENSITIVE, RETINOL, SENSITIVE_CAUTION, SKIN_ALL, SKIN_TYPE_BITS,
+                          blocked_bits)
+from engine.ingredients import INGREDIENT_BITS, INGREDIENTS, ingredient_mask
+from engine.routine_cache import RoutineCache
+from engine.router import STEP_IDS
+
+# (action, advice, level, steps to draw swaps from, ingredients, flags a swap must not carry)
+# in display order; level "stop" is shown as an error and turns off every swap
+ADVICE_ACTIONS = (
+    ('hydrate', "Layer a **hydrating essence or serum** before moisturizer", 'tip',
+     ('Tone', 'Treat'), ('hyaluronic acid', 'glycerin', 'snail mucin', 'panthenol'), 0),
+    ('seal', "Consider a **richer night cream** or **occlusive** to lock in moisture", 'tip',
+     ('Moisturize',), ('ceramides', 'shea butter', 'cocoa butter', 'squalane', 'petrolatum'), 0),
+    ('smooth', "Try a **gentle exfoliant** (lactic acid, PHA or urea) 2–3 times a week", 'tip',
+     ('Tone', 'Treat', 'Moisturize'), ('lactic acid', 'pha', 'urea'), RETINOL | NOT_FOR_SENSITIVE),
+    ('purging', "Purging is normal with exfoliating actives — usually settles in **4–6 weeks**", 'tip',
+     (), (), 0),
+    ('slow_down', "Reduce frequency to **every other day**", 'tip', (), (), 0),
+    ('soothe', "Add soothing ingredients: **centella**, **panthenol**, **ceramides**", 'tip',
+     ('Tone', 'Treat', 'Moisturize'), ('centella', 'panthenol', 'ceramides', 'allantoin'),
+     RETINOL | ACID | NOT_FOR_SENSITIVE | SENSITIVE_CAUTION),
+    ('stop', "**Stop new products immediately** and consult a dermatologist if irritation persists.", 'stop',
+     (), (), 0),
+)
+
+# Reported problem -> advice actions it calls for
+PROBLEM_ACTIONS = {
+    "Still dry/tight": ('hydrate', 'seal'),
+    "Still dull": ('hydrate', 'seal'),
+    "Still rough texture": ('smooth',),
+    "Breakouts/purging": ('purging',),
+    "Irritation/stinging": ('slow_down', 'soothe'),
+    "New sensitivity": ('slow_down', 'soothe'),
+    "Worse than before": ('stop',),
+}
+
+# Actions left out when another one applies: no exfoliating irritated skin
+SUPPRESSED_BY = {'soothe': ('smooth',)}
+
+DEFAULT_SWAPS = 2
+
+# Ranked candidates checked per vectorized pass
+_CHUNK = 256
+
+_ACTIONS = {action[0]: action for action in ADVICE_ACTIONS}
+_STEP_NAMES = {step_id: step for step, step_id in STEP_IDS.items()}
+
+# Without a known profile every optional safety rule applies, and swaps
+# are for the face, as the routine form's default area is
+_UNKNOWN_PROFILE = ("Normal", True, True, True, "Face")
+
+INDEX_CACHE = RoutineCache(maxsize=8)
+
+
+class IngredientIndex:
+    """Each advice action's candidates in a catalog, ranked on first use."""
+
+    def __init__(self, catalog):
+        self.bits = catalog.df['ingredient_bits'].to_numpy()
+        self.step_ids = catalog.df['step_id'].to_numpy()
+        self.id_rank = catalog.df['id_rank'].to_numpy(dtype=np.int64)
+        self._ranked = {}
+
+    def ranked(self, action):
+        """Candidate rows for `action`: most of its ingredients first, then product_id."""
+        rows = self._ranked.get(action)
+        if rows is None:
+            _, _, _, steps, ingredients, _ = _ACTIONS[action]
+            wanted = ingredient_mask(*ingredients)
+            in_steps = np.isin(self.step_ids, [STEP_IDS[step] for step in steps])
+            rows = np.flatnonzero(in_steps & ((self.bits & wanted) != 0))
+            matched = self.bits[rows] & wanted
+            count = sum(((matched >> i) & 1).astype(np.int64) for i in range(len(INGREDIENTS)))
+            rows = rows[np.lexsort((self.id_rank[rows], -count))]
+            self._ranked[action] = rows
+        return rows
+
+
+def ingredient_index(catalog):
+    """The catalog's IngredientIndex, built on first use."""
+    def build():
+        with metrics.span('ingredient_index'):
+            return IngredientIndex(catalog)
+
+    return INDEX_CACHE.get_or_build(catalog.key, build)
+
+
+def advice_actions(problems):
+    """Advice actions the reported problems call for, in display order."""
+    wanted = {action for problem in problems for action in PROBLEM_ACTIONS.get(problem, ())}
+    for action in list(wanted):
+        wanted.difference_update(SUPPRESSED_BY.get(action, ()))
+    return [action for action, *_ in ADVICE_ACTIONS if action in wanted]
+
+
+def progress_advice(catalog, problems, profile=None, exclude=(), k=DEFAULT_SWAPS):
+    """[{action, text, level, swaps}] for the reported problems.
+
+    `profile` is (skin_type, is_sensitive, is_pregnant, using_prescription,
+    area), as on the routine form; without it every safety rule applies.
+    `swaps` lists up to k products per action as {product_id, name, step,
+    ingredients}, never a product in `exclude` (e.g. the current routine)
+    and never the same product twice.
+    """
+    actions = advice_actions(problems)
+    if not actions:
+        return []
+    skin_type, is_sensitive, is_pregnant, using_prescription, area = profile or _UNKNOWN_PROFILE
+    offer_swaps = catalog is not None and len(catalog) > 0 and not any(_ACTIONS[a][2] == 'stop' for a in actions)
+
+    with metrics.span('progress_advice'):
+        chosen = {}
+        if offer_swaps:
+            index = ingredient_index(catalog)
+            safety = catalog.df['safety_flags'].to_numpy()
+            skin = catalog.df['skin_flags'].to_numpy()
+            ids = catalog.df['product_id']
+            skin_bits = SKIN_TYPE_BITS.get(skin_type, SKIN_ALL)
+            blocked = blocked_bits(is_sensitive, is_pregnant, using_prescription, area)
+            taken = set(exclude)
+            for action in actions:
+                _, _, _, steps, ingredients, extra = _ACTIONS[action]
+                if not steps:
+                    continue
+                rows = index.ranked(action)
+                picks = []
+                for start in range(0, len(rows), _CHUNK):
+                    chunk = rows[start:start + _CHUNK]
+                    chunk = chunk[((safety[chunk] & (blocked | extra)) == 0) & ((skin[chunk] & skin_bits) != 0)]
+                    for row, product_id in zip(chunk, ids.iloc[chunk].tolist()):
+                        if product_id not in taken:
+                            taken.add(product_id)
+                            picks.append(row)
+                            if len(picks) == k:
+                                break
+                    if len(picks) == k:
+                        break
+                chosen[action] = picks
+
+        rows = sorted({row for picks in chosen.values() for row in picks})
+        records = dict(zip(rows, catalog.records(rows))) if rows else {}
+        advice = []
+        for action in actions:
+            _, text, level, _, ingredients, _ = _ACTIONS[action]
+            swaps = []
+            for row in chosen.get(action, ()):
+                record = records[row]
+                swaps.append({
+                    'product_id': record['product_id'],
+                    'name': record['name'],
+                    'step': _STEP_NAMES[int(index.step_ids[row])],
+                    'ingredients': [name for name in ingredients if index.bits[row] & INGREDIENT_BITS[name]],
+                })
+            advice.append({'action': action, 'text': text, 'level': level, 'swaps': swaps})
+    return advice
+
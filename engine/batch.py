@@ -0,0 +1,184 @@
+"""Generate routines for a file of customer profiles.
+
+    python -m engine.batch profiles.jsonl -c skincare_products_fixed.csv -o routines.jsonl
+
+Input is JSONL (one object per line) or CSV, with the fields in
+engine.profile.PROFILE_FIELDS plus an optional `id` that is echoed back.
+Output is one JSON object per profile, in input order:
+
+    {"id": ..., "routine": {step: {"product_id", "details"}}, "goals": [...]}
+
+or {"id": ..., "error": "..."} for a profile that can't be parsed, with
+{"line": n} instead of an id for a JSONL line that isn't an object. The
+catalog is compiled once in the parent; forked workers share it
+copy-on-write, and spawned ones load its snapshot instead of re-parsing.
+With --seller the catalog comes from the seller's live version in the
+catalog store instead, and every worker maps the same files.
+"""
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import metrics
+from engine.catalog import load_catalog
+from engine.goals import get_next_skin_goals
+from engine.profile import profile_from_record
+from engine.routine import build_routine, serialize_routine
+from engine.store import CatalogStore
+
+DEFAULT_CHUNK_SIZE = 256
+
+# Chunks in flight per worker; bounds memory however large the input is.
+_WINDOW_PER_WORKER = 4
+
+_worker_catalog = None
+
+
+class InvalidRecord:
+    """Stands in for an input line that isn't a profile object, so it still gets a result."""
+
+    def __init__(self, line, error):
+        self.line = line
+        self.error = error
+
+
+def read_profiles(path, fmt=None):
+    """Yield profile records from a JSONL or CSV file ('-' for stdin).
+
+    A JSONL line that doesn't parse, or holds anything but an object, is
+    yielded as an InvalidRecord with its line number.
+    """
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    f = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+    try:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    yield InvalidRecord(number, f"invalid JSON: {e}")
+                    continue
+                if not isinstance(record, dict):
+                    yield InvalidRecord(number, f"expected a JSON object, got {type(record).__name__}")
+                    continue
+                yield record
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def routine_record(catalog, record):
+    if isinstance(record, InvalidRecord):
+        return {'line': record.line, 'error': record.error}
+    if not isinstance(record, dict):
+        return {'id': None, 'error': f"expected a profile object, got {type(record).__name__}"}
+    result = {'id': record.get('id')}
+    try:
+        profile = profile_from_record(record)
+    except ValueError as e:
+        result['error'] = str(e)
+        return result
+    result['routine'] = serialize_routine(build_routine(catalog, *profile))
+    result['goals'] = get_next_skin_goals(profile[1])
+    return result
+
+
+def open_catalog(catalog_path, seller=None, store_root=None):
+    if seller:
+        return CatalogStore(store_root).get(seller)
+    return load_catalog(catalog_path)
+
+
+def _init_worker(catalog_path, seller, store_root):
+    global _worker_catalog
+    _worker_catalog = open_catalog(catalog_path, seller, store_root)
+
+
+def _run_chunk(records):
+    return [routine_record(_worker_catalog, r) for r in records]
+
+
+def _chunks(records, size):
+    records = iter(records)
+    while True:
+        chunk = list(itertools.islice(records, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def pool_context():
+    """Fork where available, so workers inherit the parent's compiled catalog."""
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return None
+
+
+def run_batch(catalog_path, records, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, seller=None, store_root=None):
+    """Yield one result per record, in order, spreading work over `workers` processes."""
+    workers = workers or os.cpu_count() or 1
+    catalog = open_catalog(catalog_path, seller, store_root)
+
+    if workers == 1:
+        for record in records:
+            yield routine_record(catalog, record)
+        return
+
+    with ProcessPoolExecutor(workers, mp_context=pool_context(),
+                             initializer=_init_worker, initargs=(catalog_path, seller, store_root)) as pool:
+        pending = deque()
+        for chunk in _chunks(records, chunk_size):
+            pending.append(pool.submit(_run_chunk, chunk))
+            if len(pending) >= workers * _WINDOW_PER_WORKER:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('profiles', help="JSONL or CSV of profiles ('-' for stdin)")
+    parser.add_argument('-c', '--catalog', default='skincare_products_fixed.csv', help="inventory CSV")
+    parser.add_argument('-o', '--output', default='-', help="output JSONL (default: stdout)")
+    parser.add_argument('-f', '--format', choices=('jsonl', 'csv'), help="input format (default: by extension)")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--seller', help="read the seller's published catalog instead of --catalog")
+    parser.add_argument('--store', help="catalog store directory (default: $SKINCARE_CATALOG_STORE)")
+    parser.add_argument('--metrics', metavar='FILE', help="write this process's stage timings (Prometheus text) here; use -w 1 to include every routine")
+    args = parser.parse_args(argv)
+    if args.metrics:
+        metrics.enable()
+
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    started = time.perf_counter()
+    count = 0
+    try:
+        for result in run_batch(args.catalog, read_profiles(args.profiles, args.format),
+                                args.workers, args.chunk_size, args.seller, args.store):
+            out.write(json.dumps(result, ensure_ascii=False) + '\n')
+            count += 1
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    rate = count / elapsed if elapsed else 0.0
+    print(f"{count} profiles in {elapsed:.2f}s ({rate:,.0f} profiles/s)", file=sys.stderr)
+    if args.metrics:
+        metrics.write(args.metrics)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,343 @@
+"""Compiled product catalog shared by every session in the process.
+
+A catalog is streamed in, validated and compiled once per content hash
+(see engine/ingest.py). The result is kept in a process-wide cache and persisted as a pickle snapshot
+next to the source CSV, so a cold start skips the CSV parse entirely.
+
+`Catalog.df` holds only product_id and the compiled integer and bitmask
+columns that filtering and ranking read. The seller's text lives in a
+TextStore (see engine/textstore.py) and is fetched per rendered product
+with `Catalog.records`; snapshots keep it in a memory-mapped Arrow file.
+"""
+import hashlib
+import io
+import os
+import pickle
+import tempfile
+import threading
+from collections import OrderedDict
+from glob import escape as glob_escape, glob
+
+import numpy as np
+import pandas as pd
+
+from engine import metrics
+from engine.flags import compile_flags
+from engine.ingredients import compile_ingredients, ingredient_table
+from engine.ingest import IngestReport, iter_inventory_chunks
+from engine.relevance import RELEVANCE_COLUMNS, compile_id_rank, compile_relevance
+from engine.router import compile_step_ids, group_steps
+from engine.schema import plan_columns
+from engine.search import build_search_index
+from engine.textstore import TextStore
+
+# Bump whenever compile_catalog changes what it produces (routing rules in
+# engine/taxonomy.py included), so snapshots written by an older build are
+# rebuilt instead of reused and older store versions are refused.
+SNAPSHOT_VERSION = 11
+
+# How many distinct catalogs (default file + seller uploads) stay resident.
+MAX_CATALOGS = 8
+
+# UTF-8 punctuation that was decoded as Latin-1 somewhere upstream.
+MOJIBAKE_REPLACEMENTS = {
+    '\xe2\x80\x94|\xe2\x80\x93': '—',
+    '\xe2\x80\x99': "'",
+    '\xe2\x80\x9c|\xe2\x80\x9d': '"',
+    '\xe2\x80\xa2': '•',
+    '\xe2\x84\xa2': '™',
+    '\xe2\x80\xa6': '…'
+}
+
+# Columns the engine derives from the seller's cells
+COMPILED_COLUMNS = ('step_id', 'safety_flags', 'skin_flags', 'ingredient_bits') + RELEVANCE_COLUMNS + ('id_rank',)
+
+_HASH_CHUNK = 1 << 20
+
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
+
+class Catalog:
+    """A normalized inventory plus everything precomputed from it."""
+
+    # (key, changed product_ids) of the catalog a delta was applied to
+    parent = None
+
+    # {step_id: row positions}, grouped on first use
+    _step_groups = None
+
+    # product_id -> row position, indexed on first use
+    _id_index = None
+
+    # Normalized ingredient table, parsed on first use
+    _ingredients = None
+
+    def __init__(self, df, key, report=None, search_index=None, text=None):
+        if text is None:
+            df, text = split_text(df)
+        self.df = df
+        self.text = text
+        self.key = key
+        self.report = report or IngestReport()
+        self.search_index = search_index
+
+    def __len__(self):
+        return len(self.df)
+
+    def step_rows(self, step_id):
+        """Ascending positions of the products routed to `step_id`."""
+        if self._step_groups is None:
+            self._step_groups = group_steps(self.df['step_id'].to_numpy())
+        return self._step_groups.get(step_id, _NO_ROWS)
+
+    def positions(self, product_ids):
+        """Row positions of `product_ids`, -1 for any not in the catalog."""
+        if self._id_index is None:
+            self._id_index = pd.Index(self.df['product_id'])
+        return self._id_index.get_indexer(list(product_ids))
+
+    @property
+    def ingredients(self):
+        """(row, product_id, ingredient, percent) per listed active (see engine/ingredients.py)."""
+        if self._ingredients is None:
+            listed = self.df[['product_id']]
+            if 'key_actives' in self.text.columns:
+                listed = listed.assign(key_actives=self.text.column('key_actives').to_numpy())
+            self._ingredients = ingredient_table(listed)
+        return self._ingredients
+
+    def records(self, positions):
+        """Source cells of the products at `positions`, one dict each."""
+        return self.text.records(positions)
+
+    def frame(self, positions=None):
+        """Source columns as a DataFrame, for every product or just `positions`."""
+        return self.text.frame(positions)
+
+    @property
+    def notices(self):
+        return self.report.notices
+
+    @property
+    def issues(self):
+        return self.report.issues
+
+
+def split_text(df):
+    """(hot frame, TextStore) for a compiled frame.
+
+    The hot frame keeps product_id and the compiled columns; every source
+    column, product_id included, goes to the text store.
+    """
+    hot = ['product_id'] + [c for c in COMPILED_COLUMNS if c in df.columns]
+    text = TextStore.from_frame(df[[c for c in df.columns if c not in COMPILED_COLUMNS]])
+    return df[hot].reset_index(drop=True), text
+
+
+def content_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_key(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def compile_rows(df):
+    """Row-local compilation, run on each chunk of a file as it is read."""
+    # Mojibake cleanup
+    if 'notes' in df.columns:
+        with metrics.span('notes_cleanup'):
+            df['notes'] = df['notes'].astype(str).replace(MOJIBAKE_REPLACEMENTS, regex=True)
+
+    # Ensure category column exists
+    if 'category' not in df.columns:
+        df['category'] = ""
+    df = compile_step_ids(df)
+
+    with metrics.span('compile_flags'):
+        df = compile_flags(df)
+    with metrics.span('compile_relevance'):
+        df = compile_relevance(df)
+    with metrics.span('compile_ingredients'):
+        df = compile_ingredients(df)
+    return df
+
+
+def finish_catalog(chunks, key, report=None):
+    """Join compiled chunks and build the catalog-wide indexes."""
+    df = pd.concat(chunks, ignore_index=True)
+    df = compile_id_rank(df)
+    with metrics.span('search_index'):
+        search_index = build_search_index(df)
+    return Catalog(df, key, report, search_index=search_index)
+
+
+def compile_catalog(df, key):
+    """Compile an inventory frame that is already in memory."""
+    report = IngestReport()
+    renames, dropped, notices = plan_columns(df.columns)
+    report.notices.extend(notices)
+    df = df.drop(columns=dropped).rename(columns=renames).reset_index(drop=True)
+    return finish_catalog([compile_rows(df)], key, report)
+
+
+def ingest_catalog(raw, key, total_bytes=None, progress=None):
+    """Stream a CSV from a binary file object straight into a compiled catalog."""
+    report = IngestReport()
+    chunks = [compile_rows(chunk)
+              for chunk in iter_inventory_chunks(raw, report, total_bytes, progress)]
+    return finish_catalog(chunks, key, report)
+
+
+# ────────────────────────────────────────────────
+# Process-wide cache + on-disk snapshots
+# ────────────────────────────────────────────────
+
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+_catalogs = OrderedDict()
+_path_stamps = {}
+
+
+def _cached(key):
+    with _lock:
+        catalog = _catalogs.get(key)
+        if catalog is not None:
+            _catalogs.move_to_end(key)
+        return catalog
+
+
+def _remember(catalog):
+    with _lock:
+        _catalogs[catalog.key] = catalog
+        _catalogs.move_to_end(catalog.key)
+        while len(_catalogs) > MAX_CATALOGS:
+            _catalogs.popitem(last=False)
+    return catalog
+
+
+def snapshot_path(csv_path):
+    folder, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(folder, f".{name}.catalog.pkl")
+
+
+def text_path(snapshot, key):
+    """Arrow file holding the text of the snapshot written for `key`."""
+    return f"{snapshot[:-len('.pkl')]}.{key[:16]}.text.arrow"
+
+
+def read_snapshot(path, key):
+    try:
+        with open(path, 'rb') as f:
+            payload = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError, KeyError, ValueError):
+        # A missing or unreadable text file fails the load as well
+        return None
+    if payload.get('version') != SNAPSHOT_VERSION or payload.get('key') != key:
+        return None
+    catalog = payload['catalog']
+    if len(catalog.text) != len(catalog.df):
+        return None
+    return catalog
+
+
+def write_snapshot(path, catalog):
+    """Pickle `catalog` to `path`, its text to a mapped Arrow file beside it.
+
+    From then on `catalog` reads its text through the mapping too.
+    """
+    payload = {'version': SNAPSHOT_VERSION, 'key': catalog.key, 'catalog': catalog}
+    folder = os.path.dirname(path)
+    text_file = text_path(path, catalog.key)
+    try:
+        catalog.text = catalog.text.write(text_file)
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix='.catalog-', suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            pickle.dump(payload, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except OSError:
+        # Read-only checkout: the in-memory cache still works.
+        return
+    # Text of older snapshots; processes that still map one keep their pages
+    for stale in glob(f"{glob_escape(path[:-len('.pkl')])}.*.text.arrow"):
+        if stale != text_file:
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def _build(key, ingest, snapshot=None):
+    catalog = _cached(key)
+    if catalog is not None:
+        metrics.count('catalog_cache', result='hit')
+        return catalog
+    with _build_lock:
+        # Another session may have finished the same build while we waited.
+        catalog = _cached(key)
+        if catalog is not None:
+            metrics.count('catalog_cache', result='hit')
+            return catalog
+        if snapshot:
+            with metrics.span('snapshot_read'):
+                catalog = read_snapshot(snapshot, key)
+        if catalog is not None:
+            metrics.count('catalog_cache', result='snapshot')
+        else:
+            metrics.count('catalog_cache', result='miss')
+            with metrics.span('catalog_ingest'):
+                catalog = ingest()
+            if snapshot:
+                write_snapshot(snapshot, catalog)
+        return _remember(catalog)
+
+
+def load_catalog_bytes(data, progress=None):
+    """Compiled catalog for an uploaded CSV, keyed on its bytes."""
+    key = content_key(data)
+    return _build(key, lambda: ingest_catalog(io.BytesIO(data), key, len(data), progress))
+
+
+def load_catalog(path, progress=None):
+    """Compiled catalog for a CSV on disk.
+
+    The file is only re-hashed when its mtime or size changes; the snapshot
+    next to it is reused as long as the content hash still matches.
+    `progress(fraction, rows_read)` is called while a file is ingested.
+    """
+    path = os.path.abspath(path)
+    info = os.stat(path)
+    stamp = (info.st_mtime_ns, info.st_size)
+
+    known = _path_stamps.get(path)
+    if known and known[0] == stamp:
+        catalog = _cached(known[1])
+        if catalog is not None:
+            metrics.count('catalog_cache', result='hit')
+            return catalog
+
+    with metrics.span('file_hash'):
+        key = file_key(path)
+
+    def ingest():
+        with open(path, 'rb') as f:
+            return ingest_catalog(f, key, info.st_size, progress)
+
+    catalog = _build(key, ingest, snapshot_path(path))
+    _path_stamps[path] = (stamp, key)
+    return catalog
+
+
+def cached_catalog(key):
+    """Catalog already loaded in this process under `key`, or None."""
+    return _cached(key)
+
+
+def clear_cache():
+    with _lock:
+        _catalogs.clear()
+        _path_stamps.clear()
@@ -0,0 +1,199 @@
+"""Patch a compiled catalog with a handful of changed products.
+
+Upserts and deletes are keyed on product_id. Only the changed rows are
+validated and compiled (notes cleanup, flags, relevance); the id ranks and
+the search index are patched around them, and routines cached for the old
+catalog carry over to the new one unless a changed product could alter them.
+
+The old catalog is left untouched, so sessions that are mid-request keep a
+consistent view; the patched one has its own key and can be published to
+the catalog store (see engine/store.py) like any other.
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from engine.catalog import Catalog, compile_rows, split_text
+from engine.flags import profile_mask
+from engine.ingest import IngestReport, check_verdicts
+from engine.relevance import RELEVANCE_COLUMNS, patch_id_rank, relevance_columns
+from engine.routine_cache import ROUTINE_CACHE
+from engine.schema import plan_columns
+from engine.search import patch_search_index
+from engine.router import STEP_IDS
+
+_COLUMN_INDEX = {column: i for i, column in enumerate(RELEVANCE_COLUMNS)}
+
+
+def _upsert_rows(catalog, upserts, report):
+    """Validated, compiled new versions of the upserted products.
+
+    Cells left blank keep the product's current value, so an upsert can
+    carry just product_id and the fields that changed. Issue line numbers
+    count as if the rows were a CSV with a header.
+    """
+    frame = pd.DataFrame(upserts, dtype=str)
+    renames, dropped, notices = plan_columns(frame.columns, partial=True)
+    report.notices.extend(notices)
+    frame = frame.drop(columns=dropped).rename(columns=renames).reset_index(drop=True)
+
+    columns = catalog.text.columns
+    unknown = [c for c in frame.columns if c not in columns]
+    if unknown:
+        report.notices.append(f"Ignored column(s) not in the catalog: {', '.join(unknown)}.")
+        frame = frame.drop(columns=unknown)
+
+    ids = frame['product_id'].str.strip()
+    frame['product_id'] = ids
+    bad = ids.isna() | (ids == '')
+    for record in np.flatnonzero(bad.to_numpy()):
+        report.add_issue(int(record) + 2, "missing product_id")
+
+    # Later rows for the same product win
+    repeated = ~bad & ids.duplicated(keep='last')
+    for record in np.flatnonzero(repeated.to_numpy()):
+        report.add_issue(int(record) + 2, f"duplicate product_id {ids[record]!r} (last one kept)")
+    bad |= repeated
+
+    position = pd.Index(catalog.df['product_id']).get_indexer(ids)
+    existing = pd.Series(position >= 0, index=frame.index)
+    if 'name' in frame.columns:
+        nameless = frame['name'].isna() | (frame['name'].str.strip() == '')
+    else:
+        nameless = pd.Series(True, index=frame.index)
+    new_without_name = ~bad & ~existing & nameless
+    for record in np.flatnonzero(new_without_name.to_numpy()):
+        report.add_issue(int(record) + 2, f"missing name for new product {ids[record]!r}")
+    bad |= new_without_name
+
+    check_verdicts(frame, report, bad)
+    good = ~bad.to_numpy()
+    frame = frame[good].reset_index(drop=True)
+    position = position[good]
+    existing = position >= 0
+
+    # Only the text of the products being replaced is read
+    source = catalog.frame(position[existing])
+    current = pd.DataFrame(index=frame.index, columns=columns)
+    current.iloc[np.flatnonzero(existing)] = source[columns].to_numpy()
+    rows = frame.reindex(columns=columns).combine_first(current)[columns]
+    rows = rows.astype(source.dtypes.to_dict())
+    return compile_rows(rows)
+
+
+def _delta_key(catalog, rows, deleted):
+    digest = hashlib.sha256(catalog.key.encode())
+    digest.update(pd.util.hash_pandas_object(rows, index=False).to_numpy().tobytes())
+    digest.update('\0'.join(sorted(deleted)).encode())
+    return digest.hexdigest()
+
+
+def _unaffected(patched, removed, added):
+    """`keep(profile, routine)` for RoutineCache.carry_over.
+
+    A cached routine survives unless it picked a changed product, a new
+    version that passes the profile's filter would outrank a step's pick
+    (or fill an empty step), or the products that went away may have been
+    all that kept the routine from coming back empty.
+    """
+    changed_ids = set(removed['product_id'])
+    added_step_ids = added['step_id'].to_numpy()
+    added_steps = {step: added_step_ids == step_id for step, step_id in STEP_IDS.items()}
+    added_relevance = added[list(RELEVANCE_COLUMNS)].to_numpy(dtype=np.int64)
+    added_rank = added['id_rank'].to_numpy(dtype=np.int64)
+    relevance = id_rank = positions = None
+    masks = {}
+
+    def rank_key(rows_relevance, rank, step, concerns):
+        # Same ordering as pick_product: Treat by concern score, then id
+        key = -rank
+        if step == 'Treat' and concerns:
+            key = key + (rows_relevance[..., [_COLUMN_INDEX[c] for c in relevance_columns(concerns)]]
+                         .sum(axis=-1) << 32)
+        return key
+
+    def keep(profile, routine):
+        nonlocal relevance, id_rank, positions
+        skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area = profile
+        group = (skin_type, is_sensitive, is_pregnant, using_prescription, area)
+        if group not in masks:
+            masks[group] = (profile_mask(removed, *group).any(), profile_mask(added, *group))
+        removed_matched, added_matched = masks[group]
+
+        if not routine:
+            return not added_matched.any()
+        picks = [product_id for _, product_id in routine.values() if product_id is not None]
+        if any(product_id in changed_ids for product_id in picks):
+            return False
+        if not picks and removed_matched:
+            return False
+
+        for step, (_, product_id) in routine.items():
+            candidates = added_matched & added_steps.get(step, False)
+            if not candidates.any():
+                continue
+            if product_id is None:
+                return False
+            if positions is None:
+                relevance = patched[list(RELEVANCE_COLUMNS)].to_numpy(dtype=np.int64)
+                id_rank = patched['id_rank'].to_numpy(dtype=np.int64)
+                positions = pd.Index(patched['product_id'])
+            at = positions.get_loc(product_id)
+            best = rank_key(added_relevance[candidates], added_rank[candidates], step, concerns).max()
+            if best > rank_key(relevance[at], id_rank[at], step, concerns):
+                return False
+        return True
+
+    return keep
+
+
+def apply_delta(catalog, upserts=None, deletes=(), report=None):
+    """Catalog with `upserts` (rows of cells) written and `deletes` removed.
+
+    Problems with individual rows go to `report` and the rows are skipped.
+    Returns the original catalog if nothing changed.
+    """
+    report = report if report is not None else IngestReport()
+    df = catalog.df
+    if upserts is None or not len(upserts):
+        rows = pd.concat([df.iloc[:0], catalog.frame([]).drop(columns='product_id')], axis=1)
+    else:
+        rows = _upsert_rows(catalog, upserts, report)
+
+    deleted = {str(i).strip() for i in deletes}
+    ids = df['product_id']
+    unknown = deleted.difference(ids[ids.isin(deleted)])
+    if unknown:
+        report.notices.append(f"{len(unknown)} product_id(s) to delete were not in the catalog.")
+    deleted -= unknown
+    deleted -= set(rows['product_id'])
+
+    changed = ids.isin(deleted | set(rows['product_id'])).to_numpy()
+    if not changed.any() and rows.empty:
+        return catalog
+
+    kept = ~changed
+    hot_rows, text_rows = split_text(rows)
+    patched = pd.concat([df[kept], hot_rows], ignore_index=True)
+    text = catalog.text.take(np.flatnonzero(kept)).concat(text_rows)
+    patched['id_rank'] = patch_id_rank(df['id_rank'].to_numpy(), ids.array, kept, rows['product_id'].tolist())
+
+    row_map = np.full(len(df), -1, dtype=np.int64)
+    row_map[kept] = np.arange(kept.sum())
+    search_index = patch_search_index(catalog.search_index, row_map, rows,
+                                      patched['id_rank'].to_numpy(dtype=np.int64))
+
+    key = _delta_key(catalog, rows, deleted)
+    result = Catalog(patched, key, catalog.report, search_index=search_index, text=text)
+    result.parent = (catalog.key, sorted(deleted | set(rows['product_id'])))
+    carry_over_routines(catalog, result)
+    return result
+
+
+def carry_over_routines(old, new):
+    """Reuse `old`'s cached routines for `new`, a delta applied to it."""
+    changed_ids = new.parent[1]
+    removed = old.df[old.df['product_id'].isin(changed_ids)]
+    added = new.df[new.df['product_id'].isin(changed_ids)]
+    return ROUTINE_CACHE.carry_over(old.key, new.key, _unaffected(new.df, removed, added))
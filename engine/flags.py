@@ -0,0 +1,133 @@
+"""Safety, area and skin-type flags compiled from the free-text columns.
+
+Inventory cells look like "No (Over-the-counter, ...)" or "Yes with caution
+(...)", so every Yes/No column is read by its leading verdict. The result is
+packed into two small integer columns at ingest; filtering a profile is then
+a couple of NumPy mask ANDs instead of a row-wise apply plus regex scans.
+"""
+import re
+
+import numpy as np
+
+# Bits in the `safety_flags` column. A profile blocks some of them; a
+# product is kept only if it carries none of the blocked bits.
+RETINOL = 1
+ACID = 2
+PRESCRIPTION = 4
+NOT_FOR_SENSITIVE = 8
+SENSITIVE_CAUTION = 16
+NOT_FACE = 32
+NOT_BODY = 64
+
+# Bits in the `skin_flags` column. A product is kept if it carries any of
+# the bits the profile's skin type accepts.
+SKIN_ALL = 1
+SKIN_OILY = 2
+SKIN_ACNE_PRONE = 4
+SKIN_DRY = 8
+SKIN_UNKNOWN = 0xFF
+
+SKIN_TYPE_BITS = {
+    "Oily": SKIN_ALL | SKIN_OILY | SKIN_ACNE_PRONE,
+    "Dry": SKIN_ALL | SKIN_DRY,
+}
+
+NOT_FACE_PATTERN = 'body|intimate|feminine|femfresh'
+BODY_PATTERN = 'body'
+
+_YES = re.compile(r'\s*(yes|y|true|1)\b', re.IGNORECASE)
+_NO = re.compile(r'\s*(no|n|false|0)\b', re.IGNORECASE)
+
+
+def is_yes(value):
+    return isinstance(value, str) and _YES.match(value) is not None
+
+
+def is_no(value):
+    return isinstance(value, str) and _NO.match(value) is not None
+
+
+def parse_verdicts(values):
+    """(yes, no) boolean arrays for a column of free-text Yes/No cells."""
+    text = values.astype(str)
+    yes = text.str.match(_YES.pattern, case=False).to_numpy(dtype=bool)
+    no = text.str.match(_NO.pattern, case=False).to_numpy(dtype=bool)
+    return yes, no
+
+
+def _column(df, name):
+    if name in df.columns:
+        return df[name].astype(str)
+    return None
+
+
+def _bits(mask, bit):
+    return np.where(mask, bit, 0).astype(np.uint8)
+
+
+def compile_flags(df):
+    """Add the packed `safety_flags` and `skin_flags` columns to a normalized frame."""
+    n = len(df)
+    flags = np.zeros(n, dtype=np.uint8)
+
+    for name, bit in (('contains_retinol', RETINOL),
+                      ('contains_acid', ACID),
+                      ('prescription_only', PRESCRIPTION)):
+        col = _column(df, name)
+        if col is not None:
+            flags |= _bits(parse_verdicts(col)[0], bit)
+
+    sensitive = _column(df, 'safe_for_sensitive')
+    if sensitive is not None:
+        flags |= _bits(parse_verdicts(sensitive)[1], NOT_FOR_SENSITIVE)
+        flags |= _bits(sensitive.str.contains('caution', case=False, regex=False).to_numpy(dtype=bool),
+                       SENSITIVE_CAUTION)
+
+    names = df['name'].str.lower()
+    flags |= _bits(names.str.contains(NOT_FACE_PATTERN, na=False).to_numpy(dtype=bool), NOT_FACE)
+    flags |= _bits(~names.str.contains(BODY_PATTERN, na=False).to_numpy(dtype=bool), NOT_BODY)
+
+    skin = np.full(n, SKIN_UNKNOWN, dtype=np.uint8)
+    types = df['suitable_skin_types'] if 'suitable_skin_types' in df.columns else None
+    if types is not None:
+        known = types.notna().to_numpy()
+        bits = np.zeros(n, dtype=np.uint8)
+        for pattern, bit in (('All', SKIN_ALL), ('Oily', SKIN_OILY),
+                             ('Acne-prone', SKIN_ACNE_PRONE), ('Dry', SKIN_DRY)):
+            bits |= _bits(types.str.contains(pattern, case=False, regex=False, na=False).to_numpy(dtype=bool), bit)
+        skin[known] = bits[known]
+
+    df['safety_flags'] = flags
+    df['skin_flags'] = skin
+    return df
+
+
+def area_bits(area):
+    if area == "Face":
+        return NOT_FACE
+    if area == "Body":
+        return NOT_BODY
+    return 0
+
+
+def blocked_bits(is_sensitive=False, is_pregnant=False, using_prescription=False, area=None):
+    blocked = 0
+    if is_pregnant:
+        blocked |= RETINOL | PRESCRIPTION
+    if using_prescription:
+        blocked |= RETINOL | ACID
+    else:
+        # Prescription-only products are for shoppers already under a prescriber's care
+        blocked |= PRESCRIPTION
+    if is_sensitive:
+        blocked |= NOT_FOR_SENSITIVE
+    return blocked | area_bits(area)
+
+
+def profile_mask(df, skin_type, is_sensitive, is_pregnant, using_prescription, area):
+    """Boolean array of the products a profile may be recommended."""
+    blocked = blocked_bits(is_sensitive, is_pregnant, using_prescription, area)
+    accepted = SKIN_TYPE_BITS.get(skin_type, SKIN_ALL)
+    keep = (df['safety_flags'].to_numpy() & blocked) == 0
+    keep &= (df['skin_flags'].to_numpy() & accepted) != 0
+    return keep
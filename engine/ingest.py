@@ -0,0 +1,176 @@
+"""Chunked, validating reader for inventory CSVs of any size.
+
+The file is read CHUNK_ROWS records at a time. Each chunk gets its headers
+mapped through engine.schema, its cells coerced to text and its rows
+validated. Bad rows are dropped and reported with their line number, and
+the clean chunk is handed on to be compiled before the next one is read.
+Line numbers assume one physical line per record, which holds unless a
+quoted cell contains a newline.
+"""
+import itertools
+import re
+import warnings
+
+import pandas as pd
+
+from engine import metrics
+from engine.flags import parse_verdicts
+from engine.schema import REQUIRED_COLUMNS, YES_NO_COLUMNS, SchemaError, plan_columns
+
+CHUNK_ROWS = 50_000
+
+# Issues kept for display; the report still counts every one.
+MAX_ISSUES = 1000
+
+_SKIPPED_LINE = re.compile(r'Skipping line (\d+): (.*)')
+
+
+class IngestIssue:
+    def __init__(self, line, message):
+        self.line = line
+        self.message = message
+
+    def __repr__(self):
+        return f"IngestIssue(line={self.line}, message={self.message!r})"
+
+
+class IngestReport:
+    """What happened while reading one file."""
+
+    def __init__(self):
+        self.notices = []
+        self.issues = []
+        self.issue_count = 0
+        self.rows_read = 0
+        self.rows_kept = 0
+
+    def add_issue(self, line, message):
+        self.issue_count += 1
+        if len(self.issues) < MAX_ISSUES:
+            self.issues.append(IngestIssue(line, message))
+
+
+class _CountingReader:
+    """Binary file wrapper that tracks how many bytes pandas has consumed."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def _parser_issues(caught, report):
+    """Record the lines pandas skipped as malformed and return their numbers."""
+    skipped = []
+    for warning in caught:
+        for text in str(warning.message).splitlines():
+            match = _SKIPPED_LINE.match(text.strip())
+            if match:
+                skipped.append(int(match.group(1)))
+                report.add_issue(skipped[-1], match.group(2))
+    return skipped
+
+
+def _record_line(record, skipped_lines):
+    # Header is line 1; every malformed line skipped so far pushes the
+    # record one line further down the file.
+    line = record + 2
+    for skipped in skipped_lines:
+        if skipped > line:
+            break
+        line += 1
+    return line
+
+
+def _report_rows(report, records, mask, messages, skipped_lines):
+    for record, message in zip(records[mask.to_numpy()], messages):
+        report.add_issue(_record_line(int(record), skipped_lines), message)
+
+
+def check_verdicts(chunk, report, bad=None, skipped_lines=()):
+    """Report Yes/No cells that will be read as No because they are neither."""
+    records = chunk.index.to_numpy()
+    for column in YES_NO_COLUMNS:
+        if column not in chunk.columns:
+            continue
+        values = chunk[column]
+        yes, no = parse_verdicts(values)
+        unclear = values.notna() & ~(yes | no)
+        if bad is not None:
+            unclear &= ~bad
+        _report_rows(report, records, unclear,
+                     (f"{column} {v[:40]!r} is neither Yes nor No; read as No" for v in values[unclear]),
+                     skipped_lines)
+
+
+def _validate(chunk, report, seen_ids, skipped_lines):
+    """Drop and report unusable rows; note cells that will be misread."""
+    records = chunk.index.to_numpy()
+    bad = pd.Series(False, index=chunk.index)
+
+    for column in REQUIRED_COLUMNS:
+        missing = chunk[column].isna() | (chunk[column].str.strip() == '')
+        _report_rows(report, records, missing, itertools.repeat(f"missing {column}"), skipped_lines)
+        bad |= missing
+
+    ids = chunk['product_id'].str.strip()
+    duplicate = ~bad & (ids.duplicated() | ids.isin(seen_ids))
+    _report_rows(report, records, duplicate,
+                 (f"duplicate product_id {i!r} (first one kept)" for i in ids[duplicate]), skipped_lines)
+    bad |= duplicate
+    chunk['product_id'] = ids
+
+    check_verdicts(chunk, report, bad, skipped_lines)
+
+    kept = chunk[~bad]
+    seen_ids.update(kept['product_id'])
+    return kept
+
+
+def iter_inventory_chunks(raw, report, total_bytes=None, progress=None, chunk_rows=CHUNK_ROWS):
+    """Yield validated inventory chunks from a binary file object.
+
+    `progress(fraction, rows_read)` is called after every chunk when the
+    total size is known. Raises SchemaError for a file with no usable header.
+    """
+    source = _CountingReader(raw)
+    try:
+        reader = pd.read_csv(source, encoding='utf-8', dtype=str, on_bad_lines='warn', chunksize=chunk_rows)
+    except pd.errors.EmptyDataError:
+        raise SchemaError("The file is empty.")
+
+    plan = None
+    seen_ids = set()
+    skipped_lines = []
+    with reader:
+        while True:
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter('always', pd.errors.ParserWarning)
+                try:
+                    with metrics.span('csv_parse'):
+                        chunk = next(reader)
+                except StopIteration:
+                    break
+            skipped_lines.extend(_parser_issues(caught, report))
+
+            if plan is None:
+                plan = plan_columns(chunk.columns)
+                report.notices.extend(plan[2])
+            renames, dropped, _ = plan
+            chunk = chunk.drop(columns=dropped).rename(columns=renames)
+
+            report.rows_read += len(chunk)
+            with metrics.span('validate'):
+                chunk = _validate(chunk, report, seen_ids, skipped_lines)
+            report.rows_kept += len(chunk)
+
+            if progress and total_bytes:
+                progress(min(source.bytes_read / total_bytes, 1.0), report.rows_read)
+            yield chunk
+
+    if plan is None or report.rows_read == 0:
+        raise SchemaError("The file has a header but no rows.")
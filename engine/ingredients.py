@@ -0,0 +1,133 @@
+"""Actives and concentrations parsed from `key_actives`, compiled at ingest.
+
+Cells look like "Glycolic Acid 7% (AHA from sugarcane; ...), Niacinamide
+(...)". Only the listed names count: the notes in parentheses are dropped
+before matching, so "Snail Secretion Filtrate (... glycolic traces ...)" is
+not read as an acid. Each product gets a uint64 `ingredient_bits` column
+with one bit per INGREDIENT_KEYWORDS entry. `ingredient_table` gives the
+normalized (product, ingredient, percent) rows for the same matches.
+
+Routine interactions are rules over groups of those bits. Checking a
+routine, or every combination of top-k candidates at once, takes a few
+bitwise ops per rule across the steps (see `conflict_bits`).
+"""
+import numpy as np
+import pandas as pd
+
+from engine.taxonomy import INGREDIENT_KEYWORDS
+
+INGREDIENTS = tuple(INGREDIENT_KEYWORDS)
+INGREDIENT_BITS = {name: 1 << i for i, name in enumerate(INGREDIENTS)}
+
+
+def ingredient_mask(*names):
+    return np.uint64(sum(INGREDIENT_BITS[name] for name in names))
+
+
+RETINOIDS = ingredient_mask('retinol', 'retinyl esters', 'retinal', 'tretinoin', 'adapalene')
+EXFOLIATING_ACIDS = ingredient_mask('glycolic acid', 'lactic acid', 'mandelic acid', 'salicylic acid', 'aha blend')
+BENZOYL_PEROXIDE = ingredient_mask('benzoyl peroxide')
+VITAMIN_C = ingredient_mask('vitamin c')
+
+# (conflict, bits one product carries, bits another product carries, advice)
+# Actives combined within one product are the maker's formulation, not a conflict.
+CONFLICTS = (
+    ('retinoid_acid', RETINOIDS, EXFOLIATING_ACIDS,
+     "Retinoids and exfoliating acids (AHA/BHA) together can irritate — use them on alternate nights."),
+    ('bpo_vitamin_c', BENZOYL_PEROXIDE, VITAMIN_C,
+     "Benzoyl peroxide oxidizes vitamin C — use vitamin C in the morning and benzoyl peroxide at night."),
+    ('bpo_retinoid', BENZOYL_PEROXIDE, RETINOIDS,
+     "Benzoyl peroxide can deactivate retinoids — apply them at different times of day."),
+    ('double_retinoid', RETINOIDS, RETINOIDS,
+     "Two retinoid products — keep just one to avoid over-exfoliating."),
+)
+
+_NUMBER = r'(\d+(?:\.\d+)?)'
+
+
+def listed_actives(key_actives):
+    """Lower-cased key_actives with the parenthesized notes removed."""
+    text = key_actives.fillna('').astype(str).str.lower()
+    # Two passes cover one level of nested parentheses
+    for _ in range(2):
+        text = text.str.replace(r'\([^()]*\)', '', regex=True)
+    return text
+
+
+def _key_actives(df):
+    if 'key_actives' in df.columns:
+        return df['key_actives']
+    return pd.Series('', index=df.index, dtype=object)
+
+
+def compile_ingredients(df):
+    """Add the `ingredient_bits` column; each row is parsed on its own."""
+    text = listed_actives(_key_actives(df))
+    bits = np.zeros(len(df), dtype=np.uint64)
+    for name, pattern in INGREDIENT_KEYWORDS.items():
+        found = text.str.contains(pattern, regex=True).to_numpy(dtype=bool)
+        bits[found] |= np.uint64(INGREDIENT_BITS[name])
+    df['ingredient_bits'] = bits
+    return df
+
+
+def ingredient_table(df):
+    """(row, product_id, ingredient, percent) for every active a product lists.
+
+    `percent` is the concentration written next to the name ("Niacinamide
+    10%", "7% Lactic Acid"), NaN if none is given. Rows are in product
+    order, then INGREDIENTS order.
+    """
+    text = listed_actives(_key_actives(df))
+    ids = df['product_id'].to_numpy()
+    parts = []
+    for code, (name, pattern) in enumerate(INGREDIENT_KEYWORDS.items()):
+        rows = np.flatnonzero(text.str.contains(pattern, regex=True).to_numpy(dtype=bool))
+        if not len(rows):
+            continue
+        found = text.iloc[rows]
+        after = found.str.extract(rf'(?:{pattern})[^,%\d]{{0,20}}?{_NUMBER}\s*%', expand=False)
+        before = found.str.extract(rf'{_NUMBER}\s*%[^,%\d]{{0,12}}?(?:{pattern})', expand=False)
+        parts.append(pd.DataFrame({
+            'row': rows,
+            'code': code,
+            'percent': pd.to_numeric(after.fillna(before), errors='coerce').to_numpy(dtype=np.float32),
+        }))
+    if not parts:
+        table = pd.DataFrame({'row': np.empty(0, dtype=np.int64), 'code': np.empty(0, dtype=np.int64),
+                              'percent': np.empty(0, dtype=np.float32)})
+    else:
+        table = pd.concat(parts, ignore_index=True).sort_values(['row', 'code'], kind='stable', ignore_index=True)
+    table.insert(1, 'product_id', ids[table['row'].to_numpy()])
+    table.insert(2, 'ingredient', np.asarray(INGREDIENTS, dtype=object)[table['code'].to_numpy()])
+    return table.drop(columns='code')
+
+
+def conflict_bits(bits):
+    """(..., len(CONFLICTS)) booleans for routines given as (..., steps) ingredient bits.
+
+    A conflict holds when one product carries the rule's first group and a
+    different product its second. Each step is checked against the OR of
+    every other step, built from running ORs in both directions.
+    """
+    bits = np.asarray(bits, dtype=np.uint64)
+    none = np.zeros(bits.shape[:-1] + (1,), dtype=np.uint64)
+    before = np.concatenate([none, np.bitwise_or.accumulate(bits, axis=-1)[..., :-1]], axis=-1)
+    after = np.concatenate([np.bitwise_or.accumulate(bits[..., ::-1], axis=-1)[..., ::-1][..., 1:], none], axis=-1)
+    others = before | after
+    found = np.empty(bits.shape[:-1] + (len(CONFLICTS),), dtype=bool)
+    for i, (_, first, second, _) in enumerate(CONFLICTS):
+        found[..., i] = (((bits & first) != 0) & ((others & second) != 0)).any(axis=-1)
+    return found
+
+
+def describe(table, row, mask):
+    """The actives in `mask` that the product at `row` lists, with strengths, e.g. "glycolic acid 12%"."""
+    start, stop = np.searchsorted(table['row'].to_numpy(), [row, row + 1])
+    listed = table.iloc[start:stop]
+    names = []
+    for name, percent in zip(listed['ingredient'], listed['percent']):
+        if INGREDIENT_BITS[name] & int(mask):
+            names.append(name if np.isnan(percent) else f"{name} {percent:g}%")
+    return ', '.join(names)
+
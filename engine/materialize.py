@@ -0,0 +1,97 @@
+"""Pre-build every reachable routine for a catalog into a static JSON table.
+
+    python -m engine.materialize skincare_products_fixed.csv -o routines.json
+
+The table maps `profile_key(canonical_profile(...))` to an index into a
+de-duplicated list of routines, so a storefront can serve a routine with a
+dict lookup (see `engine.routine_cache.lookup_routine`) and no pandas.
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+
+from engine.catalog import load_catalog
+from engine.flags import profile_mask
+from engine.routine import ROUTINE_STEPS, catalog_pool
+from engine.routine_cache import canonical_profile, profile_key
+from engine.taxonomy import AREAS, CONCERN_KEYWORDS, SKIN_TYPES
+
+TABLE_VERSION = 1
+
+TREAT_FALLBACK = dict(ROUTINE_STEPS)['Treat']
+
+
+def _concern_subsets():
+    concerns = sorted(CONCERN_KEYWORDS)
+    return list(itertools.chain.from_iterable(
+        itertools.combinations(concerns, r) for r in range(len(concerns) + 1)
+    ))
+
+
+def materialized_routines(catalog):
+    """Yield (canonical profile, routine) for every reachable profile.
+
+    Only the Treat pick depends on concerns, so the filter and the other
+    four picks run once per (skin type, flags, area) group.
+    """
+    subsets = _concern_subsets()
+    for skin_type, area, flags in itertools.product(
+            SKIN_TYPES, AREAS, itertools.product((False, True), repeat=3)):
+        is_sensitive = flags[0]
+        mask = profile_mask(catalog.df, skin_type, *flags, area)
+        pool = catalog_pool(catalog, (), mask)
+        base = {}
+        if not pool.empty:
+            base = {step: pool.pick(step, fallback, is_sensitive) for step, fallback in ROUTINE_STEPS}
+        for chosen in subsets:
+            profile = canonical_profile(skin_type, chosen, *flags, area)
+            routine = base
+            if base and chosen:
+                treat = catalog_pool(catalog, chosen, mask).pick('Treat', TREAT_FALLBACK, is_sensitive)
+                routine = dict(base, Treat=treat)
+            yield profile, routine
+
+
+def materialize(catalog):
+    routines = []
+    seen = {}
+    profiles = {}
+    for profile, routine in materialized_routines(catalog):
+        blob = json.dumps(routine, default=str)
+        if blob not in seen:
+            seen[blob] = len(routines)
+            routines.append(json.loads(blob))
+        profiles[profile_key(profile)] = seen[blob]
+    return {
+        'version': TABLE_VERSION,
+        'catalog_key': catalog.key,
+        'key_format': "skin_type|concern+concern|<sensitive><pregnant><prescription>|area",
+        'routines': routines,
+        'profiles': profiles,
+    }
+
+
+def load_table(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('csv', help="inventory CSV to materialize")
+    parser.add_argument('-o', '--output', help="output JSON (default: <csv>.routines.json)")
+    args = parser.parse_args(argv)
+
+    catalog = load_catalog(args.csv)
+    table = materialize(catalog)
+    output = args.output or os.path.splitext(args.csv)[0] + '.routines.json'
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(table, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"{len(table['profiles'])} profiles -> {len(table['routines'])} distinct routines in {output}",
+          file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
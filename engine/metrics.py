@@ -0,0 +1,296 @@
+"""Stage timings and counters for the hot paths, exported as Prometheus text.
+
+Off by default. Set SKINCARE_METRICS=1 (or call `enable()`) to record:
+
+    with span('pick_product', step='Treat'):
+        ...
+    count('catalog_cache', result='hit')
+
+While disabled, `span` hands back one shared no-op context manager and
+`count` returns immediately, so the instrumented code pays a global lookup
+and a call. Spans feed fixed-bucket histograms in seconds; `render()`
+produces the Prometheus text format, `write(path)` saves it atomically,
+and `serve(port)` exposes it at /metrics on localhost. Worker processes
+hand what they recorded to their parent with `drain()`, and the parent
+folds it in with `merge()`. SKINCARE_METRICS_FILE
+and SKINCARE_METRICS_PORT make `start_exporters()` do either automatically;
+SKINCARE_METRICS_HOST (e.g. 0.0.0.0) opens the endpoint to other machines.
+"""
+import bisect
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from engine.routine_cache import ROUTINE_CACHE
+
+PREFIX = 'skincare'
+
+# Upper bounds, in seconds, of the stage duration histogram buckets
+BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+EXPORT_INTERVAL = 15.0
+
+DEFAULT_HOST = '127.0.0.1'
+
+_enabled = os.environ.get('SKINCARE_METRICS', '').strip().lower() in ('1', 'true', 'yes', 'on')
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_exporters_started = False
+# ROUTINE_CACHE hits and misses already handed over by `drain`
+_drained_cache = [0, 0]
+
+
+class _NoSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Histogram:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS + (float('inf'),), self.buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float('inf')
+
+
+class _Span:
+    __slots__ = ('key', 'started')
+
+    def __init__(self, key):
+        self.key = key
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.key, time.perf_counter() - self.started)
+        return False
+
+
+def _key(name, labels):
+    return (name, tuple(sorted(labels.items())))
+
+
+def enabled():
+    return _enabled
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = bool(on)
+
+
+def span(stage, **labels):
+    """Time the body of a `with` block as one observation of `stage`."""
+    if not _enabled:
+        return _NO_SPAN
+    return _Span(_key(stage, labels))
+
+
+def observe(key, seconds):
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = _Histogram()
+        histogram.observe(seconds)
+
+
+def count(name, value=1, **labels):
+    if not _enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def reset():
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+
+
+def drain():
+    """Everything recorded since the last drain, for `merge` in another process; clears it here."""
+    with _lock:
+        histograms = {key: (h.buckets, h.count, h.sum) for key, h in _histograms.items()}
+        counts = dict(_counters)
+        _histograms.clear()
+        _counters.clear()
+        hits, misses = ROUTINE_CACHE.hits, ROUTINE_CACHE.misses
+        counts[('routine_cache_hits', ())] = hits - _drained_cache[0]
+        counts[('routine_cache_misses', ())] = misses - _drained_cache[1]
+        _drained_cache[:] = [hits, misses]
+    return {'histograms': histograms, 'counters': counts}
+
+
+def merge(drained):
+    """Add a `drain()` result from another process to this one's metrics."""
+    with _lock:
+        for key, (buckets, n, total) in drained['histograms'].items():
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = _histograms[key] = _Histogram()
+            histogram.buckets = [a + b for a, b in zip(histogram.buckets, buckets)]
+            histogram.count += n
+            histogram.sum += total
+        for key, value in drained['counters'].items():
+            _counters[key] = _counters.get(key, 0) + value
+
+
+def summary():
+    """One row per stage/labels: calls, mean, and p50/p95 as bucket upper bounds in ms."""
+    with _lock:
+        items = sorted(_histograms.items())
+        rows = [{
+            'stage': name,
+            'labels': ', '.join(f"{k}={v}" for k, v in labels),
+            'calls': h.count,
+            'total_ms': round(h.sum * 1000, 2),
+            'mean_ms': round(h.sum / h.count * 1000, 3) if h.count else 0.0,
+            'p50_ms': h.quantile(0.5) * 1000,
+            'p95_ms': h.quantile(0.95) * 1000,
+        } for (name, labels), h in items]
+    return rows
+
+
+def counters():
+    with _lock:
+        counts = dict(_counters)
+    hits_key, misses_key = ('routine_cache_hits', ()), ('routine_cache_misses', ())
+    counts[hits_key] = counts.get(hits_key, 0) + ROUTINE_CACHE.hits - _drained_cache[0]
+    counts[misses_key] = counts.get(misses_key, 0) + ROUTINE_CACHE.misses - _drained_cache[1]
+    return counts
+
+
+def counter_rows():
+    return [{'counter': name, 'labels': ', '.join(f"{k}={v}" for k, v in labels), 'value': value}
+            for (name, labels), value in sorted(counters().items())]
+
+
+def _labels(pairs, extra=()):
+    pairs = tuple(pairs) + tuple(extra)
+    if not pairs:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in pairs)
+    return '{' + body + '}'
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        histograms = sorted(_histograms.items())
+    if histograms:
+        name = f"{PREFIX}_stage_duration_seconds"
+        lines += [f"# HELP {name} Time spent in each engine stage.", f"# TYPE {name} histogram"]
+        for (stage, labels), h in histograms:
+            pairs = (('stage', stage),) + labels
+            cumulative = 0
+            for bound, n in zip(BUCKETS, h.buckets):
+                cumulative += n
+                lines.append(f"{name}_bucket{_labels(pairs, (('le', repr(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(pairs, (('le', '+Inf'),))} {h.count}")
+            lines.append(f"{name}_sum{_labels(pairs)} {h.sum:.9f}")
+            lines.append(f"{name}_count{_labels(pairs)} {h.count}")
+
+    by_name = {}
+    for (counter, labels), value in sorted(counters().items()):
+        by_name.setdefault(counter, []).append((labels, value))
+    for counter, series in by_name.items():
+        name = f"{PREFIX}_{counter}_total"
+        lines += [f"# TYPE {name} counter"]
+        lines += [f"{name}{_labels(labels)} {value}" for labels, value in series]
+
+    lines.append(f"# TYPE {PREFIX}_routine_cache_entries gauge")
+    lines.append(f"{PREFIX}_routine_cache_entries {len(ROUTINE_CACHE)}")
+    return '\n'.join(lines) + '\n'
+
+
+def write(path):
+    """Write `render()` to `path`, replacing it atomically."""
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=folder, prefix='.metrics-', suffix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        f.write(render())
+    os.replace(tmp, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, host=DEFAULT_HOST):
+    """Serve /metrics from a daemon thread; returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    return server
+
+
+def _write_forever(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write(path)
+        except OSError:
+            pass
+
+
+def start_exporters():
+    """Start the file and/or HTTP exporters named in the environment, once per process."""
+    global _exporters_started
+    if not _enabled:
+        return
+    with _lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    path = os.environ.get('SKINCARE_METRICS_FILE')
+    if path:
+        threading.Thread(target=_write_forever, args=(path, EXPORT_INTERVAL),
+                         name='metrics-file', daemon=True).start()
+    port = os.environ.get('SKINCARE_METRICS_PORT')
+    if port:
+        try:
+            serve(int(port), os.environ.get('SKINCARE_METRICS_HOST') or DEFAULT_HOST)
+        except OSError:
+            # Another process (e.g. a second server worker) already has the port
+            pass
@@ -0,0 +1,71 @@
+"""Customer profiles from loose external records (CSV rows, JSON bodies)."""
+import re
+
+from engine.flags import is_yes
+from engine.taxonomy import AREAS, SKIN_TYPES
+
+PROFILE_FIELDS = ('skin_type', 'concerns', 'is_sensitive', 'is_pregnant', 'using_prescription', 'area')
+
+# Short names accepted alongside the build_routine argument names
+FIELD_ALIASES = {
+    'sensitive': 'is_sensitive',
+    'pregnant': 'is_pregnant',
+    'prescription': 'using_prescription',
+}
+
+_CONCERN_SEPARATORS = re.compile(r'[;|,]')
+
+
+def normalize_concerns(concerns):
+    """Lower-cased concerns without "None", the same way the routine form does."""
+    if concerns is None:
+        return []
+    if isinstance(concerns, str):
+        concerns = _CONCERN_SEPARATORS.split(concerns)
+    cleaned = [str(c).strip().lower() for c in concerns]
+    return [c for c in cleaned if c and c != "none"]
+
+
+def _concerns(value):
+    if value is None or isinstance(value, str):
+        return normalize_concerns(value)
+    if isinstance(value, (list, tuple)) and all(isinstance(c, str) for c in value):
+        return normalize_concerns(value)
+    raise ValueError(f"'concerns' must be a list of strings, not {value!r}")
+
+
+def _flag(name, value):
+    # Text sources (query strings, CSV cells) spell flags as "yes"/"true"
+    if isinstance(value, bool):
+        return value
+    if value is None:
+        return False
+    if isinstance(value, str):
+        return is_yes(value)
+    raise ValueError(f"{name!r} must be true or false, not {value!r}")
+
+
+def profile_from_record(record):
+    """(skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area).
+
+    Raises ValueError for an unknown skin type or area, and for concerns or
+    flags of the wrong type.
+    """
+    record = {FIELD_ALIASES.get(k, k): v for k, v in record.items()}
+
+    skin_type = str(record.get('skin_type') or "Normal").strip().title()
+    if skin_type not in SKIN_TYPES:
+        raise ValueError(f"Unknown skin_type {record.get('skin_type')!r}")
+
+    area = str(record.get('area') or "Face").strip().title()
+    if area not in AREAS:
+        raise ValueError(f"Unknown area {record.get('area')!r}")
+
+    return (
+        skin_type,
+        _concerns(record.get('concerns')),
+        _flag('is_sensitive', record.get('is_sensitive')),
+        _flag('is_pregnant', record.get('is_pregnant')),
+        _flag('using_prescription', record.get('using_prescription')),
+        area,
+    )
@@ -0,0 +1,443 @@
+"""Append-only store of Progress Tracker check-ins, in SQLite.
+
+    python -m engine.progress history <user_id> [--db progress.db]
+    python -m engine.progress cohort [--kind problems] [--since 2024-01-01] [--until ...]
+    python -m engine.progress tag "Breakouts/purging" [--since ...] [--limit 20]
+
+Every check-in is one row keyed by user and routine, with its answers
+stored as bitmasks over the fixed vocabularies below. Alongside it go
+`checkin_tags` (one row per reported tag, clustered on tag and time) and
+`weekly_tags` (check-in and tag counts per day and week on the routine),
+which the same transaction keeps up to date. Per-user history is an index
+range scan, and cohort trends read the rollup instead of the check-ins.
+Either way the cost does not grow with the number of check-ins.
+
+Weeks on the routine are counted from the user's start date on that
+routine, kept in `routine_starts`: the time of the first check-in for it,
+less the time on routine it reported. The self-reported answer only
+decides the week when no start date fits, i.e. for a check-in dated
+before it.
+
+The database runs in WAL mode, so readers never wait for the writer.
+`record` only puts the check-in on a queue. A background thread writes
+queued check-ins in batches, one transaction each, so a tracker submission
+never waits on disk.
+"""
+import argparse
+import atexit
+import hashlib
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from engine import metrics
+
+PROGRESS_ENV = 'SKINCARE_PROGRESS_DB'
+DEFAULT_PATH = 'progress.db'
+
+# Answers of the Progress Tracker form, in display order. A tag's position
+# is its bit in the stored masks, so only ever append to these.
+DURATIONS = ("Less than 2 weeks", "2–4 weeks", "4–8 weeks", "8+ weeks", "Not started yet")
+IMPROVEMENTS = (
+    "Less dryness/tightness",
+    "More hydration/plumpness",
+    "Smoother texture",
+    "Brighter/radiant skin",
+    "Fewer breakouts",
+    "Less irritation/redness",
+    "Nothing yet",
+    "Other (please describe below)",
+)
+PROBLEMS = (
+    "Still dry/tight",
+    "Still dull",
+    "Still rough texture",
+    "Breakouts/purging",
+    "Irritation/stinging",
+    "No improvement",
+    "Worse than before",
+    "New sensitivity",
+    "Other (please describe below)",
+)
+
+# Weeks on the routine each DURATIONS answer stands for, at least
+DURATION_WEEKS = (0, 2, 4, 8, 0)
+
+# (first week, label) of the cohort buckets; later weeks count toward the last
+COHORT_WEEKS = ((0, "0–2 weeks"), (2, "2–4 weeks"), (4, "4–8 weeks"), (8, "8–12 weeks"), (12, "12+ weeks"))
+
+# Weeks past this are stored as this
+MAX_WEEKS = 52
+
+# `kind` codes in checkin_tags and weekly_tags
+CHECKINS, IMPROVED, PROBLEM = 0, 1, 2
+_KINDS = {'improvements': (IMPROVED, IMPROVEMENTS), 'problems': (PROBLEM, PROBLEMS)}
+
+DEFAULT_BATCH_SIZE = 512
+# Longest a queued check-in waits for more to batch with
+FLUSH_INTERVAL = 0.2
+
+_DAY = 86400
+_WEEK = 7 * _DAY
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkins (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    routine_id TEXT,
+    submitted_at REAL NOT NULL,
+    duration INTEGER NOT NULL,
+    improvements INTEGER NOT NULL,
+    problems INTEGER NOT NULL,
+    notes TEXT
+);
+CREATE INDEX IF NOT EXISTS checkins_by_user ON checkins (user_id, submitted_at);
+CREATE INDEX IF NOT EXISTS checkins_by_routine ON checkins (routine_id, submitted_at);
+CREATE INDEX IF NOT EXISTS checkins_by_time ON checkins (submitted_at);
+CREATE TABLE IF NOT EXISTS checkin_tags (
+    kind INTEGER NOT NULL,
+    tag INTEGER NOT NULL,
+    submitted_at REAL NOT NULL,
+    checkin_id INTEGER NOT NULL,
+    PRIMARY KEY (kind, tag, submitted_at, checkin_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS weekly_tags (
+    day INTEGER NOT NULL,
+    week INTEGER NOT NULL,
+    kind INTEGER NOT NULL,
+    tag INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    PRIMARY KEY (day, week, kind, tag)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS routine_starts (
+    user_id TEXT NOT NULL,
+    routine_id TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    PRIMARY KEY (user_id, routine_id)
+) WITHOUT ROWID;
+"""
+
+
+def _bits(values, vocabulary, field):
+    mask = 0
+    for value in values or ():
+        try:
+            mask |= 1 << vocabulary.index(value)
+        except ValueError:
+            raise ValueError(f"Unknown {field} {value!r}") from None
+    return mask
+
+
+def _tags(mask, vocabulary):
+    return [tag for i, tag in enumerate(vocabulary) if mask >> i & 1]
+
+
+def routine_id(catalog_key, product_ids):
+    """Short stable id for the routine made of `product_ids` from one catalog."""
+    digest = hashlib.sha256(catalog_key.encode())
+    digest.update('\0'.join(sorted(str(p) for p in product_ids if p is not None)).encode())
+    return digest.hexdigest()[:16]
+
+
+def _timestamp(value):
+    """Unix seconds from None, a number or an ISO date."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _start(submitted_at, duration):
+    """Estimated routine start of a user whose first check-in for the routine this is."""
+    return submitted_at - DURATION_WEEKS[duration] * _WEEK
+
+
+def weeks_on_routine(submitted_at, started_at, duration):
+    """Whole weeks from the user's routine start to a check-in, capped at MAX_WEEKS."""
+    if started_at is None or submitted_at < started_at:
+        # No start date before this check-in: fall back to the answer on the form
+        return DURATION_WEEKS[duration]
+    return min(int((submitted_at - started_at) // _WEEK), MAX_WEEKS)
+
+
+def _cohort_label(week):
+    label = COHORT_WEEKS[0][1]
+    for first, name in COHORT_WEEKS:
+        if week >= first:
+            label = name
+    return label
+
+
+def connect(path):
+    # Autocommit: the writer opens its own transactions, readers need none
+    connection = sqlite3.connect(path, timeout=30.0, check_same_thread=False, isolation_level=None)
+    connection.execute('PRAGMA journal_mode=WAL')
+    # WAL + NORMAL stays consistent on power loss; only the last commits can be lost
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.executescript(_SCHEMA)
+    return connection
+
+
+class ProgressStore:
+    """Check-ins written in the background, read through per-thread connections."""
+
+    def __init__(self, path=None, batch_size=DEFAULT_BATCH_SIZE):
+        self.path = os.path.abspath(path or os.environ.get(PROGRESS_ENV, DEFAULT_PATH))
+        self.batch_size = batch_size
+        self.written = 0
+        self._queue = queue.SimpleQueue()
+        self._local = threading.local()
+        connect(self.path).close()
+        self._writer = threading.Thread(target=self._write_forever, name='progress-writer', daemon=True)
+        self._writer.start()
+
+    # ── writes ────────────────────────────────────
+
+    def record(self, user_id, time_used, improvements=(), problems=(), notes='', routine_id=None,
+               submitted_at=None):
+        """Queue one check-in. Bad answers raise ValueError; nothing touches disk here."""
+        if not user_id:
+            raise ValueError("A check-in needs a user_id")
+        try:
+            duration = DURATIONS.index(time_used)
+        except ValueError:
+            raise ValueError(f"Unknown time on routine {time_used!r}") from None
+        self._queue.put((
+            str(user_id),
+            routine_id,
+            time.time() if submitted_at is None else float(_timestamp(submitted_at)),
+            duration,
+            _bits(improvements, IMPROVEMENTS, 'improvement'),
+            _bits(problems, PROBLEMS, 'problem'),
+            notes or None,
+        ))
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is written."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def _write_forever(self):
+        connection = connect(self.path)
+        while True:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while True:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+            if batch:
+                try:
+                    with metrics.span('progress_write'):
+                        self._write(connection, batch)
+                    self.written += len(batch)
+                    metrics.count('progress_checkins', len(batch))
+                except sqlite3.Error as e:
+                    metrics.count('progress_write_errors')
+                    print(f"progress store: dropped {len(batch)} check-in(s): {e}", file=sys.stderr)
+            for waiter in waiters:
+                waiter.set()
+
+    @staticmethod
+    def _rollup(rows, starts):
+        """(checkin_tags rows, weekly_tags counts) for check-in rows, oldest first.
+
+        Rows are (id, user_id, routine_id, submitted_at, duration, improved,
+        problems). `starts` maps (user_id, routine_id) to a start date, with ''
+        for check-ins that name no routine; new pairs get theirs added.
+        """
+        tags = []
+        weekly = Counter()
+        for checkin_id, user_id, routine, submitted_at, duration, improved, problems in rows:
+            key = (user_id, routine or '')
+            if key not in starts:
+                starts[key] = _start(submitted_at, duration)
+            day = int(submitted_at // _DAY)
+            week = weeks_on_routine(submitted_at, starts[key], duration)
+            weekly[day, week, CHECKINS, 0] += 1
+            for kind, mask in ((IMPROVED, improved), (PROBLEM, problems)):
+                while mask:
+                    tag = (mask & -mask).bit_length() - 1
+                    mask &= mask - 1
+                    tags.append((kind, tag, submitted_at, checkin_id))
+                    weekly[day, week, kind, tag] += 1
+        return tags, weekly
+
+    @staticmethod
+    def _save_rollup(connection, tags, weekly, starts):
+        connection.executemany('INSERT INTO checkin_tags VALUES (?, ?, ?, ?)', tags)
+        connection.executemany(
+            'INSERT INTO weekly_tags VALUES (?, ?, ?, ?, ?)'
+            ' ON CONFLICT (day, week, kind, tag) DO UPDATE SET n = n + excluded.n',
+            [key + (n,) for key, n in weekly.items()])
+        connection.executemany('INSERT OR IGNORE INTO routine_starts VALUES (?, ?, ?)', starts)
+
+    @classmethod
+    def _write(cls, connection, batch):
+        # IMMEDIATE takes the write lock up front, so the ids handed out below
+        # can't collide with another process writing the same file
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            first = connection.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM checkins').fetchone()[0]
+            users = sorted({row[0] for row in batch})
+            starts = {(user_id, routine): started_at for user_id, routine, started_at in connection.execute(
+                f"SELECT user_id, routine_id, started_at FROM routine_starts"
+                f" WHERE user_id IN ({','.join('?' * len(users))})", users)}
+            known = set(starts)
+            rows = sorted(((checkin_id,) + row[:-1] for checkin_id, row in enumerate(batch, first)),
+                          key=lambda row: row[3])
+            tags, weekly = cls._rollup(rows, starts)
+            connection.executemany(
+                'INSERT INTO checkins (id, user_id, routine_id, submitted_at, duration, improvements, problems, notes)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [(checkin_id,) + row for checkin_id, row in enumerate(batch, first)])
+            cls._save_rollup(connection, tags, weekly,
+                             [key + (started,) for key, started in starts.items() if key not in known])
+            connection.execute('COMMIT')
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+
+    # ── reads ─────────────────────────────────────
+
+    def _reader(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = connect(self.path)
+        return connection
+
+    def history(self, user_id, limit=None, routine_id=None):
+        """The user's check-ins, newest first, as dicts of the form answers."""
+        sql = 'SELECT * FROM checkins WHERE user_id = ?'
+        params = [str(user_id)]
+        if routine_id is not None:
+            sql += ' AND routine_id = ?'
+            params.append(routine_id)
+        sql += ' ORDER BY submitted_at DESC'
+        if limit:
+            sql += ' LIMIT ?'
+            params.append(int(limit))
+        return [self._checkin(row) for row in self._reader().execute(sql, params)]
+
+    @staticmethod
+    def _checkin(row):
+        checkin_id, user_id, routine, submitted_at, duration, improved, problems, notes = row
+        return {
+            'id': checkin_id,
+            'user_id': user_id,
+            'routine_id': routine,
+            'submitted_at': submitted_at,
+            'time_used': DURATIONS[duration],
+            'improvements': _tags(improved, IMPROVEMENTS),
+            'problems': _tags(problems, PROBLEMS),
+            'notes': notes,
+        }
+
+    def cohort(self, kind='improvements', since=None, until=None):
+        """{weeks on routine: {'checkins': n, 'tags': {tag: n}}} across every user.
+
+        Buckets are COHORT_WEEKS, counted from each user's routine start.
+        Counts check-ins submitted in [since, until), to the day (UTC).
+        """
+        code, vocabulary = _KINDS[kind]
+        since, until = _timestamp(since), _timestamp(until)
+        sql = 'SELECT week, kind, tag, SUM(n) FROM weekly_tags WHERE kind IN (?, ?)'
+        params = [CHECKINS, code]
+        if since is not None:
+            sql += ' AND day >= ?'
+            params.append(int(since // _DAY))
+        if until is not None:
+            sql += ' AND day < ?'
+            params.append(-int(-until // _DAY))
+        sql += ' GROUP BY week, kind, tag'
+
+        trends = {label: {'checkins': 0, 'tags': {}} for _, label in COHORT_WEEKS}
+        for week, row_kind, tag, n in self._reader().execute(sql, params):
+            bucket = trends[_cohort_label(week)]
+            if row_kind == CHECKINS:
+                bucket['checkins'] += n
+            else:
+                bucket['tags'][vocabulary[tag]] = bucket['tags'].get(vocabulary[tag], 0) + n
+        return trends
+
+    def tagged(self, tag, since=None, until=None, limit=100):
+        """Most recent check-ins that reported `tag` (an improvement or a problem)."""
+        kind, vocabulary = (PROBLEM, PROBLEMS) if tag in PROBLEMS else (IMPROVED, IMPROVEMENTS)
+        if tag not in vocabulary:
+            raise ValueError(f"Unknown tag {tag!r}")
+        since, until = _timestamp(since), _timestamp(until)
+        rows = self._reader().execute(
+            'SELECT c.* FROM checkin_tags t JOIN checkins c ON c.id = t.checkin_id'
+            ' WHERE t.kind = ? AND t.tag = ? AND t.submitted_at >= ? AND t.submitted_at < ?'
+            ' ORDER BY t.submitted_at DESC LIMIT ?',
+            (kind, vocabulary.index(tag), -1e18 if since is None else since,
+             1e18 if until is None else until, int(limit)))
+        return [self._checkin(row) for row in rows]
+
+    def count(self):
+        return self._reader().execute('SELECT COUNT(*) FROM checkins').fetchone()[0]
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def progress_store():
+    """Process-wide store at $SKINCARE_PROGRESS_DB (or ./progress.db)."""
+    global _default_store
+    with _default_lock:
+        if _default_store is None:
+            _default_store = ProgressStore()
+            # Give queued check-ins a chance to land before the process exits
+            atexit.register(_default_store.flush, 5.0)
+    return _default_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', help=f"database file (default: ${PROGRESS_ENV} or ./{DEFAULT_PATH})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    history = commands.add_parser('history', help="one user's check-ins, newest first")
+    history.add_argument('user_id')
+    history.add_argument('--limit', type=int, default=20)
+    cohort = commands.add_parser('cohort', help="tag counts by weeks on routine, across all users")
+    cohort.add_argument('--kind', choices=sorted(_KINDS), default='improvements')
+    cohort.add_argument('--since', help="ISO date")
+    cohort.add_argument('--until', help="ISO date (exclusive)")
+    tagged = commands.add_parser('tag', help="recent check-ins reporting one improvement or problem")
+    tagged.add_argument('tag')
+    tagged.add_argument('--since', help="ISO date")
+    tagged.add_argument('--until', help="ISO date (exclusive)")
+    tagged.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args(argv)
+
+    store = ProgressStore(args.db)
+    if args.command == 'history':
+        result = store.history(args.user_id, args.limit)
+    elif args.command == 'cohort':
+        result = store.cohort(args.kind, args.since, args.until)
+    else:
+        result = store.tagged(args.tag, args.since, args.until, args.limit)
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""Concern x product relevance, scored once per catalog.
+
+Each product gets one int8 column per concern in CONCERN_KEYWORDS holding the
+number of text fields (out of RELEVANCE_FIELDS) that match the concern's
+keywords. A multi-concern score is a column sum over those columns, which
+is exactly the `concern_score` the Treat step used to rebuild per request.
+"""
+from bisect import bisect_left
+
+import numpy as np
+
+from engine.taxonomy import CONCERN_KEYWORDS
+
+CONCERNS = tuple(CONCERN_KEYWORDS)
+RELEVANCE_FIELDS = ('primary_target', 'secondary_target', 'key_actives', 'notes')
+RELEVANCE_COLUMNS = tuple(f"relevance_{i}" for i in range(len(CONCERNS)))
+
+_COLUMN_FOR = dict(zip(CONCERNS, RELEVANCE_COLUMNS))
+
+
+def compile_relevance(df):
+    """Add the relevance_* columns; each row is scored on its own."""
+    for concern, column in _COLUMN_FOR.items():
+        keywords = CONCERN_KEYWORDS[concern]
+        score = np.zeros(len(df), dtype=np.int8)
+        for field in RELEVANCE_FIELDS:
+            if field in df.columns:
+                score += df[field].str.contains(keywords, case=False, na=False).to_numpy(dtype=np.int8)
+        df[column] = score
+    return df
+
+
+def compile_id_rank(df):
+    """Add the `id_rank` tie-break column; needs the whole catalog."""
+    # Position of each product in ascending product_id order, so the
+    # (score desc, product_id asc) ordering never has to sort strings.
+    order = df['product_id'].sort_values(kind='stable', na_position='last').index
+    id_rank = np.empty(len(df), dtype=np.int32)
+    id_rank[df.index.get_indexer(order)] = np.arange(len(df), dtype=np.int32)
+    df['id_rank'] = id_rank
+    return df
+
+
+def patch_id_rank(id_rank, ids, kept, added_ids):
+    """`id_rank` for a patched catalog without re-sorting every product_id.
+
+    `id_rank` and `ids` describe the old rows, `kept` masks the ones that
+    stay, and the rows with `added_ids` follow them in the patched catalog.
+    Only the added ids are compared as strings.
+    """
+    n = len(id_rank)
+    by_rank = np.empty(n, dtype=np.intp)
+    by_rank[id_rank] = np.arange(n)
+    kept_by_rank = by_rank[kept[by_rank]]
+    compact = np.empty(n, dtype=np.int64)
+    compact[kept_by_rank] = np.arange(len(kept_by_rank))
+
+    order = sorted(range(len(added_ids)), key=added_ids.__getitem__)
+    insert = np.array([bisect_left(kept_by_rank, added_ids[i], key=lambda pos: ids[pos]) for i in order],
+                      dtype=np.int64)
+
+    kept_rank = compact[kept]
+    kept_rank += np.searchsorted(insert, kept_rank, side='right')
+    added_rank = np.empty(len(added_ids), dtype=np.int64)
+    added_rank[order] = insert + np.arange(len(order))
+    return np.concatenate([kept_rank, added_rank]).astype(np.int32)
+
+
+def relevance_columns(concerns):
+    # Repeated concerns count twice, like the old per-concern loop did
+    return [_COLUMN_FOR[c] for c in concerns if c in _COLUMN_FOR]
+
+
+def concern_scores(frame, concerns, rows=None):
+    """Summed relevance of each row (or of the `rows` positions) to `concerns`."""
+    columns = relevance_columns(concerns)
+    if not columns:
+        return np.zeros(len(frame) if rows is None else len(rows), dtype=np.int32)
+    if rows is None:
+        return frame[columns].to_numpy(dtype=np.int32).sum(axis=1)
+    # Column by column, so only the wanted rows are ever copied
+    scores = np.zeros(len(rows), dtype=np.int32)
+    for column in columns:
+        scores += frame[column].to_numpy()[rows]
+    return scores
+
+
+def rank_keys(frame, scores=None, rows=None):
+    """One int64 per row (or per `rows` position); larger sorts first (score desc, product_id asc)."""
+    id_rank = frame['id_rank'].to_numpy()
+    if rows is not None:
+        id_rank = id_rank[rows]
+    keys = -id_rank.astype(np.int64)
+    if scores is not None:
+        keys += np.asarray(scores, dtype=np.int64) << 32
+    return keys
+
+
+def top_k(keys, k):
+    """Positions of the k largest keys, best first, without a full sort."""
+    if k <= 0 or len(keys) == 0:
+        return np.empty(0, dtype=np.intp)
+    if k < len(keys):
+        part = np.argpartition(-keys, k - 1)[:k]
+    else:
+        part = np.arange(len(keys))
+    return part[np.argsort(-keys[part])]
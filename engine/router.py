@@ -0,0 +1,67 @@
+"""Seller category -> routine step, compiled into an int8 `step_id` column.
+
+Categories listed in CATEGORY_MAPPING resolve through one dict lookup
+(case and spacing ignored). Anything else is classified by its words with
+STEP_TOKEN_RULES, so a new "Hydrating / Soothing / Serum" lands in Treat
+instead of silently dropping out of every routine. Each distinct category
+string is routed once; a catalog then selects a step's products by
+`step_id` instead of scanning category strings.
+"""
+import re
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from engine.taxonomy import CATEGORY_MAPPING, STEP_TOKEN_RULES, UNROUTED_TOKENS
+
+STEPS = tuple(CATEGORY_MAPPING)
+STEP_IDS = {step: i for i, step in enumerate(STEPS)}
+
+# step_id of categories that fit no routine step
+NO_STEP = -1
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+_RULES = tuple((STEP_IDS[step], frozenset(words)) for step, words in STEP_TOKEN_RULES)
+_UNROUTED = frozenset(UNROUTED_TOKENS)
+
+
+def _normalize(category):
+    return ' '.join(category.split()).casefold()
+
+
+_EXACT = {_normalize(category): STEP_IDS[step]
+          for step, categories in CATEGORY_MAPPING.items() for category in categories}
+
+
+@lru_cache(maxsize=4096)
+def route_category(category):
+    """step_id for one category string, or NO_STEP."""
+    if not isinstance(category, str):
+        return NO_STEP
+    normalized = _normalize(category)
+    step_id = _EXACT.get(normalized)
+    if step_id is not None:
+        return step_id
+    tokens = set(_TOKEN.findall(normalized))
+    if tokens & _UNROUTED:
+        return NO_STEP
+    for step_id, words in _RULES:
+        if tokens & words:
+            return step_id
+    return NO_STEP
+
+
+def compile_step_ids(df):
+    """Add the `step_id` column, routing each distinct category once."""
+    codes, categories = pd.factorize(df['category'])
+    # The extra slot catches code -1 (missing category)
+    table = np.array([route_category(c) for c in categories] + [NO_STEP], dtype=np.int8)
+    df['step_id'] = table[codes]
+    return df
+
+
+def group_steps(step_ids):
+    """{step_id: ascending row positions} for every routine step."""
+    step_ids = np.asarray(step_ids)
+    return {i: np.flatnonzero(step_ids == i) for i in range(len(STEPS))}
@@ -0,0 +1,360 @@
+"""Routine building: profile filter, ranked per-step candidates and the cached entry point."""
+import numpy as np
+import pandas as pd
+
+from engine import metrics
+from engine.flags import SKIN_ALL, SKIN_TYPE_BITS, area_bits, blocked_bits, is_no, is_yes, profile_mask
+from engine.ingredients import CONFLICTS, conflict_bits, describe
+from engine.relevance import concern_scores, rank_keys, top_k
+from engine.routine_cache import ROUTINE_CACHE, RoutineCache, canonical_profile
+from engine.router import NO_STEP, STEP_IDS
+from engine.taxonomy import AREAS
+
+# Routine steps in display order, with the text shown when nothing fits
+ROUTINE_STEPS = (
+    ('Cleanse', "Gentle cleanser"),
+    ('Tone', "Hydrating toner"),
+    ('Treat', "Targeted serum"),
+    ('Moisturize', "Moisturizer"),
+    ('Protect', "Broad-spectrum SPF 50+ every morning"),
+)
+
+DEFAULT_ALTERNATIVES = 3
+
+# Candidate pools are bigger than routines, so far fewer are kept
+POOL_CACHE = RoutineCache(maxsize=64)
+
+
+def is_safe(row, is_sensitive=False, is_pregnant=False, using_prescription=False):
+    # Row-wise reference for the compiled `safety_flags` column (see engine/flags.py)
+    if is_pregnant and (is_yes(row.get('contains_retinol')) or is_yes(row.get('prescription_only'))):
+        return False
+    if using_prescription and (is_yes(row.get('contains_retinol')) or is_yes(row.get('contains_acid'))):
+        return False
+    if not using_prescription and is_yes(row.get('prescription_only')):
+        return False
+    if is_sensitive and is_no(row.get('safe_for_sensitive')):
+        return False
+    return True
+
+
+def get_caution_note(row, is_sensitive):
+    if not is_sensitive:
+        return ""
+    # Blank cells come through as NaN
+    safe_val = row.get('safe_for_sensitive')
+    if isinstance(safe_val, str) and 'caution' in safe_val.lower():
+        return " **(Use with caution — patch test recommended; may cause mild irritation in very sensitive skin)**"
+    return ""
+
+
+def get_filtered_df(df, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area):
+    # Area, safety and skin type are all precompiled bitmasks
+    filtered = df[profile_mask(df, skin_type, is_sensitive, is_pregnant, using_prescription, area)]
+
+    # IMPORTANT: No concern keyword filtering here anymore
+    # We only apply concern relevance inside pick_product for 'Treat' step
+
+    if filtered.empty:
+        return pd.DataFrame()
+
+    return filtered
+
+
+class CandidatePool:
+    """Ranked candidates per routine step for one profile.
+
+    Built over a profile-filtered frame, or over a whole catalog with the
+    profile's `mask`, the catalog's `step_rows` groups and its `records`
+    for the text of the products rendered. Each step's rank
+    keys are computed once, on first use; `top` then takes the k best with
+    a partial selection, skipping any excluded product_ids, so out-of-stock
+    or rejected products never mean re-filtering or re-ranking.
+    """
+
+    def __init__(self, df, concerns=None, mask=None, step_rows=None, records=None):
+        self.df = df
+        self.concerns = concerns
+        self.mask = mask
+        self.step_rows = step_rows
+        self.records = records
+        self._steps = {}
+
+    @property
+    def empty(self):
+        return len(self.df) == 0 if self.mask is None else not self.mask.any()
+
+    def ranked(self, step_name):
+        """(row positions, rank keys, concern scores) of the step's candidates."""
+        entry = self._steps.get(step_name)
+        if entry is None:
+            step_id = STEP_IDS.get(step_name, NO_STEP)
+            if self.step_rows is not None:
+                positions = self.step_rows(step_id)
+            else:
+                positions = np.flatnonzero(self.df['step_id'].to_numpy() == step_id)
+            if self.mask is not None:
+                positions = positions[self.mask[positions]]
+
+            # Apply concern scoring ONLY for 'Treat' step: a column sum over the
+            # catalog's precomputed relevance matrix (see engine/relevance.py)
+            scores = np.zeros(len(positions), dtype=np.int32)
+            if step_name == 'Treat' and self.concerns:
+                scores = concern_scores(self.df, self.concerns, positions)
+
+            # Ranked by concern_score desc + product_id asc; base steps (Cleanse,
+            # Tone, Moisturize, Protect) by product_id alone
+            entry = self._steps[step_name] = (positions, rank_keys(self.df, scores, positions), scores)
+        return entry
+
+    def top(self, step_name, k=1, exclude=()):
+        """(row positions, concern scores) of the k best candidates, best first."""
+        positions, keys, scores = self.ranked(step_name)
+        # At most len(exclude) of the best k + len(exclude) can be dropped
+        best = top_k(keys, k + len(exclude))
+        if exclude:
+            ids = self.df['product_id'].iloc[positions[best]].tolist()
+            best = best[[product_id not in exclude for product_id in ids]]
+        best = best[:k]
+        return positions[best], scores[best]
+
+    def rows(self, positions):
+        """Source cells of the products at `positions`, one dict each, for rendering."""
+        if self.records is not None:
+            # A filtered frame keeps the catalog's row positions as its index
+            return self.records(self.df.index.to_numpy()[positions])
+        if 'name' not in self.df.columns:
+            raise ValueError("Frame holds no product text; pass the catalog's `records`")
+        return self.df.iloc[positions].to_dict('records')
+
+    def pick(self, step_name, fallback_text, is_sensitive, exclude=()):
+        found, _ = self.top(step_name, 1, exclude)
+        if not len(found):
+            return fallback_text, None
+        top_row = self.rows(found)[0]
+        return product_details(top_row, is_sensitive), top_row['product_id']
+
+    def alternatives(self, step_name, is_sensitive, k=DEFAULT_ALTERNATIVES, exclude=()):
+        """[{product_id, name, score, details}] for the k best candidates."""
+        found, scores = self.top(step_name, k, exclude)
+        return [
+            {'product_id': row['product_id'], 'name': row['name'], 'score': int(score),
+             'details': product_details(row, is_sensitive)}
+            for row, score in zip(self.rows(found), scores)
+        ]
+
+
+def product_details(row, is_sensitive):
+    caution = get_caution_note(row, is_sensitive)
+    return (
+        f"**{row['product_id']} — {row['name']}**  \n"
+        f"**Recommended time:** {row.get('recommended_time', 'Anytime')}  \n"
+        f"**Max frequency:** {row.get('max_frequency', 'Daily')}  \n"
+        f"**How to use:** {row.get('step', 'Follow product instructions')}  \n"
+        f"**Notes:** {row.get('notes', 'No extra notes')}{caution}"
+    )
+
+
+def pick_product(filtered_df, step_name, fallback_text, is_sensitive, concerns=None, exclude=(), records=None):
+    """Best product for one step of a `get_filtered_df` frame.
+
+    `records` is the catalog's `records`, which the hot frame needs for the
+    text of the pick; frames that still carry their text can omit it.
+    """
+    pool = CandidatePool(filtered_df, concerns, records=records)
+    return pool.pick(step_name, fallback_text, is_sensitive, frozenset(exclude))
+
+
+def catalog_pool(catalog, concerns, mask):
+    """Uncached CandidatePool over the products of `catalog` where `mask` holds."""
+    return CandidatePool(catalog.df, concerns, mask, catalog.step_rows, catalog.records)
+
+
+def candidate_pool(catalog, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area):
+    """The profile's CandidatePool over `catalog`, shared through POOL_CACHE."""
+    profile = canonical_profile(skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area)
+
+    def build():
+        with metrics.span('profile_filter'):
+            mask = profile_mask(catalog.df, profile[0], *profile[2:])
+        return catalog_pool(catalog, profile[1], mask)
+
+    return POOL_CACHE.get_or_build((catalog.key, profile), build)
+
+
+def _build_routine(pool, is_sensitive, exclude=()):
+    if pool.empty:
+        return {}
+
+    routine = {}
+    for step_name, fallback_text in ROUTINE_STEPS:
+        with metrics.span('pick_product', step=step_name):
+            routine[step_name] = pool.pick(step_name, fallback_text, is_sensitive, exclude)
+
+    return routine
+
+
+def _plan(catalog, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, areas):
+    """{area: routine} for every area in `areas` from one pass over the catalog.
+
+    The safety and skin-type mask is evaluated once without the area bits;
+    each step's candidates are ranked once and every area takes its winner
+    from the same keys. Each product is rendered once, however many
+    routines it wins.
+    """
+    df = catalog.df
+    with metrics.span('profile_filter'):
+        safety = df['safety_flags'].to_numpy()
+        eligible = (safety & blocked_bits(is_sensitive, is_pregnant, using_prescription)) == 0
+        eligible &= (df['skin_flags'].to_numpy() & SKIN_TYPE_BITS.get(skin_type, SKIN_ALL)) != 0
+        eligible_flags = safety[eligible]
+    areas_blocked = {area: area_bits(area) for area in areas}
+
+    picks = {area: {} for area in areas}
+    for step_name, _ in ROUTINE_STEPS:
+        with metrics.span('pick_product', step=step_name):
+            rows = catalog.step_rows(STEP_IDS[step_name])
+            rows = rows[eligible[rows]]
+            scores = None
+            if step_name == 'Treat' and concerns:
+                scores = concern_scores(df, concerns, rows)
+            keys = rank_keys(df, scores, rows)
+            flags = safety[rows]
+            for area, bits in areas_blocked.items():
+                candidates = np.flatnonzero((flags & bits) == 0)
+                if len(candidates):
+                    picks[area][step_name] = rows[candidates[np.argmax(keys[candidates])]]
+
+    winners = sorted({position for steps in picks.values() for position in steps.values()})
+    rendered = {}
+    for position, row in zip(winners, catalog.records(winners)):
+        rendered[position] = (product_details(row, is_sensitive), row['product_id'])
+
+    routines = {}
+    for area, bits in areas_blocked.items():
+        if not ((eligible_flags & bits) == 0).any():
+            routines[area] = {}
+            continue
+        routines[area] = {
+            step_name: rendered[picks[area][step_name]] if step_name in picks[area] else (fallback_text, None)
+            for step_name, fallback_text in ROUTINE_STEPS
+        }
+    return routines
+
+
+def plan_routines(catalog, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, areas=AREAS):
+    """{area: routine} for one profile in each of `areas`.
+
+    Routines already in ROUTINE_CACHE are reused; the rest are planned
+    together in a single pass and cached per area. Same routines, and same
+    sharing rules, as `build_routine`.
+    """
+    profiles = {area: canonical_profile(skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area)
+                for area in areas}
+    routines = {area: ROUTINE_CACHE.get((catalog.key, profile)) for area, profile in profiles.items()}
+    missing = [area for area, routine in routines.items() if routine is None]
+    if missing:
+        skin_type, concerns, is_sensitive, is_pregnant, using_prescription, _ = profiles[missing[0]]
+        planned = _plan(catalog, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, missing)
+        for area in missing:
+            ROUTINE_CACHE.put((catalog.key, profiles[area]), planned[area])
+            routines[area] = planned[area]
+    return routines
+
+
+def build_routine(catalog, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area, exclude=()):
+    """Five-step routine for a profile, served from ROUTINE_CACHE when possible.
+
+    Returns {step: (details_markdown, product_id or None)}, or {} when no
+    safe product matches. The dict is shared with other callers; don't mutate it.
+    Routines that skip `exclude`d product_ids are built from the cached
+    candidate pool instead, and not cached themselves.
+    """
+    with metrics.span('build_routine'):
+        if exclude:
+            pool = candidate_pool(catalog, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area)
+            return _build_routine(pool, is_sensitive, frozenset(exclude))
+        return plan_routines(catalog, skin_type, concerns, is_sensitive, is_pregnant, using_prescription,
+                             areas=(area,))[area]
+
+
+def build_alternatives(catalog, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area,
+                       k=DEFAULT_ALTERNATIVES, exclude=()):
+    """{step: [{product_id, name, score, details}, ...]}, the k best per step.
+
+    `score` is the Treat concern score (0 for the other steps). Products in
+    `exclude` are skipped; steps with no candidates map to [].
+    """
+    pool = candidate_pool(catalog, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area)
+    if pool.empty:
+        return {}
+    exclude = frozenset(exclude)
+    return {step_name: pool.alternatives(step_name, is_sensitive, k, exclude) for step_name, _ in ROUTINE_STEPS}
+
+
+def _routine_bits(catalog, product_ids):
+    positions = catalog.positions(product_ids)
+    bits = catalog.df['ingredient_bits'].to_numpy()[positions]
+    return positions, np.where(positions >= 0, bits, np.uint64(0))
+
+
+def routine_conflicts(catalog, routine):
+    """[{conflict, text, products}] for the active ingredients that clash across a routine's picks.
+
+    `products` lists every pick involved as {step, product_id, ingredients},
+    `ingredients` naming its clashing actives and their strengths.
+    """
+    picks = [(step, product_id) for step, (_, product_id) in routine.items() if product_id is not None]
+    if len(picks) < 2:
+        return []
+    positions, bits = _routine_bits(catalog, [product_id for _, product_id in picks])
+    found = conflict_bits(bits)
+    conflicts = []
+    for (conflict, first, second, text), hit in zip(CONFLICTS, found):
+        if not hit:
+            continue
+        # With the conflict present, any pick carrying either side pairs with another
+        involved = np.flatnonzero((bits & (first | second)) != 0)
+        conflicts.append({'conflict': conflict, 'text': text, 'products': [
+            {'step': picks[i][0], 'product_id': picks[i][1],
+             'ingredients': describe(catalog.ingredients, positions[i], first | second)}
+            for i in involved
+        ]})
+    return conflicts
+
+
+def conflict_free_swap(catalog, routine, alternatives):
+    """{step: alternative} that clears every conflict, or None if no mix can.
+
+    Every combination of the picks and their `alternatives` (as returned by
+    `build_alternatives`) is checked in one vectorized pass; the fewest
+    swaps win, then the best-ranked alternatives. {} if nothing conflicts.
+    """
+    steps = list(routine)
+    if not steps:
+        return {}
+    options = [[routine[step][1]] + [o['product_id'] for o in alternatives.get(step, ())] for step in steps]
+    listed = [product_id for ids in options for product_id in ids if product_id is not None]
+    _, listed_bits = _routine_bits(catalog, listed)
+    bits_of = dict(zip(listed, listed_bits))
+    option_bits = [np.array([bits_of.get(product_id, 0) for product_id in ids], dtype=np.uint64) for ids in options]
+
+    choice = np.stack(np.meshgrid(*[np.arange(len(ids)) for ids in options], indexing='ij'), axis=-1)
+    choice = choice.reshape(-1, len(steps))
+    bits = np.stack([option_bits[i][choice[:, i]] for i in range(len(steps))], axis=-1)
+    clear = np.flatnonzero(~conflict_bits(bits).any(axis=-1))
+    if not len(clear):
+        return None
+    # Row 0 keeps every pick
+    if clear[0] == 0:
+        return {}
+    best = clear[np.lexsort((choice[clear].sum(axis=1), (choice[clear] != 0).sum(axis=1)))[0]]
+    return {step: alternatives[step][choice[best, i] - 1] for i, step in enumerate(steps) if choice[best, i]}
+
+
+def serialize_routine(routine):
+    """JSON-ready form of a routine: {step: {"product_id", "details"}}."""
+    return {
+        step: {'product_id': None if product_id is None else str(product_id), 'details': details}
+        for step, (details, product_id) in routine.items()
+    }
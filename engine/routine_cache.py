@@ -0,0 +1,101 @@
+"""Bounded LRU of built routines, keyed on (catalog key, canonical profile).
+
+The profile space is small and finite, so most submits are repeats of a
+profile some other session already asked for. Everything in this module
+is plain Python: a materialized lookup table (see engine/materialize.py)
+can be served with `lookup_routine` without touching pandas.
+"""
+import threading
+from collections import OrderedDict
+
+from engine.taxonomy import CONCERN_KEYWORDS
+
+DEFAULT_MAXSIZE = 4096
+
+
+def canonical_profile(skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area):
+    """Hashable profile that maps equal routines to equal keys.
+
+    Only concerns with keywords affect the routine, and their order never
+    does. Repeats are kept because each one adds to the Treat score.
+    """
+    known = tuple(sorted(c for c in (concerns or ()) if c in CONCERN_KEYWORDS))
+    return (skin_type, known, bool(is_sensitive), bool(is_pregnant), bool(using_prescription), area)
+
+
+def profile_key(profile):
+    """Flat string form of a canonical profile, used by materialized tables."""
+    skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area = profile
+    flags = f"{int(is_sensitive)}{int(is_pregnant)}{int(using_prescription)}"
+    return f"{skin_type}|{'+'.join(concerns)}|{flags}|{area}"
+
+
+class RoutineCache:
+    """Thread-safe LRU shared by every session in the process."""
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            routine = self._entries.get(key)
+            if routine is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return routine
+
+    def put(self, key, routine):
+        with self._lock:
+            self._entries[key] = routine
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_build(self, key, build):
+        routine = self.get(key)
+        if routine is None:
+            routine = build()
+            self.put(key, routine)
+        return routine
+
+    def carry_over(self, old_catalog_key, new_catalog_key, keep):
+        """Reuse one catalog's cached routines for a patched copy of it.
+
+        Each (profile, routine) cached under `old_catalog_key` is copied to
+        `new_catalog_key` if `keep(profile, routine)` says the patch can't
+        change it. Returns (kept, dropped) counts.
+        """
+        with self._lock:
+            entries = [(key[1], routine) for key, routine in self._entries.items()
+                       if key[0] == old_catalog_key]
+        kept = [(profile, routine) for profile, routine in entries if keep(profile, routine)]
+        for profile, routine in kept:
+            self.put((new_catalog_key, profile), routine)
+        return len(kept), len(entries) - len(kept)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+ROUTINE_CACHE = RoutineCache()
+
+
+def lookup_routine(table, skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area):
+    """Routine from a materialized table, or None if the profile isn't in it."""
+    profile = canonical_profile(skin_type, concerns, is_sensitive, is_pregnant, using_prescription, area)
+    index = table['profiles'].get(profile_key(profile))
+    if index is None:
+        return None
+    return {step: tuple(pick) for step, pick in table['routines'][index].items()}
@@ -0,0 +1,90 @@
+"""Inventory CSV schema: expected columns, header aliases and Yes/No fields."""
+import re
+
+REQUIRED_COLUMNS = ('product_id', 'name')
+
+EXPECTED_COLUMNS = (
+    'product_id', 'name', 'category', 'step', 'product_type',
+    'suitable_skin_types', 'safe_for_sensitive', 'primary_target',
+    'secondary_target', 'key_actives', 'contains_retinol', 'contains_acid',
+    'contains_vitamin_c', 'prescription_only', 'recommended_time',
+    'max_frequency', 'notes',
+)
+
+# Misspelled or alternative headers found in real seller files -> the
+# name the engine reads. Keys are compared after header normalization.
+COLUMN_ALIASES = {
+    'prescripition_only': 'prescription_only',
+    'prescription': 'prescription_only',
+    'contains_vaitamin_c': 'contains_vitamin_c',
+    'contains_vit_c': 'contains_vitamin_c',
+    'id': 'product_id',
+    'sku': 'product_id',
+    'product_name': 'name',
+    'skin_types': 'suitable_skin_types',
+    'sensitive_safe': 'safe_for_sensitive',
+    'actives': 'key_actives',
+}
+
+# Free-text columns that must open with a Yes/No verdict
+YES_NO_COLUMNS = (
+    'contains_retinol', 'contains_acid', 'contains_vitamin_c',
+    'prescription_only', 'safe_for_sensitive',
+)
+
+_SEPARATORS = re.compile(r'[\s\-]+')
+
+
+class SchemaError(ValueError):
+    """The file can't be read as an inventory at all."""
+
+
+def normalize_header(name):
+    return _SEPARATORS.sub('_', str(name).strip().lower())
+
+
+def is_unnamed(name):
+    # pandas labels header cells that are blank as "Unnamed: <n>"
+    return not str(name).strip() or str(name).startswith('Unnamed:')
+
+
+def plan_columns(columns, partial=False):
+    """Work out how to rename a header row.
+
+    Returns (renames, dropped, notices): a mapping for DataFrame.rename, the
+    unnamed columns to drop, and messages describing what was changed.
+    Raises SchemaError if a required column is missing. `partial` headers
+    patch products that already exist, so only product_id is required.
+    """
+    renames, dropped, notices = {}, [], []
+    taken = set()
+    for column in columns:
+        if is_unnamed(column):
+            dropped.append(column)
+            continue
+        target = normalize_header(column)
+        target = COLUMN_ALIASES.get(target, target)
+        if target in taken:
+            dropped.append(column)
+            notices.append(f"Duplicate column '{column}' ignored.")
+            continue
+        taken.add(target)
+        if target != column:
+            renames[column] = target
+            if target != normalize_header(column):
+                notices.append(f"Column '{column}' read as '{target}'.")
+
+    if dropped and any(is_unnamed(c) for c in dropped):
+        count = sum(is_unnamed(c) for c in dropped)
+        notices.append(f"Ignored {count} column(s) with no header.")
+
+    required = ('product_id',) if partial else REQUIRED_COLUMNS
+    missing = [c for c in required if c not in taken]
+    if missing:
+        raise SchemaError(f"Missing required column(s): {', '.join(missing)}")
+
+    if 'category' not in taken and not partial:
+        notices.append("No 'category' column found in CSV. Products can't be placed in routine steps, "
+                       "so routines will only show generic suggestions.")
+
+    return renames, dropped, notices
@@ -0,0 +1,197 @@
+"""Inverted token index behind the Browse Products search box.
+
+Built once per catalog over `name`, `primary_target` and `key_actives`.
+Every query term is a prefix match against the sorted vocabulary, all terms
+must match, and hits are ranked by field-weighted score (an exact token
+counts double) with product_id as the tie-break. Work is proportional to
+the postings a query touches, not to the size of the catalog.
+"""
+import re
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+
+from engine import metrics
+from engine.relevance import top_k
+
+# Field -> weight of a token found in it
+SEARCH_FIELDS = (('name', 3), ('primary_target', 2), ('key_actives', 1))
+
+PAGE_SIZE = 20
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+_PREFIX_END = '\uffff'
+
+
+def tokenize(text):
+    return _TOKEN.findall(str(text).lower())
+
+
+class SearchResults:
+    """Ranked hits for one query; pages are cut with a partial selection."""
+
+    def __init__(self, rows, keys):
+        self.rows = rows
+        self.keys = keys
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def total(self):
+        return len(self.rows)
+
+    def page(self, number=1, size=PAGE_SIZE):
+        """Catalog row positions for 1-based page `number`, best first."""
+        start = (number - 1) * size
+        return self.rows[top_k(self.keys, start + size)[start:]]
+
+
+_NO_RESULTS = SearchResults(np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int64))
+
+
+class SearchIndex:
+    """CSR postings: vocab[i] occurs in rows[offsets[i]:offsets[i + 1]]."""
+
+    def __init__(self, vocab, offsets, rows, weights, id_rank):
+        self.vocab = vocab
+        self.offsets = offsets
+        self.rows = rows
+        self.weights = weights
+        self.id_rank = id_rank
+
+    def _term_hits(self, term):
+        lo = bisect_left(self.vocab, term)
+        hi = bisect_left(self.vocab, term + _PREFIX_END, lo)
+        if lo == hi:
+            return None
+        start, end = self.offsets[lo], self.offsets[hi]
+        rows = self.rows[start:end]
+        weights = self.weights[start:end].astype(np.int64)
+        if self.vocab[lo] == term:
+            weights[:self.offsets[lo + 1] - start] *= 2
+        # A row can hold several tokens sharing the prefix; sum them
+        hit_rows, inverse = np.unique(rows, return_inverse=True)
+        return hit_rows, np.bincount(inverse, weights=weights).astype(np.int64)
+
+    def search(self, query):
+        terms = tokenize(query)
+        if not terms:
+            return _NO_RESULTS
+
+        rows = scores = None
+        for term in dict.fromkeys(terms):
+            hits = self._term_hits(term)
+            if hits is None:
+                return _NO_RESULTS
+            if rows is None:
+                rows, scores = hits
+                continue
+            rows, mine, theirs = np.intersect1d(rows, hits[0], assume_unique=True, return_indices=True)
+            scores = scores[mine] + hits[1][theirs]
+            if len(rows) == 0:
+                return _NO_RESULTS
+
+        keys = (scores << 32) - self.id_rank[rows]
+        return SearchResults(rows, keys)
+
+
+def _postings(df, first_row=0):
+    """Distinct (token, row, weight) triples of a frame, sorted; None if empty."""
+    parts = []
+    for field, weight in SEARCH_FIELDS:
+        if field not in df.columns:
+            continue
+        tokens = df[field].fillna('').astype(str).str.lower().str.findall(_TOKEN.pattern).explode().dropna()
+        parts.append(pd.DataFrame({
+            'token': tokens.to_numpy(dtype=object),
+            'row': tokens.index.to_numpy(dtype=np.int32) + first_row,
+            'weight': np.full(len(tokens), weight, dtype=np.int16),
+        }))
+
+    if not parts or not sum(len(p) for p in parts):
+        return None
+    return (pd.concat(parts, ignore_index=True)
+            .groupby(['token', 'row'], sort=True)['weight'].sum()
+            .reset_index())
+
+
+def _csr(vocab, token_ids, rows, weights, id_rank):
+    # Old postings arrive sorted and every added row comes after the kept
+    # ones, so a stable sort on the token alone is enough (and nearly free).
+    order = np.argsort(token_ids, kind='stable')
+    offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(token_ids, minlength=len(vocab)), out=offsets[1:])
+    return SearchIndex(vocab, offsets, rows[order].astype(np.int32), weights[order].astype(np.int16), id_rank)
+
+
+def build_search_index(df):
+    id_rank = df['id_rank'].to_numpy(dtype=np.int64)
+    postings = _postings(df)
+    if postings is None:
+        return SearchIndex([], np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32),
+                           np.empty(0, dtype=np.int16), id_rank)
+
+    tokens = postings['token'].to_numpy(dtype=object)
+    vocab, starts = np.unique(tokens, return_index=True)
+    offsets = np.append(starts, len(postings)).astype(np.int64)
+    return SearchIndex(
+        vocab.tolist(),
+        offsets,
+        postings['row'].to_numpy(dtype=np.int32),
+        postings['weight'].to_numpy(dtype=np.int16),
+        id_rank,
+    )
+
+
+def patch_search_index(index, row_map, added, id_rank):
+    """Index for a patched catalog without re-tokenizing the unchanged rows.
+
+    `row_map[old_row]` is where an old row ended up (-1 if it was removed or
+    replaced) and `added` holds the new rows, which follow the kept ones.
+    """
+    vocab = index.vocab if isinstance(index.vocab, list) else index.vocab.tolist()
+    token_ids = np.repeat(np.arange(len(vocab), dtype=np.int64), np.diff(index.offsets))
+    rows = row_map[index.rows]
+    keep = rows >= 0
+    token_ids, rows, weights = token_ids[keep], rows[keep], np.asarray(index.weights)[keep]
+
+    postings = _postings(added, first_row=len(id_rank) - len(added))
+    if postings is not None:
+        new_tokens = postings['token'].to_numpy(dtype=object)
+        distinct = sorted(set(new_tokens.tolist()))
+        fresh = [t for t in distinct if not _in_sorted(vocab, t)]
+
+        # Splice the unseen tokens into the sorted vocab and shift old ids
+        insert = np.array([bisect_left(vocab, t) for t in fresh], dtype=np.int64)
+        token_ids += np.searchsorted(insert, token_ids, side='right')
+        merged, start = [], 0
+        for at, token in zip(insert.tolist(), fresh):
+            merged.extend(vocab[start:at])
+            merged.append(token)
+            start = at
+        merged.extend(vocab[start:])
+        vocab = merged
+
+        ids = {t: bisect_left(vocab, t) for t in distinct}
+        token_ids = np.concatenate([token_ids, np.array([ids[t] for t in new_tokens], dtype=np.int64)])
+        rows = np.concatenate([rows, postings['row'].to_numpy(dtype=np.int64)])
+        weights = np.concatenate([weights, postings['weight'].to_numpy(dtype=np.int16)])
+
+    # Drop tokens whose last product went away
+    live = np.bincount(token_ids, minlength=len(vocab)) > 0
+    if not live.all():
+        token_ids = (np.cumsum(live) - 1)[token_ids]
+        vocab = [t for t, alive in zip(vocab, live.tolist()) if alive]
+    return _csr(vocab, token_ids, rows, weights, id_rank)
+
+
+def _in_sorted(vocab, token):
+    at = bisect_left(vocab, token)
+    return at < len(vocab) and vocab[at] == token
+
+
+def search_products(catalog, query):
+    with metrics.span('search'):
+        return catalog.search_index.search(query)
@@ -0,0 +1,280 @@
+"""JSON recommendation service for storefront widgets.
+
+    python -m engine.service --port 8080 [-c skincare_products_fixed.csv] [--store DIR] [-w WORKERS]
+
+    POST /routine  {"skin_type": "Oily", "concerns": ["acne"], "sensitive": false,
+                    "pregnant": false, "prescription": false, "area": "Face",
+                    "seller": "acme", "id": "optional, echoed back",
+                    "alternatives": 3, "exclude": ["P004", "P010"]}
+    GET  /routine?skin_type=Oily&concerns=acne;dull+skin&area=Face
+      -> {"id", "profile", "routine": {step: {"product_id", "details"}}, "goals",
+          "conflicts": [{"conflict", "text", "products": [{"step", "product_id", "ingredients"}]}],
+          "alternatives": {step: [{"product_id", "name", "score", "details"}]}}
+    GET  /healthz   in-flight and coalescing counters
+    GET  /metrics   Prometheus text (see engine/metrics.py), the workers' included
+
+The server is plain asyncio streams speaking HTTP/1.1 with keep-alive.
+Routines are built in a process pool whose workers keep the catalogs and
+ROUTINE_CACHE warm. Requests for the same seller and canonical profile
+that arrive while one is being built all wait on that one computation.
+Without "seller" the -c catalog is used; with it, the seller's published
+catalog from the store (see engine/store.py). Products in "exclude" (out of
+stock, rejected by the shopper) are skipped by both the routine and the
+ranked alternatives, which also leave out the routine's own picks. SIGTERM or Ctrl-C stops accepting connections and
+shuts the worker pool down.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+from engine import metrics
+from engine.batch import pool_context
+from engine.catalog import load_catalog
+from engine.goals import get_next_skin_goals
+from engine.profile import PROFILE_FIELDS, profile_from_record
+from engine.routine import build_alternatives, build_routine, routine_conflicts, serialize_routine
+from engine.routine_cache import canonical_profile
+from engine.store import CatalogStore, UnknownSeller
+
+MAX_BODY = 64 * 1024
+MAX_ALTERNATIVES = 20
+IDLE_TIMEOUT = 30.0
+
+_REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+            413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+# Set in each worker process by _init_worker
+_catalog_path = None
+_store = None
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def _init_worker(catalog_path, store_root):
+    global _catalog_path, _store
+    _catalog_path = catalog_path
+    _store = CatalogStore(store_root)
+    load_catalog(catalog_path)
+
+
+def _compute(seller, profile, alternatives=0, exclude=()):
+    """Worker side: serialized routine (and alternatives) for a canonical profile."""
+    catalog = _store.get(seller) if seller else load_catalog(_catalog_path)
+    routine = build_routine(catalog, *profile, exclude=exclude)
+    result = {'routine': serialize_routine(routine), 'conflicts': routine_conflicts(catalog, routine)}
+    if alternatives:
+        # Alternatives are for replacing a pick, so the routine's own picks are left out
+        picked = [product_id for _, product_id in routine.values() if product_id is not None]
+        result['alternatives'] = build_alternatives(catalog, *profile, k=alternatives,
+                                                    exclude=(*exclude, *picked))
+    # Stages and cache counters recorded here are rendered by the parent's /metrics
+    result['metrics'] = metrics.drain() if metrics.enabled() else None
+    return result
+
+
+class RoutineService:
+    """Request handling, in-flight coalescing and the worker pool."""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.inflight = {}
+        self.computed = 0
+        self.coalesced = 0
+
+    async def routine(self, seller, profile, alternatives=0, exclude=()):
+        key = (seller, canonical_profile(*profile), alternatives, exclude)
+        future = self.inflight.get(key)
+        if future is not None:
+            self.coalesced += 1
+            metrics.count('service_coalesced')
+        else:
+            self.computed += 1
+            future = asyncio.get_running_loop().run_in_executor(self.executor, _compute, *key)
+            self.inflight[key] = future
+            future.add_done_callback(lambda done: self._finished(key, done))
+        # Shielded: a client hanging up must not cancel work others wait on
+        return await asyncio.shield(future)
+
+    def _finished(self, key, future):
+        self.inflight.pop(key, None)
+        if not future.cancelled() and future.exception() is None and future.result()['metrics']:
+            metrics.merge(future.result()['metrics'])
+
+    async def recommend(self, record):
+        if not isinstance(record, dict):
+            raise HTTPError(400, "Expected a JSON object")
+        try:
+            profile = profile_from_record(record)
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        seller = record.get('seller') or None
+        alternatives, exclude = _alternatives_options(record)
+        try:
+            result = await self.routine(seller, profile, alternatives, exclude)
+        except UnknownSeller:
+            raise HTTPError(404, f"No published inventory for seller {seller!r}")
+        except ValueError as e:
+            raise HTTPError(400, str(e))
+        response = {
+            'id': record.get('id'),
+            'profile': dict(zip(PROFILE_FIELDS, profile)),
+            'routine': result['routine'],
+            'conflicts': result['conflicts'],
+            'goals': get_next_skin_goals(profile[1]),
+        }
+        if 'alternatives' in result:
+            response['alternatives'] = result['alternatives']
+        return response
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == '/routine':
+            if method == 'POST':
+                try:
+                    record = json.loads(body or b'null')
+                except ValueError:
+                    raise HTTPError(400, "Body is not valid JSON")
+                return await self.recommend(record)
+            if method == 'GET':
+                return await self.recommend(dict(parse_qsl(url.query)))
+            raise HTTPError(405, "Use GET or POST")
+        if url.path == '/healthz' and method == 'GET':
+            return {'status': 'ok', 'inflight': len(self.inflight),
+                    'computed': self.computed, 'coalesced': self.coalesced}
+        if url.path == '/metrics' and method == 'GET':
+            return metrics.render()
+        raise HTTPError(404, f"No route for {method} {url.path}")
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(_read_request(reader), IDLE_TIMEOUT)
+                except HTTPError as e:
+                    await _respond(writer, e.status, {'error': str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                route = urlsplit(target).path
+                with metrics.span('service_request', route=route):
+                    try:
+                        status, payload = 200, await self.dispatch(method, target, body)
+                    except HTTPError as e:
+                        status, payload = e.status, {'error': str(e)}
+                    except Exception as e:
+                        status, payload = 500, {'error': f"{type(e).__name__}: {e}"}
+                metrics.count('service_requests', status=status)
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                await _respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def _alternatives_options(record):
+    """(k, sorted excluded product_ids) from a request record."""
+    try:
+        k = int(record.get('alternatives') or 0)
+    except (TypeError, ValueError):
+        raise HTTPError(400, "'alternatives' must be a whole number")
+    if not 0 <= k <= MAX_ALTERNATIVES:
+        raise HTTPError(400, f"'alternatives' must be between 0 and {MAX_ALTERNATIVES}")
+    exclude = record.get('exclude') or ()
+    if isinstance(exclude, str):
+        exclude = exclude.split(',')
+    if not isinstance(exclude, (list, tuple)):
+        raise HTTPError(400, "'exclude' must be a list of product_ids")
+    return k, tuple(sorted({str(product_id).strip() for product_id in exclude} - {''}))
+
+
+async def _read_request(reader):
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError:
+        raise HTTPError(400, "Invalid Content-Length") from None
+    if length < 0:
+        raise HTTPError(400, "Invalid Content-Length")
+    if length > MAX_BODY:
+        raise HTTPError(413, f"Body larger than {MAX_BODY} bytes")
+    body = await reader.readexactly(length) if length else b''
+    return method.upper(), target, headers, body
+
+
+async def _respond(writer, status, payload, keep_alive=True):
+    if isinstance(payload, str):
+        body, kind = payload.encode('utf-8'), 'text/plain; version=0.0.4; charset=utf-8'
+    else:
+        body, kind = json.dumps(payload, ensure_ascii=False).encode('utf-8'), 'application/json'
+    head = (f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            f"Content-Type: {kind}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode('latin-1') + body)
+    await writer.drain()
+
+
+async def serve(host, port, catalog_path, store_root=None, workers=None, ready=None):
+    # Load once here so forked workers inherit the compiled catalog
+    load_catalog(catalog_path)
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(workers, mp_context=pool_context(),
+                             initializer=_init_worker, initargs=(catalog_path, store_root)) as executor:
+        service = RoutineService(executor)
+        server = await asyncio.start_server(service.handle, host, port)
+        bound = server.sockets[0].getsockname()
+        print(f"Serving routines on http://{bound[0]}:{bound[1]} with {workers} worker(s)", file=sys.stderr)
+        if ready:
+            ready(bound)
+        stopping = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stopping.set)
+        async with server:
+            await stopping.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('-c', '--catalog', default='skincare_products_fixed.csv', help="inventory CSV")
+    parser.add_argument('--store', help="catalog store directory for 'seller' requests")
+    parser.add_argument('-w', '--workers', type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    metrics.start_exporters()
+    try:
+        asyncio.run(serve(args.host, args.port, args.catalog, args.store, args.workers))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""Similar products ("more like this") by TF-IDF over their descriptive text.
+
+Each product becomes a sparse, L2-normalized TF-IDF vector over the tokens
+of SIMILAR_FIELDS. Tokens found in more than MAX_DF of the products
+("for", "skin") are dropped, and a product keeps only its MAX_TERMS
+heaviest. Vectors are held twice in CSR form: by product for the query
+side, and by token as an inverted index, so a product's cosine scores
+against the whole catalog are one gather plus one bincount over the
+postings of its own tokens.
+
+The index is built once per catalog, on first use. Sellers repeat cells
+across variants, so each distinct cell is tokenized once. A product's
+ranked neighbours are computed on its first lookup and kept, so later
+lookups are a dict hit plus a mask over NEIGHBOURS rows. Lookups take the
+same profile as `build_routine`, filtered through the compiled safety,
+skin type and area flags.
+"""
+import numpy as np
+import pandas as pd
+
+from engine import metrics
+from engine.flags import SKIN_ALL, SKIN_TYPE_BITS, blocked_bits, profile_mask
+from engine.relevance import top_k
+from engine.routine_cache import RoutineCache
+
+SIMILAR_FIELDS = ('key_actives', 'primary_target', 'secondary_target', 'notes')
+
+# Share of products above which a token says nothing about similarity
+MAX_DF = 0.5
+
+# Heaviest tokens kept per product
+MAX_TERMS = 32
+
+# Ranked neighbours kept per product looked up
+NEIGHBOURS = 50
+
+DEFAULT_SIMILAR = 5
+
+_TOKEN = r'[a-z0-9]+'
+
+# Scores are compared as fixed point, with product_id breaking ties
+_SCALE = 1 << 24
+
+INDEX_CACHE = RoutineCache(maxsize=8)
+
+# Profile of a lookup that names none: any skin type and area, with the
+# safety defaults of `blocked_bits` (no prescription-only products)
+_ANY_PROFILE = (None, False, False, False, None)
+
+
+def _field_postings(values, vocab):
+    """(row, token id, count) triples of one text column, each distinct cell tokenized once.
+
+    New tokens are added to `vocab` (token -> id).
+    """
+    codes, cells = pd.factorize(values)
+    tokens = pd.Series(cells, dtype=object).astype(str).str.lower().str.findall(_TOKEN).explode().dropna()
+    if tokens.empty:
+        return None
+    ids = tokens.map(lambda token: vocab.setdefault(token, len(vocab)))
+    cell_tokens = pd.DataFrame({'cell': tokens.index.to_numpy(dtype=np.int64), 'token': ids.to_numpy(dtype=np.int64)})
+    counts = cell_tokens.groupby(['cell', 'token'], sort=True).size()
+    cell = counts.index.get_level_values(0).to_numpy()
+    token = counts.index.get_level_values(1).to_numpy()
+
+    # Every row takes its cell's slice of the (cell, token) triples
+    offsets = np.zeros(len(cells) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cell, minlength=len(cells)), out=offsets[1:])
+    rows = np.flatnonzero(codes >= 0)
+    starts = offsets[codes[rows]]
+    lengths = offsets[codes[rows] + 1] - starts
+    total = int(lengths.sum())
+    take = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+    return np.repeat(rows, lengths), token[take], counts.to_numpy()[take]
+
+
+class SimilarityIndex:
+    """TF-IDF vectors of a catalog's products, by product and by token."""
+
+    def __init__(self, catalog):
+        n = len(catalog)
+        self.id_rank = catalog.df['id_rank'].to_numpy(dtype=np.int64)
+        vocab = {}
+        parts = [_field_postings(catalog.text.column(field), vocab)
+                 for field in SIMILAR_FIELDS if field in catalog.text.columns]
+        parts = [part for part in parts if part is not None]
+        if parts:
+            rows, tokens, counts = (np.concatenate(column) for column in zip(*parts))
+        else:
+            rows = tokens = counts = np.empty(0, dtype=np.int64)
+
+        # Same token in several fields of one product: one entry
+        pairs, inverse = np.unique(rows * max(len(vocab), 1) + tokens, return_inverse=True)
+        counts = np.bincount(inverse, weights=counts, minlength=len(pairs))
+        rows, tokens = np.divmod(pairs, max(len(vocab), 1))
+
+        df = np.bincount(tokens, minlength=len(vocab))
+        useful = df[tokens] <= max(MAX_DF * n, 1)
+        rows, tokens, counts = rows[useful], tokens[useful], counts[useful]
+        weights = (1 + np.log(counts)) * (np.log((1 + n) / (1 + df[tokens])) + 1)
+
+        # Heaviest MAX_TERMS per product, then unit length
+        order = np.lexsort((-weights, rows))
+        rows, tokens, weights = rows[order], tokens[order], weights[order]
+        starts = np.searchsorted(rows, rows)
+        kept = np.arange(len(rows)) - starts < MAX_TERMS
+        rows, tokens, weights = rows[kept], tokens[kept], weights[kept]
+        norms = np.sqrt(np.bincount(rows, weights=weights * weights, minlength=n))
+        weights = (weights / norms[rows]).astype(np.float32)
+
+        self.offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n), out=self.offsets[1:])
+        self.tokens = tokens
+        self.weights = weights
+
+        by_token = np.argsort(tokens, kind='stable')
+        self.token_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tokens, minlength=len(vocab)), out=self.token_offsets[1:])
+        self.posting_rows = rows[by_token]
+        self.posting_weights = weights[by_token]
+        self._neighbours = {}
+
+    def __len__(self):
+        return len(self.id_rank)
+
+    def scores(self, row):
+        """Cosine similarity of every product to the one at `row`."""
+        start, end = self.offsets[row], self.offsets[row + 1]
+        tokens, weights = self.tokens[start:end], self.weights[start:end]
+        lo, hi = self.token_offsets[tokens], self.token_offsets[tokens + 1]
+        lengths = hi - lo
+        take = np.repeat(lo - np.cumsum(lengths) + lengths, lengths) + np.arange(int(lengths.sum()))
+        return np.bincount(self.posting_rows[take],
+                           weights=self.posting_weights[take] * np.repeat(weights, lengths),
+                           minlength=len(self))
+
+    def ranked(self, row, mask=None, k=NEIGHBOURS):
+        """(rows, scores) of the k products most like `row`, best first, where `mask` holds."""
+        scores = self.scores(row)
+        scores[row] = 0
+        candidates = np.flatnonzero(scores > 0)
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        keys = (np.round(scores[candidates] * _SCALE).astype(np.int64) << 32) - self.id_rank[candidates]
+        best = candidates[top_k(keys, k)]
+        return best, scores[best]
+
+    def neighbours(self, row):
+        """`ranked(row)`, computed on the first lookup of `row` and kept."""
+        entry = self._neighbours.get(row)
+        if entry is None:
+            entry = self._neighbours[row] = self.ranked(row)
+        return entry
+
+
+def similarity_index(catalog):
+    """The catalog's SimilarityIndex, built on first use."""
+    def build():
+        with metrics.span('similarity_index'):
+            return SimilarityIndex(catalog)
+
+    return INDEX_CACHE.get_or_build(catalog.key, build)
+
+
+def similar_products(catalog, product_id, profile=None, k=DEFAULT_SIMILAR):
+    """[{product_id, name, score}] for the k products most like `product_id`.
+
+    `profile` is (skin_type, is_sensitive, is_pregnant, using_prescription,
+    area), as on the routine form; products it rules out are skipped.
+    Without it any skin type and area will do, but the safety defaults of
+    `blocked_bits` still apply.
+    """
+    row = catalog.positions([product_id])[0]
+    if row < 0:
+        return []
+    with metrics.span('similar_products'):
+        index = similarity_index(catalog)
+        rows, scores = index.neighbours(row)
+        skin_type, is_sensitive, is_pregnant, using_prescription, area = profile or _ANY_PROFILE
+        blocked = blocked_bits(is_sensitive, is_pregnant, using_prescription, area)
+        accepted = SKIN_TYPE_BITS.get(skin_type, SKIN_ALL)
+        keep = (catalog.df['safety_flags'].to_numpy()[rows] & blocked) == 0
+        keep &= (catalog.df['skin_flags'].to_numpy()[rows] & accepted) != 0
+        rows, scores = rows[keep], scores[keep]
+        if len(rows) < k and len(keep) == NEIGHBOURS:
+            # The profile ruled out most of the kept neighbours; rank again under it
+            mask = profile_mask(catalog.df, skin_type, is_sensitive, is_pregnant, using_prescription, area)
+            rows, scores = index.ranked(row, mask, k)
+        rows, scores = rows[:k], scores[:k]
+        return [{'product_id': record['product_id'], 'name': record['name'], 'score': round(float(score), 3)}
+                for record, score in zip(catalog.records(rows), scores)]
@@ -0,0 +1,300 @@
+"""Per-seller catalog store backed by memory-mapped files.
+
+Each published inventory is written once as an uncompressed Arrow file plus
+raw .npy arrays for its search index:
+
+    <root>/<seller_id>/CURRENT              name of the live version
+    <root>/<seller_id>/<version>/catalog.arrow     compiled columns
+    <root>/<seller_id>/<version>/text.arrow        display text (engine/textstore.py)
+    <root>/<seller_id>/<version>/search_*.npy
+    <root>/<seller_id>/<version>/meta.json
+
+Opening a version maps those files read-only. pandas' Arrow-backed columns
+and numpy memmaps point straight into the mapping, so every session and
+every worker process reading the same seller shares one copy of the pages
+through the OS page cache. Publishing writes a new version directory and
+then swaps CURRENT with an atomic rename; readers pick the new version up
+on their next `get` and finish in-flight work on the old one.
+
+meta.json records FORMAT_VERSION and the SNAPSHOT_VERSION of the build
+that compiled the version. A version written under other numbers is
+refused with StaleVersion; publish the inventory again to replace it.
+
+    python -m engine.store publish <seller_id> <csv> [--root DIR]
+    python -m engine.store patch <seller_id> [--upsert CSV] [--delete ID ...]
+    python -m engine.store list [--root DIR]
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+from engine.catalog import SNAPSHOT_VERSION, Catalog, load_catalog
+from engine.delta import apply_delta, carry_over_routines
+from engine.ingest import IngestIssue, IngestReport
+from engine.search import SearchIndex
+from engine.textstore import TextStore
+
+STORE_ENV = 'SKINCARE_CATALOG_STORE'
+DEFAULT_ROOT = 'catalog_store'
+
+# Bump whenever write_version changes the files it writes
+FORMAT_VERSION = 1
+
+# Old versions kept around after a publish, for readers still using them
+KEEP_VERSIONS = 2
+
+# Published versions and CURRENT are readable by every local user
+VERSION_MODE = 0o755
+POINTER_MODE = 0o644
+
+_SELLER_ID = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$')
+_SEARCH_ARRAYS = ('offsets', 'rows', 'weights', 'vocab')
+
+
+class UnknownSeller(KeyError):
+    """Nothing is published for the seller."""
+
+
+class StaleVersion(Exception):
+    """The live version was written by a build whose files this one can't read."""
+
+
+def _check_seller(seller_id):
+    if not isinstance(seller_id, str) or not _SELLER_ID.match(seller_id) or '..' in seller_id:
+        raise ValueError(f"Invalid seller id {seller_id!r}")
+    return seller_id
+
+
+def _report_to_json(report):
+    return {
+        'notices': report.notices,
+        'issues': [[i.line, i.message] for i in report.issues],
+        'issue_count': report.issue_count,
+        'rows_read': report.rows_read,
+        'rows_kept': report.rows_kept,
+    }
+
+
+def _report_from_json(data):
+    report = IngestReport()
+    report.notices = list(data.get('notices', []))
+    report.issues = [IngestIssue(line, message) for line, message in data.get('issues', [])]
+    report.issue_count = data.get('issue_count', len(report.issues))
+    report.rows_read = data.get('rows_read', 0)
+    report.rows_kept = data.get('rows_kept', 0)
+    return report
+
+
+def write_version(folder, catalog):
+    """Write a catalog's mappable files into an existing, empty folder."""
+    table = pa.Table.from_pandas(catalog.df, preserve_index=False)
+    with pa.OSFile(os.path.join(folder, 'catalog.arrow'), 'wb') as sink:
+        with ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    catalog.text.write(os.path.join(folder, 'text.arrow'))
+
+    index = catalog.search_index
+    arrays = {
+        'offsets': np.asarray(index.offsets, dtype=np.int64),
+        'rows': np.asarray(index.rows, dtype=np.int32),
+        'weights': np.asarray(index.weights, dtype=np.int16),
+        'vocab': np.asarray(index.vocab, dtype=str),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(folder, f'search_{name}.npy'), array)
+
+    with open(os.path.join(folder, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'format': FORMAT_VERSION, 'compiled': SNAPSHOT_VERSION,
+                   'key': catalog.key, 'rows': len(catalog), 'parent': catalog.parent,
+                   'report': _report_to_json(catalog.report)}, f)
+
+
+def open_version(folder):
+    """Catalog whose columns and index arrays are views of mapped files.
+
+    Raises StaleVersion for a version written by an incompatible build.
+    """
+    with open(os.path.join(folder, 'meta.json'), encoding='utf-8') as f:
+        meta = json.load(f)
+    if (meta.get('format'), meta.get('compiled')) != (FORMAT_VERSION, SNAPSHOT_VERSION):
+        raise StaleVersion(f"{folder} was written by an incompatible build; publish the inventory again")
+
+    source = pa.memory_map(os.path.join(folder, 'catalog.arrow'), 'r')
+    table = ipc.open_file(source).read_all()
+    df = table.to_pandas(split_blocks=True, self_destruct=False)
+    text = TextStore.open(os.path.join(folder, 'text.arrow'))
+
+    arrays = {name: np.load(os.path.join(folder, f'search_{name}.npy'), mmap_mode='r')
+              for name in _SEARCH_ARRAYS}
+    search_index = SearchIndex(
+        arrays['vocab'],
+        arrays['offsets'],
+        arrays['rows'],
+        arrays['weights'],
+        df['id_rank'].to_numpy(dtype=np.int64),
+    )
+    catalog = Catalog(df, meta['key'], _report_from_json(meta['report']), search_index=search_index, text=text)
+    if meta.get('parent'):
+        catalog.parent = tuple(meta['parent'])
+    return catalog
+
+
+class CatalogStore:
+    """Seller id -> live compiled catalog, shared through mapped files."""
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or os.environ.get(STORE_ENV, DEFAULT_ROOT))
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def _seller_dir(self, seller_id):
+        return os.path.join(self.root, _check_seller(seller_id))
+
+    def sellers(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if os.path.isfile(os.path.join(self.root, name, 'CURRENT')))
+
+    def current_version(self, seller_id):
+        try:
+            with open(os.path.join(self._seller_dir(seller_id), 'CURRENT'), encoding='utf-8') as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            raise UnknownSeller(seller_id) from None
+
+    def get(self, seller_id):
+        """The seller's live catalog.
+
+        Raises UnknownSeller if nothing is published, and StaleVersion if the
+        live version needs publishing again under this build.
+        """
+        pointer = os.path.join(self._seller_dir(seller_id), 'CURRENT')
+        try:
+            info = os.stat(pointer)
+        except FileNotFoundError:
+            raise UnknownSeller(seller_id) from None
+        stamp = (info.st_ino, info.st_mtime_ns)
+
+        with self._lock:
+            cached = self._open.get(seller_id)
+            if cached and cached[0] == stamp:
+                return cached[1]
+
+        version = self.current_version(seller_id)
+        catalog = open_version(os.path.join(self._seller_dir(seller_id), version))
+        # A published delta keeps the routines this process cached for the
+        # version it replaced, unless the change could affect them.
+        previous = cached[1] if cached else None
+        if previous is not None and catalog.parent and catalog.parent[0] == previous.key:
+            carry_over_routines(previous, catalog)
+        with self._lock:
+            self._open[seller_id] = (stamp, catalog)
+        return catalog
+
+    def publish(self, seller_id, catalog):
+        """Make `catalog` the seller's live inventory. Returns the version name."""
+        seller_dir = self._seller_dir(seller_id)
+        os.makedirs(seller_dir, exist_ok=True)
+        version = catalog.key[:16]
+        target = os.path.join(seller_dir, version)
+
+        if not os.path.isdir(target):
+            staging = tempfile.mkdtemp(prefix='.staging-', dir=seller_dir)
+            try:
+                write_version(staging, catalog)
+                # mkdtemp and mkstemp are private to the publisher; services may run as other users
+                os.chmod(staging, VERSION_MODE)
+                os.rename(staging, target)
+            except OSError:
+                shutil.rmtree(staging, ignore_errors=True)
+                if not os.path.isdir(target):
+                    raise
+
+        fd, tmp = tempfile.mkstemp(prefix='.CURRENT-', dir=seller_dir)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(version)
+        os.chmod(tmp, POINTER_MODE)
+        os.replace(tmp, os.path.join(seller_dir, 'CURRENT'))
+
+        self.prune(seller_id)
+        return version
+
+    def publish_csv(self, seller_id, path, progress=None):
+        return self.publish(seller_id, load_catalog(path, progress=progress))
+
+    def patch(self, seller_id, upserts=None, deletes=(), report=None):
+        """Apply a delta (see engine/delta.py) to the live catalog and publish it."""
+        return self.publish(seller_id, apply_delta(self.get(seller_id), upserts, deletes, report))
+
+    def prune(self, seller_id, keep=KEEP_VERSIONS):
+        """Delete all but the newest `keep` versions (the live one always stays).
+
+        Processes that still have a deleted version mapped keep reading it;
+        the OS frees the pages once the last mapping goes away.
+        """
+        seller_dir = self._seller_dir(seller_id)
+        live = self.current_version(seller_id)
+        versions = [name for name in os.listdir(seller_dir)
+                    if not name.startswith('.') and name != live
+                    and os.path.isdir(os.path.join(seller_dir, name))]
+        versions.sort(key=lambda name: os.path.getmtime(os.path.join(seller_dir, name)), reverse=True)
+        for name in versions[max(keep - 1, 0):]:
+            shutil.rmtree(os.path.join(seller_dir, name), ignore_errors=True)
+
+
+_default_store = None
+
+
+def catalog_store():
+    """Process-wide store rooted at $SKINCARE_CATALOG_STORE (or ./catalog_store)."""
+    global _default_store
+    if _default_store is None:
+        _default_store = CatalogStore()
+    return _default_store
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the per-seller catalog store.")
+    parser.add_argument('--root', help=f"store directory (default: ${STORE_ENV} or ./{DEFAULT_ROOT})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    publish = commands.add_parser('publish', help="compile a CSV and make it a seller's live catalog")
+    publish.add_argument('seller_id')
+    publish.add_argument('csv')
+    patch = commands.add_parser('patch', help="upsert and delete products in a seller's live catalog")
+    patch.add_argument('seller_id')
+    patch.add_argument('--upsert', help="CSV of changed or new products (blank cells keep current values)")
+    patch.add_argument('--delete', nargs='*', default=[], metavar='PRODUCT_ID')
+    commands.add_parser('list', help="list sellers and their live versions")
+    args = parser.parse_args(argv)
+
+    store = CatalogStore(args.root)
+    if args.command == 'publish':
+        version = store.publish_csv(args.seller_id, args.csv)
+        print(f"{args.seller_id}: {version} is live", file=sys.stderr)
+    elif args.command == 'patch':
+        report = IngestReport()
+        upserts = pd.read_csv(args.upsert, dtype=str) if args.upsert else None
+        version = store.patch(args.seller_id, upserts, args.delete, report)
+        for notice in report.notices:
+            print(notice, file=sys.stderr)
+        for issue in report.issues:
+            print(f"line {issue.line}: {issue.message}", file=sys.stderr)
+        print(f"{args.seller_id}: {version} is live", file=sys.stderr)
+    else:
+        for seller_id in store.sellers():
+            print(f"{seller_id}\t{store.current_version(seller_id)}")
+
+
+if __name__ == '__main__':
+    main()
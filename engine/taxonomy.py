@@ -0,0 +1,140 @@
+"""Shared vocabularies the engine matches inventory text against."""
+
+# Regex alternations scored against each product's target / actives / notes
+CONCERN_KEYWORDS = {
+    "acne": "acne|blemish|pore|salicylic|benzoyl|breakout|niacinamide|oil control",
+    "dark spots / uneven tone / melasma": "brightening|even tone|fade spots|whitening|hyperpigmentation|dark spots|melasma|pigment|arbutin|kojic|niacinamide|vitamin c|tranexamic|azelaic|licorice|discoloration|spot fading|tone correcting",
+    "dryness / dehydration": "hydration|hyaluronic|moisturizing|dryness|ceramide|glycerin|plumping|humectant",
+    "texture / rough skin": "texture|rough|exfoliation|smoothing|glycolic|lactic",
+    "aging / fine lines": "anti-aging|retinol|firming|wrinkle",
+    "sensitivity / irritation": "sensitive|soothing|gentle|calming|centella|ceramide|barrier",
+    "dull skin": "dull|glow|radiance|vitamin c",
+    "damaged barrier": "barrier|ceramide|repair|restore"
+}
+
+# Canonical ingredient -> regex alternation of the names sellers use for it
+# in key_actives. A key's position is its bit in the compiled
+# `ingredient_bits` column (see engine/ingredients.py), so only append.
+INGREDIENT_KEYWORDS = {
+    "hyaluronic acid": "hyaluronic|hyaluronate",
+    "glycerin": "glycerin|glycerol",
+    "snail mucin": "snail",
+    "panthenol": "panthenol|vitamin b5",
+    "ceramides": "ceramide",
+    "shea butter": "shea|butyrospermum",
+    "cocoa butter": "cocoa butter|theobroma",
+    "squalane": "squalane",
+    "petrolatum": "petrolatum|petroleum jelly",
+    "centella": "centella|cica\\b|madecassoside|asiaticoside",
+    "allantoin": "allantoin",
+    "lactic acid": "lactic acid|\\blactate",
+    "pha": "gluconolactone|lactobionic|\\bpha\\b",
+    "urea": "\\burea\\b",
+    "retinol": "\\bretinol\\b",
+    "retinyl esters": "retinyl|\\bvitamin a\\b",
+    "retinal": "\\bretinal(?:dehyde)?\\b",
+    "tretinoin": "tretinoin|retinoic acid",
+    "adapalene": "adapalene",
+    "glycolic acid": "glycolic",
+    "mandelic acid": "mandelic",
+    "salicylic acid": "salicylic|\\bbha\\b|willow bark",
+    "aha blend": "\\baha\\b|alpha[- ]hydroxy",
+    "azelaic acid": "azelaic",
+    "benzoyl peroxide": "benzoyl peroxide|\\bbpo\\b",
+    "vitamin c": "vitamin c\\b|ascorb",
+    "niacinamide": "niacinamide|nicotinamide|vitamin b3",
+    "hydroquinone": "hydroquinone",
+    "sulfur": "\\bsulfur\\b|\\bsulphur\\b",
+}
+
+# Seller categories that fill each routine step
+CATEGORY_MAPPING = {
+    'Cleanse': [
+        "Acne Treatment / Cleanser",
+        "Cleansing / Balancing / Brightening",
+        "Cleansing / Hydrating / Barrier Repair",
+        "Cleansing / Refreshing",
+        "Cleansing / Makeup Removal / Refreshing",
+        "Cleansing / Blemish Control / Barrier Repair",
+        "Cleansing / Oil Control / Barrier Repair",
+        "Cleansing / Exfoliating / Blemish Control",
+        "Feminine Hygiene / Cleansing",
+        "Exfoliating / Brightening / Cleansing",
+        "Hydrating / Nourishing / Cleansing",
+        "Refreshing / Hydrating / Cleansing",
+        "Hydrating / Pampering / Cleansing",
+        "Exfoliating / Refreshing / Cleansing",
+        "Exfoliating / Renewing / Cleansing",
+        "Cleansing / Hydrating",
+        "Brightening / Cleansing / Bar Soap"
+    ],
+    'Tone': [
+        "Brightening / Tone-Up",
+        "Hydrating / Barrier Repair",
+        "Hydrating / Plumping / Essence",
+        "Hydrating / Plumping / Serum",
+        "Brightening / Spot Fading / Essence"
+    ],
+    'Treat': [
+        "Serum / Barrier Repair / Hydrator",
+        "Brightening / Antioxidant / Serum",
+        "Brightening / Blemish Control / Serum",
+        "Brightening / Soothing / Serum",
+        "Exfoliating / Brightening / Serum",
+        "Anti-Aging / Brightening / Serum",
+        "Brightening / Tone Correcting / Serum"
+    ],
+    'Moisturize': [
+        "Exfoliating / Moisturizer",
+        "Moisturizer / Body Oil",
+        "Moisturizer / Hydrator",
+        "Moisturizer / Body Lotion",
+        "Moisturizer / Hydrator / Repair",
+        "Moisturizer / Balancing / Soothing",
+        "Brightening / Tone Correcting / Moisturizer",
+        "Brightening / Spot Treatment / Moisturizer",
+        "Brightening / Moisturizer / Hydrator",
+        "Brightening / Anti-Acne / Moisturizer",
+        "Brightening / Moisturizing / Tone Correcting",
+        "Moisturizer / Hydrator / Plumping",
+        "Moisturizer / Barrier Repair / Hydrator",
+        "Moisturizer / Blemish Control / Barrier Repair",
+        "Moisturizer / Brightening / Hydrator",
+        "Anti-Aging / Firming / Moisturizer",
+        "Moisturizer / Barrier Repair / Oil Control",
+        "Hydrating / Plumping / Moisturizer",
+        "Brightening / Moisturizing / Hydrator",
+        "Anti-Aging / Hydrating / Renewing",
+        "Anti-Aging / Moisturizer / Smoothing",
+        "Moisturizer / Hydrator",
+        "Brightening / Moisturizing / Body Oil",
+        "Moisturizer / Body Oil / Brightening",
+        "Moisturizer / Body Oil / Glow-Boosting",
+        "Brightening / Moisturizing / Body Oil Gel",
+        "Moisturizer / Hydrator / Body Oil Gel",
+        "Brightening / Moisturizing / Multi-Benefit"
+    ],
+    'Protect': [
+        "Sunscreen / UV Protection"
+    ]
+}
+
+# Words that place a category CATEGORY_MAPPING doesn't list, tried in
+# order; the first rule with a matching word wins. Categories naming an
+# UNROUTED_TOKENS word (scrubs, bath products) stay out of routines.
+# "Exfoliating" comes last so an exfoliating moisturizer stays a moisturizer.
+# Prescription-only products are kept out by their safety flag, not here.
+STEP_TOKEN_RULES = (
+    ('Protect', ('sunscreen', 'sunblock', 'spf', 'uv')),
+    ('Cleanse', ('cleansing', 'cleanser', 'wash', 'soap', 'micellar')),
+    ('Treat', ('serum', 'ampoule', 'treatment')),
+    ('Tone', ('toner', 'essence', 'mist')),
+    ('Moisturize', ('moisturizer', 'moisturiser', 'moisturizing', 'moisturising', 'hydrator',
+                    'lotion', 'cream', 'balm', 'butter')),
+    ('Treat', ('exfoliating', 'exfoliant', 'peel')),
+)
+UNROUTED_TOKENS = ('scrub', 'polish', 'bath', 'mask')
+
+# Profile values the routine form can submit
+SKIN_TYPES = ("Oily", "Dry", "Combination", "Normal")
+AREAS = ("Face", "Body", "Both")
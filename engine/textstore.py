@@ -0,0 +1,105 @@
+"""Display text kept out of the hot catalog frame.
+
+Routines are picked from compiled integer and bitmask columns; the
+seller's free text (names, how-to-use, notes, ...) is only read for the
+handful of products actually shown. A TextStore keeps those columns as one
+contiguous Arrow table, i.e. a UTF-8 arena plus row offsets per column, and
+`records(positions)` decodes just the requested rows. Written to disk as an
+Arrow IPC file it is memory-mapped back, so its pages are read on demand
+and shared by every process that maps the same file.
+"""
+import math
+import os
+import tempfile
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+
+class TextStore:
+    """Row-aligned text columns of a catalog, fetched by row position."""
+
+    def __init__(self, table, path=None):
+        self.table = table
+        self.path = path
+
+    @classmethod
+    def from_frame(cls, df):
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        return cls(table.combine_chunks())
+
+    @classmethod
+    def open(cls, path):
+        """Store over a file written by `write`, mapped read-only."""
+        with pa.memory_map(path, 'r') as source:
+            table = ipc.open_file(source).read_all()
+        return cls(table, path)
+
+    def __len__(self):
+        return self.table.num_rows
+
+    def __getstate__(self):
+        # A mapped store pickles as its path; workers map the same file
+        if self.path is not None:
+            return {'path': self.path}
+        return {'table': self.table}
+
+    def __setstate__(self, state):
+        if 'path' in state:
+            self.__init__(TextStore.open(state['path']).table, state['path'])
+        else:
+            self.__init__(state['table'])
+
+    @property
+    def columns(self):
+        return self.table.column_names
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def _take(self, positions):
+        return self.table.take(pa.array(np.asarray(positions, dtype=np.int64)))
+
+    def records(self, positions):
+        """One {column: text} dict per position; missing cells are NaN, as in pandas."""
+        rows = self._take(positions).to_pylist()
+        for row in rows:
+            for column, value in row.items():
+                if value is None:
+                    row[column] = math.nan
+        return rows
+
+    def column(self, name):
+        """One column for every row, as a pandas Series."""
+        return self.table.column(name).to_pandas()
+
+    def frame(self, positions=None):
+        table = self.table if positions is None else self._take(positions)
+        return table.to_pandas()
+
+    def take(self, positions):
+        return TextStore(self._take(positions).combine_chunks())
+
+    def concat(self, other):
+        """This store's rows followed by `other`'s (same columns)."""
+        table = pa.concat_tables([self.table, other.table.select(self.columns).cast(self.table.schema)])
+        return TextStore(table.combine_chunks())
+
+    def write(self, path):
+        """Save as an uncompressed Arrow file (atomically) and return the mapped store."""
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix='.text-', suffix='.tmp')
+        os.close(fd)
+        try:
+            with pa.OSFile(tmp, 'wb') as sink:
+                with ipc.new_file(sink, self.table.schema) as writer:
+                    writer.write_table(self.table)
+            # mkstemp creates the file 0600; other users' processes map it too
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return TextStore.open(path)
@@ -1,5 +1,20 @@
+import sqlite3
+import time
+import uuid
+from datetime import datetime
+
 import streamlit as st
 
+from engine import cached_catalog, load_catalog, metrics
+from engine.advice import progress_advice
+from engine.progress import DURATIONS, IMPROVEMENTS, PROBLEMS, progress_store, routine_id
+
+metrics.count("reruns", page="progress_tracker")
+
+# A storefront links here as ?user=<customer id>; otherwise check-ins are kept per browser session
+if "progress_user" not in st.session_state:
+    st.session_state.progress_user = st.query_params.get("user") or f"session-{uuid.uuid4().hex}"
+
 st.title("Track Your Skin Progress")
 
 st.markdown("Tell us how your skin has responded so far — we'll give you personalized next steps.")
@@ -7,38 +22,20 @@ st.markdown("Tell us how your skin has responded so far — we'll give you perso
 with st.form("progress_form"):
     st.subheader("Update your progress")
 
+    # Options come from engine/progress.py, where each answer is a bit in the stored check-in
     time_used = st.selectbox(
         "How long have you been using your current routine?",
-        ["Less than 2 weeks", "2–4 weeks", "4–8 weeks", "8+ weeks", "Not started yet"]
+        DURATIONS
     )
 
     improvements = st.multiselect(
         "What has improved?",
-        [
-            "Less dryness/tightness",
-            "More hydration/plumpness",
-            "Smoother texture",
-            "Brighter/radiant skin",
-            "Fewer breakouts",
-            "Less irritation/redness",
-            "Nothing yet",
-            "Other (please describe below)"
-        ]
+        IMPROVEMENTS
     )
 
     problems = st.multiselect(
         "What problems are you still having (or new issues)?",
-        [
-            "Still dry/tight",
-            "Still dull",
-            "Still rough texture",
-            "Breakouts/purging",
-            "Irritation/stinging",
-            "No improvement",
-            "Worse than before",
-            "New sensitivity",
-            "Other (please describe below)"
-        ]
+        PROBLEMS
     )
 
     notes = st.text_area(
@@ -50,6 +47,26 @@ with st.form("progress_form"):
     submitted = st.form_submit_button("Submit Progress & Get Advice", type="primary")
 
 if submitted:
+    earlier = []
+    result = st.session_state.get("routine_result")
+    current_routine = None
+    if result is not None and "routines" in result:
+        current_routine = routine_id(result["catalog_key"], [p for _, p in result["routines"][result["area"]].values()])
+    # The check-in is queued for a background writer; this rerun never waits on disk.
+    # History is read once per session and then kept current here, not re-read per submit.
+    try:
+        store = progress_store()
+        if "progress_history" not in st.session_state:
+            st.session_state.progress_history = store.history(st.session_state.progress_user, limit=5)
+        earlier = st.session_state.progress_history
+        store.record(st.session_state.progress_user, time_used, improvements, problems, notes, current_routine)
+        st.session_state.progress_history = [
+            {"submitted_at": time.time(), "time_used": time_used,
+             "improvements": list(improvements), "problems": list(problems)}
+        ] + earlier[:4]
+    except sqlite3.Error as e:
+        st.caption(f"Progress history is unavailable right now ({e}).")
+
     st.success("Progress submitted! Here's your follow-up advice:")
 
     if "Not started yet" in time_used:
@@ -59,20 +76,40 @@ if submitted:
     else:
         if problems:
             st.warning("Possible next steps:")
-            if any(p in problems for p in ["Still dry/tight", "Still dull"]):
-                st.write("• Layer a **hydrating essence or serum** before moisturizer")
-                st.write("• Consider a **richer night cream** or **occlusive** to lock in moisture")
-            if "Breakouts/purging" in problems:
-                st.write("• Purging is normal with exfoliating actives — usually settles in **4–6 weeks**")
-            if "Irritation/stinging" in problems or "New sensitivity" in problems:
-                st.write("• Reduce frequency to **every other day**")
-                st.write("• Add soothing ingredients: **centella**, **panthenol**, **ceramides**")
-            if "Worse than before" in problems:
-                st.error("**Stop new products immediately** and consult a dermatologist if irritation persists.")
+            # Tips come with products from the same catalog the routine was
+            # built from, filtered for the profile on that form
+            catalog = cached_catalog(result["catalog_key"]) if result is not None else None
+            if catalog is None:
+                try:
+                    catalog = load_catalog("skincare_products_fixed.csv")
+                except (OSError, ValueError):
+                    catalog = None
+            picked = []
+            if result is not None and "routines" in result:
+                picked = [p for _, p in result["routines"][result["area"]].values() if p is not None]
+            profile = result.get("profile") if result is not None else None
+            for advice in progress_advice(catalog, problems, profile, exclude=picked):
+                if advice["level"] == "stop":
+                    st.error(advice["text"])
+                    continue
+                st.write(f"• {advice['text']}")
+                for swap in advice["swaps"]:
+                    st.write(f" → Try **{swap['product_id']} — {swap['name']}** "
+                             f"({swap['step']}; {', '.join(swap['ingredients'])})")
         else:
             st.success("Looks like good progress! Keep the routine consistent for another **4–8 weeks**.")
 
         st.info("Want a full updated routine? Book a consultation or share progress photos next time.")
 
+    if earlier:
+        with st.expander(f"📈 Your earlier check-ins ({len(earlier)} most recent)"):
+            st.dataframe(
+                [{"date": datetime.fromtimestamp(c["submitted_at"]).strftime("%Y-%m-%d"),
+                  "time on routine": c["time_used"],
+                  "improved": ", ".join(c["improvements"]),
+                  "problems": ", ".join(c["problems"])} for c in earlier],
+                hide_index=True
+            )
+
 # Back button to main page
 st.markdown("[← Back to generate a new routine](/ )")
@@ -0,0 +1,15 @@
+import os
+
+import pytest
+
+from engine.catalog import ingest_catalog
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SHIPPED_CSV = os.path.join(ROOT, 'skincare_products_fixed.csv')
+
+
+@pytest.fixture(scope='session')
+def shipped_catalog():
+    """The shipped inventory, compiled in memory (no snapshot is written)."""
+    with open(SHIPPED_CSV, 'rb') as f:
+        return ingest_catalog(f, 'shipped-test')
@@ -0,0 +1,15 @@
+from engine.batch import read_profiles, routine_record
+
+
+def test_bad_jsonl_lines_become_error_records(tmp_path, shipped_catalog):
+    path = tmp_path / 'profiles.jsonl'
+    path.write_text('{"id": 1, "skin_type": "Oily"}\n{broken\n\n[1, 2]\nnull\n{"id": 2, "skin_type": "Weird"}\n')
+    results = [routine_record(shipped_catalog, record) for record in read_profiles(str(path))]
+    assert [r.get('id') for r in results] == [1, None, None, None, 2]
+    assert 'routine' in results[0]
+    assert [r.get('line') for r in results[1:4]] == [2, 4, 5]
+    assert all('error' in r for r in results[1:])
+
+
+def test_non_dict_record_gets_an_error():
+    assert 'error' in routine_record(None, ['Oily'])
@@ -0,0 +1,46 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+from engine.delta import apply_delta
+from engine.routine import build_routine, plan_routines
+from engine.routine_cache import ROUTINE_CACHE
+from engine.taxonomy import SKIN_TYPES
+
+CONCERNS = ((), ("acne",), ("texture / rough skin",), ("acne", "dryness / dehydration"))
+
+
+@pytest.fixture
+def routine_cache():
+    ROUTINE_CACHE.clear()
+    yield ROUTINE_CACHE
+    ROUTINE_CACHE.clear()
+
+
+def _cached(cache, catalog_key):
+    return {key[1]: routine for key, routine in cache._entries.items() if key[0] == catalog_key}
+
+
+def test_carried_over_routines_match_a_rebuild(routine_cache, shipped_catalog):
+    for skin_type, concerns, flags in itertools.product(SKIN_TYPES, CONCERNS,
+                                                        itertools.product((False, True), repeat=3)):
+        plan_routines(shipped_catalog, skin_type, list(concerns), *flags)
+    before = _cached(routine_cache, shipped_catalog.key)
+
+    cleanser = build_routine(shipped_catalog, "Normal", [], False, False, False, "Face")['Cleanse'][1]
+    toner = build_routine(shipped_catalog, "Oily", ["acne"], False, False, False, "Face")['Tone'][1]
+    upserts = pd.DataFrame([
+        {'product_id': toner, 'name': "Renamed Toner"},
+        {'product_id': 'P999', 'name': "Clarifying Serum", 'category': "Serum",
+         'suitable_skin_types': "All skin types", 'safe_for_sensitive': "Yes",
+         'primary_target': "Acne, breakouts, blemishes, pores, oil control",
+         'key_actives': "Niacinamide 10%, Salicylic Acid 2%"},
+    ])
+    patched = apply_delta(shipped_catalog, upserts, deletes=[cleanser])
+    carried = _cached(routine_cache, patched.key)
+    assert 0 < len(carried) < len(before)
+
+    routine_cache.clear()
+    for profile, routine in carried.items():
+        assert build_routine(patched, *profile) == routine, profile
@@ -0,0 +1,58 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from engine.catalog import ingest_catalog
+from engine.relevance import compile_id_rank, patch_id_rank
+from engine.routine import get_caution_note
+from engine.schema import SchemaError, plan_columns
+
+
+def _ingest(text):
+    return ingest_catalog(io.BytesIO(text.encode()), 'test')
+
+
+def test_header_only_file_is_rejected():
+    with pytest.raises(SchemaError):
+        _ingest("product_id,name,category\n")
+
+
+def test_empty_file_is_rejected():
+    with pytest.raises(SchemaError):
+        _ingest("")
+
+
+def test_missing_category_notice():
+    _, _, notices = plan_columns(['product_id', 'name'])
+    assert notices and 'fallback keyword' not in notices[0]
+
+
+def _ranked(ids):
+    df = compile_id_rank(pd.DataFrame({'product_id': ids}))
+    return [ids[i] for i in np.argsort(df['id_rank'].to_numpy())]
+
+
+def test_product_ids_rank_as_strings():
+    assert _ranked(['P100', 'P20', 'P3', 'A7', 'P020', 'P20a']) == ['A7', 'P020', 'P100', 'P20', 'P20a', 'P3']
+    assert _ranked(['10', '9', 'B', '100']) == ['10', '100', '9', 'B']
+
+
+def test_patched_rank_matches_full_rank():
+    ids = np.array(['P1', 'P2', 'P10', 'P30', 'P100'], dtype=object)
+    id_rank = compile_id_rank(pd.DataFrame({'product_id': ids}))['id_rank'].to_numpy()
+    kept = np.array([True, False, True, True, True])
+    added = ['P9', 'P200', 'P11']
+    patched = patch_id_rank(id_rank, ids, kept, added)
+    expected = compile_id_rank(pd.DataFrame({'product_id': list(ids[kept]) + added}))['id_rank'].to_numpy()
+    assert patched.tolist() == expected.tolist()
+
+
+def test_blank_cells_do_not_break_rendering():
+    catalog = _ingest("product_id,name,category,safe_for_sensitive\n"
+                      "P1,Gel Cleanser,Cleanser,\n"
+                      "P2,Cream,Moisturizer,Yes with caution\n")
+    rows = catalog.records([0, 1])
+    assert get_caution_note(rows[0], True) == ""
+    assert 'caution' in get_caution_note(rows[1], True)
@@ -0,0 +1,23 @@
+import itertools
+
+from engine import materialize as materialize_module
+from engine.materialize import materialize
+from engine.routine import build_routine
+from engine.routine_cache import lookup_routine
+from engine.taxonomy import AREAS, SKIN_TYPES
+
+SUBSETS = [(), ("acne",), ("dull skin",), ("acne", "dryness / dehydration")]
+
+
+def test_lookup_matches_build_routine(monkeypatch, shipped_catalog):
+    # Every concern subset would take seconds; the Treat pick is built the same way for each
+    monkeypatch.setattr(materialize_module, '_concern_subsets', lambda: SUBSETS)
+    table = materialize(shipped_catalog)
+    assert len(table['profiles']) == len(SKIN_TYPES) * len(AREAS) * 8 * len(SUBSETS)
+
+    for skin_type, area, concerns, flags in itertools.product(
+            SKIN_TYPES, AREAS, SUBSETS, itertools.product((False, True), repeat=3)):
+        expected = build_routine(shipped_catalog, skin_type, list(concerns), *flags, area)
+        assert lookup_routine(table, skin_type, list(reversed(concerns)), *flags, area) == expected
+
+    assert lookup_routine(table, "Oily", ["aging / fine lines"], False, False, False, "Face") is None
@@ -0,0 +1,37 @@
+from engine.progress import ProgressStore
+
+WEEK = 7 * 86400
+T0 = 1_700_000_000
+
+
+def _store(tmp_path):
+    store = ProgressStore(str(tmp_path / 'progress.db'))
+    # A self-reported "2–4 weeks" that is five weeks in by the calendar
+    store.record('u1', "2–4 weeks", problems=["Still dull"], submitted_at=T0)
+    store.record('u1', "2–4 weeks", problems=["Still dull"], submitted_at=T0 + 3 * WEEK)
+    store.record('u2', "Not started yet", submitted_at=T0)
+    store.record('u2', "Less than 2 weeks", problems=["Breakouts/purging"], submitted_at=T0 + 13 * WEEK)
+    assert store.flush(10)
+    return store
+
+
+def test_cohort_counts_weeks_since_routine_start(tmp_path):
+    trends = _store(tmp_path).cohort('problems')
+    assert trends["2–4 weeks"] == {'checkins': 1, 'tags': {"Still dull": 1}}
+    assert trends["4–8 weeks"] == {'checkins': 1, 'tags': {"Still dull": 1}}
+    assert trends["0–2 weeks"]['checkins'] == 1
+    assert trends["12+ weeks"] == {'checkins': 1, 'tags': {"Breakouts/purging": 1}}
+
+
+def test_a_second_routine_starts_its_own_count(tmp_path):
+    store = ProgressStore(str(tmp_path / 'progress.db'))
+    store.record('u1', "4–8 weeks", routine_id='r1', submitted_at=T0)
+    # Switched routines ten weeks later; the new one is days old
+    store.record('u1', "Less than 2 weeks", problems=["Still dull"], routine_id='r2', submitted_at=T0 + 10 * WEEK)
+    store.record('u1', "2–4 weeks", problems=["Still dull"], routine_id='r2', submitted_at=T0 + 13 * WEEK)
+    assert store.flush(10)
+    trends = store.cohort('problems')
+    assert trends["0–2 weeks"] == {'checkins': 1, 'tags': {"Still dull": 1}}
+    assert trends["2–4 weeks"] == {'checkins': 1, 'tags': {"Still dull": 1}}
+    assert trends["4–8 weeks"]['checkins'] == 1
+    assert trends["12+ weeks"]['checkins'] == 0
@@ -0,0 +1,58 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+from engine.flags import PRESCRIPTION
+from engine.router import NO_STEP, STEP_IDS, route_category
+from engine.routine import build_alternatives, plan_routines
+from engine.taxonomy import AREAS, CATEGORY_MAPPING, SKIN_TYPES
+from tests.conftest import SHIPPED_CSV
+
+
+@pytest.mark.parametrize('category, step', [
+    ("Brightening / Pore Refining / Hydrator", 'Moisturize'),
+    ("Exfoliating / Brightening / Moisturizing", 'Moisturize'),
+    ("Exfoliating / Brightening / Moisturizer", 'Moisturize'),
+    ("Brightening / Hydrating / Mild Exfoliating", 'Treat'),
+    ("Hydrating / Soothing / Serum", 'Treat'),
+    ("Exfoliating / Moisturizing / Body Scrub", None),
+])
+def test_category_words_route_to_steps(category, step):
+    assert route_category(category) == (NO_STEP if step is None else STEP_IDS[step])
+
+
+def test_prescription_is_not_a_step_word():
+    assert route_category("Prescription") == NO_STEP
+
+
+def test_routed_step_counts_do_not_drop():
+    categories = pd.read_csv(SHIPPED_CSV, dtype=str)['category']
+    routed = categories.map(route_category)
+    for step, listed in CATEGORY_MAPPING.items():
+        before = categories.isin(listed)
+        # Exactly listed categories keep their step; token rules only add products
+        assert (routed[before] == STEP_IDS[step]).all()
+        assert (routed == STEP_IDS[step]).sum() >= before.sum()
+    assert (routed != NO_STEP).sum() > categories.isin(sum(CATEGORY_MAPPING.values(), [])).sum()
+
+
+def _picked(catalog, using_prescription):
+    picked = set()
+    for skin_type, is_sensitive, is_pregnant in itertools.product(SKIN_TYPES, (False, True), (False, True)):
+        profile = (skin_type, ["texture / rough skin"], is_sensitive, is_pregnant, using_prescription)
+        for routine in plan_routines(catalog, *profile, areas=AREAS).values():
+            picked.update(product_id for _, product_id in routine.values() if product_id is not None)
+        for area in AREAS:
+            for options in build_alternatives(catalog, *profile, area, k=len(catalog)).values():
+                picked.update(option['product_id'] for option in options)
+    return picked
+
+
+def test_prescription_only_products_need_using_prescription(shipped_catalog):
+    df = shipped_catalog.df
+    prescription = set(df['product_id'][(df['safety_flags'].to_numpy() & PRESCRIPTION) != 0])
+    assert prescription
+    # The prescription-only cream still has a step; the profile keeps it out
+    assert (df['step_id'][df['product_id'].isin(prescription)] != NO_STEP).any()
+    assert not _picked(shipped_catalog, using_prescription=False) & prescription
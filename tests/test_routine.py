@@ -0,0 +1,64 @@
+import io
+
+from engine.catalog import ingest_catalog
+from engine.routine import (ROUTINE_STEPS, build_routine, conflict_free_swap, get_filtered_df, pick_product,
+                            routine_conflicts)
+
+PROFILE = ("Combination", ["texture / rough skin"], False, False, False, "Face")
+
+
+def test_pick_product_on_hot_frame(shipped_catalog):
+    filtered = get_filtered_df(shipped_catalog.df, *PROFILE)
+    assert 'name' not in filtered.columns
+    routine = build_routine(shipped_catalog, *PROFILE)
+    for step, fallback in ROUTINE_STEPS:
+        details, product_id = pick_product(filtered, step, fallback, PROFILE[2], PROFILE[1],
+                                           records=shipped_catalog.records)
+        assert (details, product_id) == routine[step]
+
+
+def _actives_catalog():
+    csv = ("product_id,name,category,key_actives\n"
+           "C1,BHA Cleanser,Cleanser,Salicylic Acid 2%\n"
+           "C2,Gentle Cleanser,Cleanser,Glycerin\n"
+           "T1,Retinol Serum,Serum,Retinol 0.5%\n"
+           "T2,Niacinamide Serum,Serum,Niacinamide 10%\n"
+           "T3,Retinal Serum,Serum,Retinaldehyde 0.1%\n"
+           "M1,Night Cream,Moisturizer,Retinol 0.1% (encapsulated)\n"
+           "M2,Barrier Cream,Moisturizer,Ceramides\n")
+    return ingest_catalog(io.BytesIO(csv.encode()), 'actives-test')
+
+
+def _alternative(product_id):
+    return {'product_id': product_id, 'name': product_id, 'score': 0, 'details': ''}
+
+
+def test_retinoid_with_acid_is_reported():
+    routine = {'Cleanse': ('', 'C1'), 'Treat': ('', 'T1'), 'Moisturize': ('', 'M2')}
+    conflicts = routine_conflicts(_actives_catalog(), routine)
+    assert [c['conflict'] for c in conflicts] == ['retinoid_acid']
+    assert [(p['step'], p['product_id']) for p in conflicts[0]['products']] == [('Cleanse', 'C1'), ('Treat', 'T1')]
+    assert conflicts[0]['products'][0]['ingredients'] == 'salicylic acid 2%'
+
+
+def test_double_retinoid_is_reported():
+    routine = {'Cleanse': ('', 'C2'), 'Treat': ('', 'T1'), 'Moisturize': ('', 'M1')}
+    conflicts = routine_conflicts(_actives_catalog(), routine)
+    assert [c['conflict'] for c in conflicts] == ['double_retinoid']
+    assert {p['product_id'] for p in conflicts[0]['products']} == {'T1', 'M1'}
+
+
+def test_swap_clears_conflicts_with_fewest_changes():
+    catalog = _actives_catalog()
+    routine = {'Cleanse': ('', 'C1'), 'Treat': ('', 'T1'), 'Moisturize': ('', 'M1')}
+    alternatives = {'Cleanse': [_alternative('C2')], 'Treat': [_alternative('T3'), _alternative('T2')],
+                    'Moisturize': [_alternative('M2')]}
+    # Clearing the acid and one retinoid takes two swaps; the best-ranked pair wins
+    swap = conflict_free_swap(catalog, routine, alternatives)
+    assert {step: alt['product_id'] for step, alt in swap.items()} == {'Cleanse': 'C2', 'Moisturize': 'M2'}
+    swapped = {step: ('', swap[step]['product_id']) if step in swap else pick for step, pick in routine.items()}
+    assert routine_conflicts(catalog, swapped) == []
+
+    clean = {'Cleanse': ('', 'C2'), 'Treat': ('', 'T2'), 'Moisturize': ('', 'M2')}
+    assert conflict_free_swap(catalog, clean, alternatives) == {}
+    assert conflict_free_swap(catalog, routine, {'Cleanse': [_alternative('C2')]}) is None
@@ -0,0 +1,42 @@
+import io
+
+import pandas as pd
+
+from engine.catalog import ingest_catalog
+from engine.delta import apply_delta
+from engine.relevance import compile_id_rank
+from engine.search import build_search_index, search_products
+
+
+def _ids(catalog, results):
+    return [record['product_id'] for record in catalog.records(results.page(1, size=len(results)))]
+
+
+def test_prefix_matches_rank_by_weight_then_id():
+    csv = ("product_id,name,category,primary_target,key_actives\n"
+           "S1,Hydra Gel,Moisturizer,Hydration,Glycerin\n"
+           "S2,Hydrating Cream,Moisturizer,Dryness,Shea butter\n"
+           "S9,Night Balm,Moisturizer,Hydration,Squalane\n"
+           "S10,Day Lotion,Moisturizer,Hydration and glow,Niacinamide\n"
+           "S3,Clay Mask,Mask,Oil control,Kaolin\n")
+    catalog = ingest_catalog(io.BytesIO(csv.encode()), 'search-test')
+    # Exact "hydra" in the name (3 x 2) plus "hydration" (2); a name prefix
+    # (3); then the primary_target prefixes (2 each), tied and in id order
+    assert _ids(catalog, search_products(catalog, "hydra")) == ['S1', 'S2', 'S10', 'S9']
+    assert _ids(catalog, search_products(catalog, "HYDRA gel")) == ['S1']
+    assert _ids(catalog, search_products(catalog, "hydra kaolin")) == []
+    assert len(search_products(catalog, "  ")) == 0
+
+
+def test_search_after_delta_matches_full_rebuild(shipped_catalog):
+    upserts = pd.DataFrame([
+        {'product_id': 'P002', 'name': "Hydrating Gel Cleanser"},
+        {'product_id': 'P999', 'name': "Zinc Clarifying Serum", 'category': "Serum",
+         'primary_target': "Acne, oily skin", 'key_actives': "Zinc PCA, Niacinamide 5%"},
+    ])
+    patched = apply_delta(shipped_catalog, upserts, deletes=['P010'])
+    rebuilt = build_search_index(compile_id_rank(patched.frame()))
+    assert 'P999' in _ids(patched, search_products(patched, "zinc"))
+    for query in ("zinc", "hydrat", "gel clean", "niacin", "retinol", "acne"):
+        expected = rebuilt.search(query).page(1, size=500).tolist()
+        assert search_products(patched, query).page(1, size=500).tolist() == expected, query
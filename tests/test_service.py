@@ -0,0 +1,67 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from engine import service
+from engine.service import HTTPError, RoutineService, _read_request
+from engine.store import UnknownSeller
+
+
+def _read(raw):
+    async def read():
+        reader = asyncio.StreamReader()
+        reader.feed_data(raw)
+        reader.feed_eof()
+        return await _read_request(reader)
+    return asyncio.run(read())
+
+
+@pytest.mark.parametrize('length', [b'abc', b'-5'])
+def test_bad_content_length_is_a_400(length):
+    with pytest.raises(HTTPError) as raised:
+        _read(b'POST /routine HTTP/1.1\r\nContent-Length: ' + length + b'\r\n\r\n{}')
+    assert raised.value.status == 400
+
+
+def test_body_is_read():
+    assert _read(b'POST /routine HTTP/1.1\r\nContent-Length: 2\r\n\r\n{}')[3] == b'{}'
+
+
+def _recommend(record):
+    with ThreadPoolExecutor(1) as executor:
+        return asyncio.run(RoutineService(executor).recommend(record))
+
+
+@pytest.mark.parametrize('record', [{'concerns': 5}, {'concerns': ['acne', 3]}, {'sensitive': 1},
+                                    {'pregnant': ['yes']}, {'skin_type': 'Scaly'}])
+def test_bad_profile_is_a_400(record):
+    with pytest.raises(HTTPError) as raised:
+        _recommend(record)
+    assert raised.value.status == 400
+
+
+def test_only_a_missing_seller_is_a_404(monkeypatch):
+    def unknown(*args):
+        raise UnknownSeller('acme')
+
+    def broken(*args):
+        raise KeyError('step')
+
+    monkeypatch.setattr(service, '_compute', unknown)
+    with pytest.raises(HTTPError) as raised:
+        _recommend({'seller': 'acme'})
+    assert raised.value.status == 404
+
+    monkeypatch.setattr(service, '_compute', broken)
+    with pytest.raises(KeyError):
+        _recommend({'seller': 'acme'})
+
+
+def test_alternatives_leave_out_the_picks(monkeypatch, shipped_catalog):
+    monkeypatch.setattr(service, 'load_catalog', lambda path: shipped_catalog)
+    result = service._compute(None, ("Oily", ["acne"], False, False, False, "Face"), alternatives=5)
+    picked = {pick['product_id'] for pick in result['routine'].values() if pick['product_id']}
+    assert picked
+    for step, alternatives in result['alternatives'].items():
+        assert not picked & {alternative['product_id'] for alternative in alternatives}, step
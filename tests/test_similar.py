@@ -0,0 +1,23 @@
+from engine.flags import NOT_FOR_SENSITIVE, PRESCRIPTION, blocked_bits
+from engine.similar import similar_products
+
+
+def _flags(catalog, similar):
+    return catalog.df['safety_flags'].to_numpy()[catalog.positions([s['product_id'] for s in similar])]
+
+
+def test_unfiltered_lookup_keeps_the_safety_defaults(shipped_catalog):
+    # P138 is prescription-only and one of P019's nearest neighbours
+    similar = similar_products(shipped_catalog, 'P019', k=20)
+    assert len(similar) == 20
+    assert 'P138' not in [s['product_id'] for s in similar]
+    assert not (_flags(shipped_catalog, similar) & PRESCRIPTION).any()
+
+
+def test_profile_filters_neighbours(shipped_catalog):
+    unfiltered = similar_products(shipped_catalog, 'P001', k=10)
+    assert (_flags(shipped_catalog, unfiltered) & NOT_FOR_SENSITIVE).any()
+
+    similar = similar_products(shipped_catalog, 'P001', ("Normal", True, False, False, "Face"), k=10)
+    assert similar
+    assert not (_flags(shipped_catalog, similar) & blocked_bits(True, False, False, "Face")).any()
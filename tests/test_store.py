@@ -0,0 +1,27 @@
+import json
+import os
+
+import pytest
+
+from engine.store import CatalogStore, StaleVersion
+
+
+def test_published_files_are_readable_by_other_users(tmp_path, shipped_catalog):
+    store = CatalogStore(str(tmp_path))
+    version = store.publish('shop', shipped_catalog)
+    seller_dir = tmp_path / 'shop'
+    assert os.stat(seller_dir / 'CURRENT').st_mode & 0o777 == 0o644
+    assert os.stat(seller_dir / version).st_mode & 0o777 == 0o755
+    for name in os.listdir(seller_dir / version):
+        assert os.stat(seller_dir / version / name).st_mode & 0o044 == 0o044
+    assert len(store.get('shop')) == len(shipped_catalog)
+
+
+def test_versions_from_another_build_are_refused(tmp_path, shipped_catalog):
+    version = CatalogStore(str(tmp_path)).publish('shop', shipped_catalog)
+    meta_path = tmp_path / 'shop' / version / 'meta.json'
+    meta = json.loads(meta_path.read_text())
+    meta['format'] -= 1
+    meta_path.write_text(json.dumps(meta))
+    with pytest.raises(StaleVersion):
+        CatalogStore(str(tmp_path)).get('shop')